@@ -1,3 +1,11 @@
+"""Application factory and the shared extension objects.
+
+Importing this module only creates the unbound ``db`` and ``login_manager``
+extensions; models, blueprints and background services are loaded by
+``create_app()``. The schema is created and migrated by ``flask init-db`` and
+``flask db-upgrade``, never as a side effect of starting the app.
+"""
+
 import os
 import logging
 from flask import Flask
@@ -6,50 +14,143 @@ from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+from db_routing import RoutingSession, replica_binds
+from sqlite_profile import engine_options
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 login_manager = LoginManager()
-
-# Create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///leave_management.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-# Initialize extensions
-db.init_app(app)
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
-
-# Import routes
-from routes import register_blueprints
-
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
-    db.create_all()
-    
-    # Register blueprints
-    register_blueprints(app)
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    from user_cache import load_cached_user
+    return load_cached_user(int(user_id))
+
+
+def create_app(config=None):
+    """Build a configured app; ``config`` overrides values read from the environment"""
+    # Configure logging
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    # Create the app
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    # Configure the database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///leave_management.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    # SQLite connection profile (see sqlite_profile.py); ignored for other databases
+    app.config["SQLITE_TUNING"] = os.environ.get("SQLITE_TUNING", "true").lower() == "true"
+    app.config["SQLITE_JOURNAL_MODE"] = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    app.config["SQLITE_MMAP_SIZE"] = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    app.config["SQLITE_CACHE_SIZE_KB"] = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+    app.config["SQLITE_FOREIGN_KEYS"] = os.environ.get("SQLITE_FOREIGN_KEYS", "true").lower() == "true"
+    app.config["SQLITE_MAINTENANCE_INTERVAL"] = float(os.environ.get("SQLITE_MAINTENANCE_INTERVAL", 300))
+
+    # Optional read replicas for GET and @read_only views (see db_routing.py)
+    app.config["SQLALCHEMY_BINDS"] = replica_binds(os.environ.get("DATABASE_REPLICA_URLS"))
+    app.config["REPLICA_STICKY_SECONDS"] = float(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
+    # Notification delivery (see notifications.py)
+    app.config["NOTIFICATION_TRANSPORT"] = os.environ.get("NOTIFICATION_TRANSPORT", "console")
+    app.config["NOTIFICATION_DISPATCHER"] = os.environ.get("NOTIFICATION_DISPATCHER", "thread")
+    app.config["NOTIFICATION_FILE_PATH"] = os.environ.get("NOTIFICATION_FILE_PATH", "notifications.jsonl")
+    app.config["MAIL_SERVER"] = os.environ.get("MAIL_SERVER", "localhost")
+    app.config["MAIL_PORT"] = int(os.environ.get("MAIL_PORT", 25))
+    app.config["MAIL_USERNAME"] = os.environ.get("MAIL_USERNAME")
+    app.config["MAIL_PASSWORD"] = os.environ.get("MAIL_PASSWORD")
+    app.config["MAIL_USE_TLS"] = os.environ.get("MAIL_USE_TLS", "false").lower() == "true"
+    app.config["MAIL_DEFAULT_SENDER"] = os.environ.get("MAIL_DEFAULT_SENDER", "noreply@college.edu")
+
+    # Audit trail: 'transactional' or 'buffered' (see audit.py)
+    app.config["AUDIT_MODE"] = os.environ.get("AUDIT_MODE", "transactional")
+    app.config["AUDIT_BUFFERED_ACTIONS"] = tuple(os.environ.get("AUDIT_BUFFERED_ACTIONS", "Login,Logout").split(","))
+    app.config["AUDIT_FLUSH_SIZE"] = int(os.environ.get("AUDIT_FLUSH_SIZE", 100))
+    app.config["AUDIT_FLUSH_INTERVAL"] = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 2.0))
+
+    # Audit log retention and cold archive (see audit_archive.py, 'flask archive-audit-logs')
+    app.config["AUDIT_RETENTION_DAYS"] = int(os.environ.get("AUDIT_RETENTION_DAYS", 180))
+    app.config["AUDIT_ARCHIVE_DIR"] = os.environ.get("AUDIT_ARCHIVE_DIR", "audit-archive")
+    app.config["AUDIT_ARCHIVE_BATCH_SIZE"] = int(os.environ.get("AUDIT_ARCHIVE_BATCH_SIZE", 10000))
+    app.config["AUDIT_PARTITION_MONTHS_AHEAD"] = int(os.environ.get("AUDIT_PARTITION_MONTHS_AHEAD", 3))
+
+    # Server-Sent Events push channel (see events.py)
+    app.config["SSE_POLL_INTERVAL"] = float(os.environ.get("SSE_POLL_INTERVAL", 2.0))
+    app.config["SSE_HEARTBEAT"] = float(os.environ.get("SSE_HEARTBEAT", 15.0))
+
+    # Flask-Login user loader cache (see user_cache.py). The TTL is how long other workers may
+    # keep serving a user another worker deactivated or demoted
+    app.config["USER_CACHE_SIZE"] = int(os.environ.get("USER_CACHE_SIZE", 1024))
+    app.config["USER_CACHE_TTL"] = float(os.environ.get("USER_CACHE_TTL", 5))
+
+    # Bulk staff import (see staff_import.py). Workers only apply to ``flask import-staff``;
+    # uploads through the admin page hash in-process and are capped at MAX_UPLOAD_ROWS
+    app.config["STAFF_IMPORT_WORKERS"] = int(os.environ.get("STAFF_IMPORT_WORKERS", 1))
+    app.config["STAFF_IMPORT_BATCH_SIZE"] = int(os.environ.get("STAFF_IMPORT_BATCH_SIZE", 500))
+    app.config["STAFF_IMPORT_MAX_UPLOAD_ROWS"] = int(os.environ.get("STAFF_IMPORT_MAX_UPLOAD_ROWS", 50))
+    # Largest request body Flask will read; staff files are the only uploads
+    app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 1024 * 1024))
+
+    # Per-request SQL instrumentation and slow-query log (see instrumentation.py)
+    app.config["SQL_INSTRUMENTATION"] = os.environ.get("SQL_INSTRUMENTATION", "off").lower() in ("1", "true", "on")
+    app.config["INSTRUMENTATION_HEADERS"] = os.environ.get("INSTRUMENTATION_HEADERS", "false").lower() == "true"
+    app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 100))
+    app.config["SLOW_REQUEST_MS"] = float(os.environ.get("SLOW_REQUEST_MS", 500))
+    app.config["SLOW_REQUEST_QUERIES"] = int(os.environ.get("SLOW_REQUEST_QUERIES", 50))
+    app.config["N_PLUS_ONE_THRESHOLD"] = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+    app.config["INSTRUMENTATION_HISTORY"] = int(os.environ.get("INSTRUMENTATION_HISTORY", 100))
+
+    # Prometheus metrics at /metrics (see metrics.py). Set METRICS_DIR to aggregate
+    # across gunicorn workers; without METRICS_TOKEN only direct (unproxied) loopback clients may scrape.
+    app.config["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    app.config["METRICS_DIR"] = os.environ.get("METRICS_DIR")
+    app.config["METRICS_FLUSH_INTERVAL"] = float(os.environ.get("METRICS_FLUSH_INTERVAL", 5.0))
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+    app.config["METRICS_LOCAL_ONLY"] = os.environ.get("METRICS_LOCAL_ONLY", "true").lower() == "true"
+
+    if config:
+        app.config.update(config)
+
+    # Initialize extensions
+    db.init_app(app)
+    login_manager.init_app(app)
+
+    # Import late so that importing this module stays cheap
+    import models  # noqa: F401  (registers the tables on db.metadata)
+    from db_routing import init_db_routing
+    from sqlite_profile import init_sqlite_profile
+    from routes import register_blueprints
+    from commands import register_commands
+    from notifications import init_notifications
+    from audit import init_audit
+    from user_cache import init_user_cache
+    from events import init_events
+    from instrumentation import init_instrumentation
+    from metrics import init_metrics
+    from assets import init_assets
+
+    with app.app_context():
+        init_sqlite_profile(app)
+        init_db_routing(app)
+        register_blueprints(app)
+        register_commands(app)
+        init_notifications(app)
+        init_audit(app)
+        init_user_cache(app)
+        init_events(app)
+        init_instrumentation(app)
+        if app.config["METRICS_ENABLED"]:
+            init_metrics(app)
+        init_assets(app)
+
+    return app
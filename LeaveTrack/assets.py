@@ -0,0 +1,252 @@
+"""Static asset pipeline: minified, content-hashed, precompressed builds.
+
+``flask build-assets`` minifies every CSS and JS file under ``static/``,
+writes it to ``static/dist/`` under a name carrying a hash of its content
+(``css/style.3f2a9c1b.css``), adds ``.gz`` and, when the ``brotli`` package
+is installed, ``.br`` variants, and records the mapping in
+``static/dist/manifest.json``.
+
+Templates link assets with ``asset_url('js/main.js')``, which takes the same
+arguments as ``url_for('static', filename=...)``. With a manifest it points
+at the hashed build, served by ``/static/dist/`` with the best encoding the
+client accepts and an immutable one-year cache lifetime, since a changed
+file gets a new name. Without one (or in debug mode) it falls back to the
+plain source file so local edits show up straight away.
+
+Minification uses ``rcssmin``/``rjsmin`` when installed. The built-in
+fallback only strips comments and indentation and keeps line breaks, so
+automatic semicolon insertion in the JS is unaffected.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; builds then ship gzip only
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 8
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_STRING = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+_CSS_COLON = re.compile(r':\s+')
+_WHITESPACE = re.compile(r'\s+')
+
+# Characters and keywords after which a '/' starts a regular expression rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_KEYWORD_BEFORE = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|void|delete|throw|new)\s*$')
+_JS_BLANKS = re.compile(r'[ \t]+')
+_JS_LINE_BREAKS = re.compile(r' ?\n\s*')
+
+
+def minify_css(source):
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+
+    # Strings are split out first so that their contents are left alone
+    parts = _CSS_STRING.split(_CSS_COMMENT.sub('', source))
+    for index in range(0, len(parts), 2):
+        text = _WHITESPACE.sub(' ', parts[index])
+        text = _CSS_SPACE_AROUND.sub(r'\1', text)
+        # Only the space after a colon goes: before one it can be a descendant combinator
+        parts[index] = _CSS_COLON.sub(':', text).replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def _js_segments(source):
+    """Split JS into ('code', text) and ('literal', text) segments, dropping comments.
+
+    Literals are strings, template literals and regular expressions. A '/' is
+    read as the start of a regex after an operator, an opening bracket or a
+    keyword such as ``return``, and as division otherwise.
+    """
+    segments, code = [], []
+    index, length = 0, len(source)
+    last = ''  # last significant code character
+
+    while index < length:
+        char = source[index]
+        pair = source[index:index + 2]
+
+        if pair == '//':
+            end = source.find('\n', index)
+            index = length if end == -1 else end
+            continue
+        if pair == '/*':
+            end = source.find('*/', index + 2)
+            index = length if end == -1 else end + 2
+            code.append(' ')
+            continue
+
+        if char in '"\'`':
+            end = index + 1
+            while end < length and source[end] != char:
+                end += 2 if source[end] == '\\' else 1
+        elif char == '/' and (not last or last in _REGEX_PRECEDERS
+                              or _KEYWORD_BEFORE.search(''.join(code[-12:]))):
+            end, in_class = index + 1, False
+            while end < length and (in_class or source[end] != '/') and source[end] != '\n':
+                if source[end] == '\\':
+                    end += 1
+                elif source[end] == '[':
+                    in_class = True
+                elif source[end] == ']':
+                    in_class = False
+                end += 1
+        else:
+            code.append(char)
+            if not char.isspace():
+                last = char
+            index += 1
+            continue
+
+        if code:
+            segments.append(('code', ''.join(code)))
+            code = []
+        segments.append(('literal', source[index:end + 1]))
+        index, last = end + 1, char
+
+    if code:
+        segments.append(('code', ''.join(code)))
+    return segments
+
+
+def minify_js(source):
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+
+    parts = []
+    for kind, text in _js_segments(source):
+        if kind == 'code':
+            # Indentation and blank lines go; line breaks stay for semicolon insertion
+            text = _JS_LINE_BREAKS.sub('\n', _JS_BLANKS.sub(' ', text))
+        parts.append(text)
+    return ''.join(parts).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def _hashed_name(filename, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, extension = os.path.splitext(filename)
+    return f'{stem}.{digest}{extension}'
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as handle:
+        handle.write(content)
+
+
+def build(static_folder):
+    """Rebuild ``static/dist``; returns [(source, built name, raw, minified, gzip, brotli sizes)]"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    manifest, report = {}, []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for name in sorted(files):
+            minify = MINIFIERS.get(os.path.splitext(name)[1])
+            if minify is None:
+                continue
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, encoding='utf-8') as handle:
+                source = handle.read()
+
+            content = minify(source).encode('utf-8')
+            built = _hashed_name(filename, content)
+            target = os.path.join(dist, built)
+            _write(target, content)
+            gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+            _write(target + '.gz', gzipped)
+            brotlied = None
+            if brotli is not None:
+                brotlied = brotli.compress(content, quality=11)
+                _write(target + '.br', brotlied)
+
+            manifest[filename] = f'{DIST_DIR}/{built}'
+            report.append((filename, built, len(source.encode('utf-8')), len(content), len(gzipped),
+                           len(brotlied) if brotlied is not None else None))
+
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return report
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST)
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.warning("Ignoring unreadable asset manifest %s; run 'flask build-assets'", path)
+        return {}
+
+
+def asset_url(filename, **values):
+    """``url_for('static', filename=...)``, pointing at the hashed build when there is one"""
+    manifest = current_app.extensions.get('asset_manifest') or {}
+    built = manifest.get(filename)
+    if built is None or current_app.debug:
+        return url_for('static', filename=filename, **values)
+    return url_for('hashed_static', filename=built[len(DIST_DIR) + 1:], **values)
+
+
+def serve_hashed(filename):
+    """Serve a built asset, precompressed when the client accepts it"""
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if accepted[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, max_age=IMMUTABLE_MAX_AGE,
+                                           mimetype=_mimetype(filename))
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, max_age=IMMUTABLE_MAX_AGE)
+
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _mimetype(filename):
+    return {'.css': 'text/css', '.js': 'text/javascript'}.get(os.path.splitext(filename)[1])
+
+
+def init_assets(app):
+    """Load the manifest and register the hashed-asset route and template helper"""
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+    app.add_url_rule(f'{app.static_url_path}/{DIST_DIR}/<path:filename>', 'hashed_static', serve_hashed)
+    app.jinja_env.globals['asset_url'] = asset_url
+    return app.extensions['asset_manifest']
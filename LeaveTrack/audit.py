@@ -0,0 +1,150 @@
+"""Audit trail writer.
+
+``record_audit()`` is the single entry point used by the views. Two modes:
+
+* transactional (default): the ``AuditLog`` row is added to the current
+  session and committed together with the business change, so an action
+  costs one commit instead of two.
+* buffered: actions listed in ``AUDIT_BUFFERED_ACTIONS`` (Login/Logout by
+  default) are queued in process and written by a background thread with
+  one bulk INSERT whenever ``AUDIT_FLUSH_SIZE`` rows are waiting or
+  ``AUDIT_FLUSH_INTERVAL`` seconds have passed. Pending rows are flushed at
+  interpreter exit. Every other action stays transactional.
+"""
+
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import db
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    def __init__(self, app, flush_size=100, flush_interval=2.0, max_pending=10000):
+        self.app = app
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def append(self, row):
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) > self.max_pending:
+                dropped = len(self._rows) - self.max_pending
+                del self._rows[:dropped]
+                logger.error("Audit buffer full, dropped %s oldest rows", dropped)
+            full = len(self._rows) >= self.flush_size
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every queued row with one bulk INSERT; returns rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            try:
+                with self.app.app_context():
+                    db.session.execute(insert(AuditLog), rows)
+                    db.session.commit()
+                    db.session.remove()
+            except Exception:
+                logger.exception("Failed to write %s buffered audit rows, will retry", len(rows))
+                with self._lock:
+                    self._rows[:0] = rows
+                return 0
+            return len(rows)
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def close(self):
+        """Stop the writer and flush whatever is still queued"""
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def __len__(self):
+        return len(self._rows)
+
+
+_buffer = None
+_buffered_actions = frozenset()
+
+
+def init_audit(app):
+    """Configure the audit mode from app config"""
+    global _buffer, _buffered_actions
+
+    if app.config.get('AUDIT_MODE', 'transactional') == 'buffered':
+        _buffer = AuditBuffer(
+            app,
+            flush_size=app.config.get('AUDIT_FLUSH_SIZE', 100),
+            flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', 2.0),
+        )
+        _buffered_actions = frozenset(app.config.get('AUDIT_BUFFERED_ACTIONS', ('Login', 'Logout')))
+        atexit.register(_buffer.close)
+        app.extensions['audit_buffer'] = _buffer
+    else:
+        _buffer = None
+        _buffered_actions = frozenset()
+
+
+def record_audit(user_id, action, entity_type, entity_id, old_values=None, new_values=None,
+                 ip_address=None):
+    """Record an audit event.
+
+    Returns True if the row was queued for the background writer, False if it
+    was added to the current session (the caller's commit persists it).
+    """
+    if _buffer is not None and action in _buffered_actions:
+        _buffer.append({
+            'user_id': user_id,
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'old_values': old_values,
+            'new_values': new_values,
+            'timestamp': datetime.utcnow(),
+            'ip_address': ip_address,
+        })
+        return True
+
+    db.session.add(AuditLog(user_id=user_id, action=action, entity_type=entity_type,
+                            entity_id=entity_id, old_values=old_values, new_values=new_values,
+                            ip_address=ip_address))
+    return False
+
+
+def flush_audit_buffer():
+    """Synchronously write queued rows (no-op in transactional mode)"""
+    return _buffer.flush() if _buffer is not None else 0
@@ -0,0 +1,396 @@
+"""Audit log partitioning, retention and cold archive.
+
+Every login and logout adds an ``audit_logs`` row, so the table only keeps
+the last ``AUDIT_RETENTION_DAYS`` days. ``flask archive-audit-logs`` (run it
+daily from cron) moves older rows, a month at a time and oldest first, into
+gzip-compressed JSON Lines files under ``AUDIT_ARCHIVE_DIR``:
+
+    audit-logs-2026-03-000018342.jsonl.gz    (month, id of its first row)
+
+A file is written under a temporary name, fsynced and renamed into place
+before its rows are deleted, so archive files are never modified once they
+exist. If the job dies between the rename and the delete, the next run
+writes the same rows to a file of the same name; readers also drop
+duplicate ids.
+
+How the hot table is laid out depends on the dialect:
+
+* SQLite: one table with an index on ``(timestamp, id)``, which serves the
+  admin dashboard's recent activity, the audit search and the batched
+  retention deletes.
+* PostgreSQL: ``audit_logs`` is range-partitioned by month on ``timestamp``,
+  plus a DEFAULT partition for rows no monthly partition covers. The
+  archive job creates partitions ``AUDIT_PARTITION_MONTHS_AHEAD`` months
+  ahead and drops a month's partition once it is archived, instead of
+  deleting its rows one by one.
+
+Both are set up by the ``0005_audit_log_partitioning`` migration. On
+PostgreSQL it copies the existing rows into the partitioned table in one
+transaction, so run it in a maintenance window on large databases.
+
+``search_audit_logs()`` backs the admin audit search. It reads the hot table
+first and then the archive files of the requested months, newest first.
+With several app servers, ``AUDIT_ARCHIVE_DIR`` must be shared storage.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import delete, func, select, text, tuple_
+
+from app import db
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_NAME = re.compile(r'^audit-logs-(\d{4})-(\d{2})-(\d+)\.jsonl\.gz$')
+PARTITION_PREFIX = 'audit_logs_y'
+DEFAULT_PARTITION = 'audit_logs_default'
+
+COLUMNS = ('id', 'user_id', 'action', 'entity_type', 'entity_id', 'old_values', 'new_values', 'timestamp',
+           'ip_address')
+
+AuditEntry = namedtuple('AuditEntry', COLUMNS + ('archived',))
+ArchivedMonth = namedtuple('ArchivedMonth', 'month rows path dropped_partition')
+
+
+def _columns():
+    return [getattr(AuditLog, name) for name in COLUMNS]
+
+
+def _sort_key():
+    return tuple_(AuditLog.timestamp, AuditLog.id)
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+# PostgreSQL partitions
+
+def partition_name(month):
+    return f'{PARTITION_PREFIX}{month:%Y}m{month:%m}'
+
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_logs'))"
+    )).scalar()
+
+
+def _table_exists(connection, name):
+    return connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+
+
+def create_partition(connection, month):
+    """Create the partition for ``month``, moving any of its rows out of the DEFAULT partition"""
+    name = partition_name(month)
+    if _table_exists(connection, name):
+        return False
+
+    bounds = {'lower': month, 'upper': next_month(month)}
+    # A new partition may not overlap rows already in the DEFAULT partition
+    connection.execute(text("CREATE TEMPORARY TABLE audit_logs_moving (LIKE audit_logs)"))
+    connection.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        "WHERE \"timestamp\" >= :lower AND \"timestamp\" < :upper RETURNING *) "
+        "INSERT INTO audit_logs_moving SELECT * FROM moved"
+    ), bounds)
+    connection.execute(text(
+        f"CREATE TABLE {name} PARTITION OF audit_logs "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{bounds['upper']:%Y-%m-%d}')"
+    ))
+    connection.execute(text("INSERT INTO audit_logs SELECT * FROM audit_logs_moving"))
+    connection.execute(text("DROP TABLE audit_logs_moving"))
+    return True
+
+
+def ensure_partitions(connection, months_ahead, first_month=None):
+    """Monthly partitions from ``first_month`` (default: this month) to ``months_ahead`` months ahead"""
+    month = first_month or month_start(datetime.utcnow())
+    last = month_start(datetime.utcnow())
+    for _ in range(months_ahead):
+        last = next_month(last)
+
+    created = []
+    while month <= last:
+        if create_partition(connection, month):
+            created.append(partition_name(month))
+        month = next_month(month)
+    return created
+
+
+def partition_audit_logs(connection, months_ahead=3):
+    """Index ``audit_logs`` by time; on PostgreSQL, convert it to monthly partitions"""
+    if connection.dialect.name != 'postgresql':
+        for index in AuditLog.__table__.indexes:
+            index.create(connection, checkfirst=True)
+        return
+
+    if is_partitioned(connection):
+        ensure_partitions(connection, months_ahead)
+        return
+
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence('audit_logs', 'id')")).scalar()
+    oldest = connection.execute(text('SELECT min("timestamp") FROM audit_logs')).scalar()
+
+    connection.execute(text("ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned"))
+    connection.execute(text("ALTER INDEX audit_logs_pkey RENAME TO audit_logs_unpartitioned_pkey"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_audit_logs_timestamp"))
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+
+    # The partition key has to be part of the primary key
+    connection.execute(text(f"""
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL DEFAULT nextval('{sequence}'::regclass),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            action VARCHAR(100) NOT NULL,
+            entity_type VARCHAR(50) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            old_values TEXT,
+            new_values TEXT,
+            "timestamp" TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            ip_address VARCHAR(45),
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """))
+    connection.execute(text('CREATE INDEX ix_audit_logs_timestamp ON audit_logs ("timestamp", id)'))
+    connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF audit_logs DEFAULT"))
+    ensure_partitions(connection, months_ahead, first_month=month_start(oldest) if oldest else None)
+
+    columns = ', '.join(f'"{name}"' for name in COLUMNS)
+    selected = ', '.join('COALESCE("timestamp", now() AT TIME ZONE \'utc\')' if name == 'timestamp' else f'"{name}"'
+                         for name in COLUMNS)
+    connection.execute(text(
+        f"INSERT INTO audit_logs ({columns}) SELECT {selected} FROM audit_logs_unpartitioned"
+    ))
+    connection.execute(text("DROP TABLE audit_logs_unpartitioned"))
+    connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY audit_logs.id"))
+
+
+# Archive files
+
+def _to_record(row):
+    record = row._asdict()
+    record['timestamp'] = row.timestamp.isoformat()
+    return record
+
+
+def _from_record(record):
+    record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+    return AuditEntry(archived=True, **record)
+
+
+def archive_files(directory):
+    """{month: [paths]} of the archive files in ``directory``"""
+    months = {}
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return months
+    for name in names:
+        match = ARCHIVE_NAME.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            months.setdefault(month, []).append(os.path.join(directory, name))
+    return months
+
+
+def read_archive(path):
+    """Yield the entries of one archive file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            if line.strip():
+                yield _from_record(json.loads(line))
+
+
+def _fsync_directory(directory):
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _write_month(connection, directory, lower, upper, batch_size):
+    """Write the rows in [lower, upper) to a new archive file; returns (path, rows, last sort key)"""
+    statement = select(*_columns()).where(AuditLog.timestamp >= lower, AuditLog.timestamp < upper)\
+        .order_by(AuditLog.timestamp, AuditLog.id).limit(batch_size)
+    handle, temporary = tempfile.mkstemp(prefix='.audit-logs-', suffix='.tmp', dir=directory)
+    os.close(handle)
+
+    first_id, count, last = None, 0, None
+    try:
+        with open(temporary, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as archive:
+            while True:
+                batch = statement if last is None else statement.where(_sort_key() > last)
+                rows = connection.execute(batch).all()
+                if not rows:
+                    break
+                archive.write(''.join(json.dumps(_to_record(row), separators=(',', ':')) + '\n'
+                                      for row in rows).encode('utf-8'))
+                first_id = rows[0].id if first_id is None else first_id
+                count += len(rows)
+                last = (rows[-1].timestamp, rows[-1].id)
+            archive.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        if not count:
+            os.unlink(temporary)
+            return None, 0, None
+        path = os.path.join(directory, f'audit-logs-{lower:%Y-%m}-{first_id:09d}.jsonl.gz')
+        os.replace(temporary, path)
+        _fsync_directory(directory)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+    return path, count, last
+
+
+def _delete_archived(lower, upper, last, batch_size):
+    """Delete the archived rows in short transactions so writers are not held up"""
+    ids = select(AuditLog.id).where(AuditLog.timestamp >= lower, AuditLog.timestamp < upper,
+                                    _sort_key() <= last).limit(batch_size)
+    while True:
+        with db.engine.begin() as connection:
+            deleted = connection.execute(delete(AuditLog).where(AuditLog.id.in_(ids.scalar_subquery()))).rowcount
+        if deleted < batch_size:
+            return
+
+
+def _drop_partition(month):
+    with db.engine.begin() as connection:
+        name = partition_name(month)
+        if not _table_exists(connection, name):
+            return False
+        connection.execute(text(f"DROP TABLE {name}"))
+    return True
+
+
+def _expired_months(connection, cutoff):
+    oldest = connection.execute(select(func.min(AuditLog.timestamp)).where(AuditLog.timestamp < cutoff)).scalar()
+    month = month_start(oldest) if oldest else None
+    while month is not None and month < cutoff:
+        yield month, min(next_month(month), cutoff)
+        month = next_month(month)
+
+
+def archive_audit_logs(retention_days, directory, batch_size=10000, months_ahead=3, dry_run=False):
+    """Move rows older than ``retention_days`` to the archive; returns [ArchivedMonth]"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    if not dry_run:
+        os.makedirs(directory, exist_ok=True)
+
+    with db.engine.begin() as connection:
+        partitioned = is_partitioned(connection)
+        if partitioned and not dry_run:
+            for name in ensure_partitions(connection, months_ahead):
+                logger.info("Created audit log partition %s", name)
+
+    archived = []
+    with db.engine.connect() as connection:
+        months = list(_expired_months(connection, cutoff))
+        for lower, upper in months:
+            if dry_run:
+                rows = connection.execute(select(func.count()).select_from(AuditLog).where(
+                    AuditLog.timestamp >= lower, AuditLog.timestamp < upper)).scalar()
+                archived.append(ArchivedMonth(lower, rows, None, False))
+                continue
+
+            path, rows, last = _write_month(connection, directory, lower, upper, batch_size)
+            connection.rollback()
+            if not rows:
+                continue
+
+            # A month entirely past retention goes with its partition; rows
+            # outside one (the DEFAULT partition, SQLite) are deleted in batches
+            dropped = partitioned and upper == next_month(lower) and _drop_partition(lower)
+            _delete_archived(lower, upper, last, batch_size)
+
+            logger.info("Archived %s audit log rows from %s to %s", rows, f'{lower:%Y-%m}', path)
+            archived.append(ArchivedMonth(lower, rows, path, dropped))
+    return archived
+
+
+# Search
+
+def _conditions(lower, upper, user_id, action, entity_type, before):
+    conditions = []
+    if lower is not None:
+        conditions.append(AuditLog.timestamp >= lower)
+    if upper is not None:
+        conditions.append(AuditLog.timestamp < upper)
+    if user_id is not None:
+        conditions.append(AuditLog.user_id == user_id)
+    if action:
+        conditions.append(AuditLog.action == action)
+    if entity_type:
+        conditions.append(AuditLog.entity_type == entity_type)
+    if before is not None:
+        conditions.append(_sort_key() < tuple(before))
+    return conditions
+
+
+def _entry_key(entry):
+    return entry.timestamp, entry.id
+
+
+def _matches(entry, lower, upper, user_id, action, entity_type, before):
+    return ((lower is None or entry.timestamp >= lower)
+            and (upper is None or entry.timestamp < upper)
+            and (user_id is None or entry.user_id == user_id)
+            and (not action or entry.action == action)
+            and (not entity_type or entry.entity_type == entity_type)
+            and (before is None or _entry_key(entry) < tuple(before)))
+
+
+def search_audit_logs(directory, start=None, end=None, user_id=None, action=None, entity_type=None,
+                      before=None, per_page=50):
+    """Newest-first audit entries from the hot table, then from the archive.
+
+    ``start`` and ``end`` are inclusive dates; ``before`` is the (timestamp,
+    id) of the last entry already shown. Returns (entries, key to pass as
+    ``before`` for the next page, or None on the last page).
+    """
+    lower = datetime.combine(start, time.min) if start else None
+    upper = datetime.combine(end + timedelta(days=1), time.min) if end else None
+    filters = (lower, upper, user_id, action, entity_type, before)
+    wanted = per_page + 1
+
+    statement = select(*_columns()).where(*_conditions(*filters))\
+        .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(wanted)
+    entries = [AuditEntry(*row, archived=False) for row in db.session.execute(statement)]
+
+    if len(entries) < wanted:
+        seen = {entry.id for entry in entries}
+        # Months never overlap, so once a month fills the page older ones cannot rank higher
+        for month, paths in sorted(archive_files(directory).items(), reverse=True):
+            if (upper is not None and month >= upper) or (lower is not None and next_month(month) <= lower) \
+                    or (before is not None and month > before[0]):
+                continue
+            for path in paths:
+                for entry in read_archive(path):
+                    if entry.id not in seen and _matches(entry, *filters):
+                        seen.add(entry.id)
+                        entries.append(entry)
+            if len(entries) >= wanted:
+                break
+        entries.sort(key=_entry_key, reverse=True)
+
+    more = len(entries) > per_page
+    entries = entries[:per_page]
+    return entries, (_entry_key(entries[-1]) if more else None)
@@ -0,0 +1,116 @@
+"""Set-based leave balance allocation and year-end rollover.
+
+``allocate_year_balances(year)`` creates the missing ``LeaveBalance`` rows for
+every active user with one ``INSERT ... SELECT`` per leave type, instead of a
+query and commit per user. ``rollover_year(from_year)`` does the same for
+``from_year + 1`` and carries unused days forward: each new row gets the
+leave type's ``max_days_per_year`` plus the old year's available days,
+capped at the type's ``max_carry_forward_days``.
+
+Both are idempotent and resumable. Rows that already exist are skipped by
+the ``NOT EXISTS`` guard (and the unique constraint backs it up), and each
+leave type commits separately. Re-running after an interruption, or after
+new staff join, only fills the gaps.
+"""
+
+from sqlalchemy import and_, case, exists, func, insert, literal, select
+from sqlalchemy.orm import aliased
+
+from app import db
+from models import LeaveBalance, LeaveType, User
+
+
+def _applicable_users(leave_type, role=None, user_ids=None):
+    conditions = [User.is_active == True]
+    staff_types = []
+    if leave_type.applicable_to_teaching:
+        staff_types.append('teaching')
+    if leave_type.applicable_to_non_teaching:
+        staff_types.append('non_teaching')
+    conditions.append(User.staff_type.in_(staff_types))
+    if role is not None:
+        conditions.append(User.role == role)
+    if user_ids is not None:
+        conditions.append(User.id.in_(user_ids))
+    return and_(*conditions)
+
+
+def _allocation_select(leave_type, year, carry_from=None, role=None, user_ids=None):
+    """SELECT producing one new balance row per user that lacks one for ``year``"""
+    existing = aliased(LeaveBalance)
+    missing = ~exists().where(
+        existing.user_id == User.id,
+        existing.leave_type_id == leave_type.id,
+        existing.year == year
+    )
+
+    base_days = leave_type.max_days_per_year or 0
+    cap = leave_type.max_carry_forward_days or 0
+
+    if carry_from is None or cap <= 0:
+        carried = literal(0)
+        source = select(User.id)
+    else:
+        previous = aliased(LeaveBalance)
+        unused = func.coalesce(
+            previous.allocated_days - previous.used_days - previous.pending_days, 0)
+        carried = case((unused >= cap, cap), (unused > 0, unused), else_=0)
+        source = select(User.id).outerjoin(previous, and_(
+            previous.user_id == User.id,
+            previous.leave_type_id == leave_type.id,
+            previous.year == carry_from
+        ))
+
+    return source.add_columns(
+        literal(leave_type.id),
+        literal(year),
+        literal(base_days) + carried,
+        literal(0),
+        literal(0),
+        carried,
+    ).where(_applicable_users(leave_type, role, user_ids), missing)
+
+
+def _insert_columns():
+    return ['user_id', 'leave_type_id', 'year', 'allocated_days', 'used_days', 'pending_days',
+            'carried_forward_days']
+
+
+def allocate_year_balances(year, carry_from=None, role=None, dry_run=False):
+    """Create missing balances for ``year``; returns {leave type name: rows}"""
+    created = {}
+    for leave_type in LeaveType.query.filter_by(is_active=True).order_by(LeaveType.id).all():
+        stmt = _allocation_select(leave_type, year, carry_from=carry_from, role=role)
+
+        if dry_run:
+            created[leave_type.name] = db.session.execute(
+                select(func.count()).select_from(stmt.subquery())).scalar()
+            continue
+
+        result = db.session.execute(insert(LeaveBalance).from_select(_insert_columns(), stmt))
+        db.session.commit()
+        created[leave_type.name] = result.rowcount
+    return created
+
+
+def allocate_user_balances(user_ids, year):
+    """Add ``year`` balances for the given users to the current transaction.
+
+    Used by the bulk staff import so new users and their balances commit
+    together; returns the number of rows inserted.
+    """
+    created = 0
+    for leave_type in LeaveType.query.filter_by(is_active=True).order_by(LeaveType.id).all():
+        stmt = _allocation_select(leave_type, year, user_ids=user_ids)
+        created += db.session.execute(insert(LeaveBalance).from_select(_insert_columns(), stmt)).rowcount
+    return created
+
+
+def rollover_year(from_year, dry_run=False):
+    """Allocate ``from_year + 1`` balances, carrying unused days forward"""
+    return allocate_year_balances(from_year + 1, carry_from=from_year, dry_run=dry_run)
+
+
+def unsettled_balances(year):
+    """Number of balances in ``year`` still holding pending days"""
+    return LeaveBalance.query.filter(LeaveBalance.year == year, LeaveBalance.pending_days != 0).count()
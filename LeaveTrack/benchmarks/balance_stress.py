@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress check for the leave service balance updates.
+
+Many threads submit one-day applications against a single LeaveBalance, then
+race to approve, reject and cancel them (every application is targeted by
+several threads at once). Afterwards the balance must satisfy:
+
+  * pending_days + used_days never exceeds allocated_days
+  * accepted submissions == min(attempts, allocated_days)
+  * every application was decided exactly once
+  * used_days == approved days and pending_days == 0 at the end
+
+Usage: python benchmarks/balance_stress.py [--threads 16] [--attempts 200]
+Uses a throwaway SQLite file unless --database-url (or DATABASE_URL) is set.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--attempts', type=int, default=200, help='number of applications to submit')
+    parser.add_argument('--allocated', type=int, default=120, help='days allocated on the balance')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    return parser.parse_args()
+
+
+def with_retry(fn, retries=20):
+    """Retry on transient lock errors (SQLite 'database is locked', PG serialization)"""
+    from sqlalchemy.exc import OperationalError
+    from app import db
+
+    for attempt in range(retries):
+        try:
+            return fn()
+        except OperationalError:
+            db.session.rollback()
+            time.sleep(0.01 * (attempt + 1))
+    raise RuntimeError('gave up after repeated lock errors')
+
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='leave-stress-'), 'stress.db')
+    os.environ.setdefault('NOTIFICATION_DISPATCHER', 'off')
+
+    import logging
+    from app import create_app, db
+    from migrations import init_db
+    from models import User, LeaveType, LeaveBalance, LeaveApplication
+    from leave_service import (LeaveServiceError, InsufficientBalanceError, submit_application,
+                               decide_application, cancel_application)
+
+    app = create_app()
+
+    logging.disable(logging.WARNING)
+    year = date.today().year + 1
+
+    with app.app_context():
+        init_db()
+        user = User(employee_id=f'STRESS{random.randint(0, 10**6)}', email=f'stress{random.random()}@college.edu',
+                    first_name='Stress', last_name='Test', department='QA', designation='Bot',
+                    staff_type='teaching', password_hash='x')
+        admin = User(employee_id=f'STRADM{random.randint(0, 10**6)}', email=f'admin{random.random()}@college.edu',
+                     first_name='Stress', last_name='Admin', department='QA', designation='Bot',
+                     staff_type='non_teaching', role='admin', password_hash='x')
+        leave_type = LeaveType(name=f'Stress Leave {random.random()}', max_days_per_year=args.allocated)
+        db.session.add_all([user, admin, leave_type])
+        db.session.flush()
+        db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year,
+                                    allocated_days=args.allocated))
+        db.session.commit()
+        user_id, admin_id, leave_type_id = user.id, admin.id, leave_type.id
+
+    weekdays = [day for day in (date(year, 1, 1) + timedelta(n) for n in range(366))
+                if day.year == year and day.weekday() < 5][:args.attempts]
+
+    def submit(day):
+        with app.app_context():
+            try:
+                with_retry(lambda: submit_application(db.session.get(User, user_id), leave_type_id, day, day,
+                                                      'Concurrency stress test'))
+                return 'accepted'
+            except InsufficientBalanceError:
+                return 'insufficient'
+            finally:
+                db.session.remove()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        outcomes = list(pool.map(submit, weekdays))
+    submit_seconds = time.perf_counter() - started
+    accepted = outcomes.count('accepted')
+
+    with app.app_context():
+        balance = LeaveBalance.query.filter_by(user_id=user_id, leave_type_id=leave_type_id, year=year).one()
+        after_submit = (balance.pending_days, balance.used_days)
+        application_ids = [a.id for a in LeaveApplication.query.filter_by(user_id=user_id, status='pending')]
+
+    actions = []
+    for application_id in application_ids:
+        actions.extend([(application_id, 'approved'), (application_id, 'rejected'), (application_id, 'cancelled')])
+    random.shuffle(actions)
+
+    def decide(action):
+        application_id, status = action
+        with app.app_context():
+            try:
+                def run():
+                    application = db.session.get(LeaveApplication, application_id)
+                    if status == 'cancelled':
+                        cancel_application(application, user_id)
+                    else:
+                        decide_application(application, status, admin_id,
+                                           rejection_reason='stress' if status == 'rejected' else None)
+                with_retry(run)
+                return status
+            except LeaveServiceError:
+                return 'lost-race'
+            finally:
+                db.session.remove()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        decisions = list(pool.map(decide, actions))
+    decide_seconds = time.perf_counter() - started
+
+    with app.app_context():
+        balance = LeaveBalance.query.filter_by(user_id=user_id, leave_type_id=leave_type_id, year=year).one()
+        applications = LeaveApplication.query.filter_by(user_id=user_id).all()
+        approved_days = sum(a.total_days for a in applications if a.status == 'approved')
+        still_pending = sum(1 for a in applications if a.status == 'pending')
+
+        checks = {
+            'accepted == min(attempts, allocated)': accepted == min(len(weekdays), args.allocated),
+            'pending after submit == accepted': after_submit == (accepted, 0),
+            'pending + used <= allocated': after_submit[0] + after_submit[1] <= balance.allocated_days,
+            'each application decided once': len(decisions) - decisions.count('lost-race') == len(application_ids),
+            'no application left pending': still_pending == 0,
+            'used_days == approved days': balance.used_days == approved_days,
+            'pending_days == 0': balance.pending_days == 0,
+        }
+
+    print(f"Submitted {len(weekdays)} applications on {args.threads} threads in {submit_seconds:.2f}s "
+          f"({accepted} accepted, {outcomes.count('insufficient')} rejected for balance)")
+    print(f"Raced {len(actions)} decide/cancel calls in {decide_seconds:.2f}s "
+          f"({decisions.count('lost-race')} lost the race as expected)")
+    print(f"Final balance: allocated={balance.allocated_days} used={balance.used_days} "
+          f"pending={balance.pending_days}")
+    for name, passed in checks.items():
+        print(f"  {'✓' if passed else '✗'} {name}")
+
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: how long a fresh process takes to serve its first request.
+
+Each run starts a new interpreter and records, in seconds:
+
+  * import        - ``import app`` (extension objects only)
+  * create_app    - building the app: models, blueprints, services
+  * warm_up       - warmup.warm_up(), as gunicorn's master runs it before forking
+  * first_request - the first GET of the login page (template compilation etc.)
+  * next_request  - the same request again, for comparison
+  * total         - wall time of the whole process, interpreter start included
+
+Runs alternate between a "cold" process (no warm-up, like a worker that
+loads the app itself) and a "warm" one (warm-up first, like a worker forked
+from a preloaded master); medians are reported for both.
+
+Usage: python benchmarks/cold_start.py [--runs 5] [--output results.json]
+Uses a throwaway SQLite file initialised with ``flask init-db`` unless
+--database-url (or DATABASE_URL) is set.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+timings = {'import': time.perf_counter() - started}
+
+mark = time.perf_counter()
+application = app_module.create_app({'WTF_CSRF_ENABLED': False})
+timings['create_app'] = time.perf_counter() - mark
+
+if sys.argv[1] == 'warm':
+    from warmup import warm_up
+    mark = time.perf_counter()
+    warm_up(application)
+    timings['warm_up'] = time.perf_counter() - mark
+
+client = application.test_client()
+for name in ('first_request', 'next_request'):
+    mark = time.perf_counter()
+    assert client.get('/auth/login').status_code == 200
+    timings[name] = time.perf_counter() - mark
+print(json.dumps(timings))
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='processes per mode')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    return parser.parse_args()
+
+
+def run_child(mode, env):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD, mode], cwd=APP_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['total'] = time.perf_counter() - started
+    return timings
+
+
+def main():
+    args = parse_args()
+    env = dict(os.environ, NOTIFICATION_DISPATCHER='off', LOG_LEVEL='WARNING')
+    env['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='leave-cold-'), 'cold.db')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'], cwd=APP_DIR, env=env,
+                   capture_output=True, check=True)
+
+    samples = {'cold': [], 'warm': []}
+    for _ in range(args.runs):
+        for mode in samples:
+            samples[mode].append(run_child(mode, env))
+
+    results = {}
+    for mode, runs in samples.items():
+        results[mode] = {phase: round(statistics.median(run[phase] for run in runs) * 1000, 1)
+                         for phase in runs[0]}
+        print(f"{mode:>5}: " + ', '.join(f"{phase} {ms} ms" for phase, ms in results[mode].items()))
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump({'runs': args.runs, 'median_ms': results}, handle, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
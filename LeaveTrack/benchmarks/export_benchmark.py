@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Memory/throughput benchmark for the streaming leave report export.
+
+Seeds --rows leave applications (default one million) spread over a few
+hundred staff, then exports them:
+
+  * streaming: reports.iter_csv(iter_leave_report()) written to /dev/null
+  * eager (--compare-eager): the old approach, LeaveApplication.query.all()
+    followed by a CSV write, for contrast
+
+For each run it prints rows/s and the peak resident set size growth over
+the baseline taken just before the export started. The streaming export
+should stay at a few MB regardless of --rows.
+
+Usage: python benchmarks/export_benchmark.py [--rows 1000000] [--compare-eager]
+Uses a throwaway SQLite file unless --database-url (or DATABASE_URL) is set.
+"""
+
+import argparse
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--staff', type=int, default=500)
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+    parser.add_argument('--compare-eager', action='store_true', help='also time the old .all() approach')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    return parser.parse_args()
+
+
+def current_rss():
+    """Resident set size in bytes (Linux /proc, ru_maxrss elsewhere)"""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRSS:
+    """Samples RSS in a background thread while the block runs"""
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    @property
+    def growth_mb(self):
+        return (self.peak - self.baseline) / 1024 / 1024
+
+
+def seed(db, rows, staff):
+    from sqlalchemy import insert
+    from models import User, LeaveType, LeaveApplication
+
+    leave_types = [LeaveType(name=name, max_days_per_year=12)
+                   for name in ('Casual Leave', 'Medical Leave', 'Earned Leave')]
+    db.session.add_all(leave_types)
+    db.session.execute(insert(User), [{
+        'employee_id': f'BENCH{n:05}', 'email': f'bench{n}@college.edu', 'password_hash': 'x',
+        'first_name': f'Staff{n}', 'last_name': 'Bench', 'department': f'Dept {n % 12}',
+        'designation': 'Lecturer', 'staff_type': 'teaching' if n % 3 else 'non_teaching',
+    } for n in range(staff)])
+    db.session.commit()
+
+    user_ids = [row[0] for row in db.session.query(User.id)]
+    type_ids = [leave_type.id for leave_type in leave_types]
+    statuses = ['approved', 'approved', 'rejected', 'pending', 'cancelled']
+    start = datetime(2015, 1, 1)
+
+    batch = []
+    for n in range(rows):
+        first_day = date(2015, 1, 1) + timedelta(days=n % 3650)
+        batch.append({
+            'user_id': random.choice(user_ids), 'leave_type_id': random.choice(type_ids),
+            'start_date': first_day, 'end_date': first_day + timedelta(days=n % 3),
+            'total_days': n % 3 + 1, 'reason': 'Benchmark row', 'status': random.choice(statuses),
+            'applied_at': start + timedelta(minutes=n * 5),
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(LeaveApplication), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(insert(LeaveApplication), batch)
+        db.session.commit()
+
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='leave-export-'), 'export.db')
+    os.environ.setdefault('NOTIFICATION_DISPATCHER', 'off')
+
+    import logging
+    from app import create_app, db
+    from migrations import init_db
+    from models import LeaveApplication
+    from reports import REPORT_COLUMNS, iter_csv, iter_leave_report, iter_xlsx
+
+    app = create_app()
+
+    logging.disable(logging.WARNING)
+
+    with app.app_context():
+        init_db()
+        started = time.perf_counter()
+        seed(db, args.rows, args.staff)
+        print(f"Seeded {args.rows:,} applications in {time.perf_counter() - started:.1f}s")
+
+    with app.app_context(), open(os.devnull, 'w' if args.format == 'csv' else 'wb') as sink:
+        encode = iter_csv if args.format == 'csv' else iter_xlsx
+        started = time.perf_counter()
+        with PeakRSS() as memory:
+            for chunk in encode(iter_leave_report()):
+                sink.write(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"streaming {args.format}: {args.rows / elapsed:,.0f} rows/s ({elapsed:.1f}s), "
+              f"peak RSS growth {memory.growth_mb:.1f} MB")
+
+    if args.compare_eager:
+        with app.app_context(), open(os.devnull, 'w') as sink:
+            started = time.perf_counter()
+            with PeakRSS() as memory:
+                writer = csv.writer(sink)
+                writer.writerow([header for header, _ in REPORT_COLUMNS])
+                for application in LeaveApplication.query.order_by(LeaveApplication.applied_at).all():
+                    writer.writerow([application.id, application.applicant.employee_id,
+                                     application.applicant.first_name, application.applicant.last_name,
+                                     application.applicant.department, application.applicant.staff_type,
+                                     application.leave_type.name, application.start_date,
+                                     application.end_date, application.total_days, application.status,
+                                     application.applied_at, application.approved_at,
+                                     application.approver.employee_id if application.approver else ''])
+            elapsed = time.perf_counter() - started
+            print(f"eager .all() csv: {args.rows / elapsed:,.0f} rows/s ({elapsed:.1f}s), "
+                  f"peak RSS growth {memory.growth_mb:.1f} MB")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
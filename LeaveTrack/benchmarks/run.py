@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Route-level benchmark suite for the hot endpoints.
+
+Builds the app against a generated dataset (populate_demo_data.generate_dataset)
+and drives each scenario through the Flask test client, recording per route:
+
+  * throughput (sequential requests per second)
+  * p50/p95/p99, mean and max latency in milliseconds
+  * SQL statements executed per request (median, mean and max)
+
+Scenarios: dashboard.admin, dashboard.staff, leave.calendar_view (admin),
+leave.history, admin.users (search), leave.apply (POST) and leave.approve
+(POST, deciding the applications submitted by leave.apply).
+
+Results are printed and written as JSON (--output). With a baseline file
+(default benchmarks/baseline.json) each scenario is compared against it and
+the run exits non-zero when one regresses: any failed request, more queries
+per request than the baseline, or a p95 more than --latency-tolerance slower.
+Query counts are deterministic for a given dataset; latencies depend on the
+machine, so refresh the baseline (--update-baseline) on the machine that
+runs the comparison.
+
+Usage: python benchmarks/run.py [--users 2000] [--applications 100000] [--requests 100]
+                                [--output results.json] [--baseline PATH] [--update-baseline]
+Uses a throwaway SQLite file unless --database-url (or DATABASE_URL) is set;
+a database that already holds staff is reused as-is.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_EMPLOYEE_ID = 'BENCHAPPLY'
+BENCH_PASSWORD = 'bench-password'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--applications', type=int, default=100_000)
+    parser.add_argument('--audit-logs', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=3 * 365, help='days of generated history')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='unmeasured requests per scenario')
+    parser.add_argument('--scenario', action='append', help='only run these scenarios (repeatable)')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', default=os.path.join(BENCHMARKS_DIR, 'baseline.json'))
+    parser.add_argument('--update-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--latency-tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown over the baseline (0.25 = 25%%)')
+    parser.add_argument('--query-tolerance', type=float, default=0,
+                        help='allowed extra queries per request over the baseline')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    return parser.parse_args()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class QueryCounter:
+    """Counts statements sent to the database through an engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_dataset(args, app, db):
+    """Generate the dataset unless the database already holds staff"""
+    import populate_demo_data
+    from migrations import init_db
+    from models import User
+
+    with app.app_context():
+        # Through the migrations, so the search index and later indexes exist as in production
+        init_db()
+        populate_demo_data.create_admin_user()
+        populate_demo_data.create_leave_types()
+        db.session.commit()
+
+        if User.query.filter_by(role='staff').count() > 1:
+            print("Reusing the existing dataset")
+        else:
+            started = time.perf_counter()
+            populate_demo_data.generate_dataset(users=args.users, applications=args.applications,
+                                                audit_logs=args.audit_logs, days=args.days, seed=args.seed,
+                                                batch_size=10000)
+            print(f"Generated dataset in {time.perf_counter() - started:.1f}s")
+
+        return prepare_bench_user(db)
+
+
+def prepare_bench_user(db):
+    """A staff member with ample balance for the leave.apply scenario"""
+    from werkzeug.security import generate_password_hash
+    from models import LeaveBalance, LeaveType, User
+
+    user = User.query.filter_by(employee_id=BENCH_EMPLOYEE_ID).first()
+    if user is None:
+        user = User(employee_id=BENCH_EMPLOYEE_ID, email='bench.apply@college.edu', first_name='Bench',
+                    last_name='Applicant', department='Computer Science Engineering',
+                    designation='Lecturer', staff_type='teaching',
+                    password_hash=generate_password_hash(BENCH_PASSWORD))
+        db.session.add(user)
+        db.session.flush()
+
+    leave_type = LeaveType.query.filter_by(name='Casual Leave').one()
+    for year in range(date.today().year + 1, date.today().year + 11):
+        if not LeaveBalance.query.filter_by(user_id=user.id, leave_type_id=leave_type.id, year=year).first():
+            db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year,
+                                        allocated_days=366))
+    db.session.commit()
+    return user.id, leave_type.id
+
+
+def login(app, employee_id, password):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'employee_id': employee_id, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'could not log in as {employee_id}')
+    return client
+
+
+def free_weekdays(db, user_id):
+    """Future weekdays the bench user has no application on, in date order"""
+    from models import LeaveApplication
+
+    booked = {row[0] for row in db.session.query(LeaveApplication.start_date).filter_by(user_id=user_id)}
+    first = date(date.today().year + 1, 1, 1)
+    days = (first + timedelta(days=n) for n in range((date(first.year + 10, 1, 1) - first).days))
+    return [day for day in days if day.weekday() < 5 and day not in booked]
+
+
+def build_scenarios(app, db, bench_user_id, leave_type_id):
+    """name -> (client, callable(client, i) returning a response, expected status codes)"""
+    from models import LeaveApplication, User
+
+    admin = login(app, 'ADMIN001', 'admin123')
+    with app.app_context():
+        staff_user = User.query.filter_by(role='staff').filter(User.employee_id != BENCH_EMPLOYEE_ID) \
+            .order_by(User.id).first()
+        surnames = sorted({row[0] for row in db.session.query(User.last_name).filter_by(role='staff').limit(500)})
+        days = iter(free_weekdays(db, bench_user_id))
+    staff = login(app, staff_user.employee_id, 'password123')
+    applicant = login(app, BENCH_EMPLOYEE_ID, BENCH_PASSWORD)
+    search_terms = [term for name in surnames for term in (name, name[:3].lower())] or ['a']
+
+    def apply(client, i):
+        day = next(days)
+        return client.post('/leave/apply', data={
+            'leave_type_id': leave_type_id, 'start_date': day.isoformat(), 'end_date': day.isoformat(),
+            'reason': 'Benchmark leave application', 'contact_during_leave': '9000000000',
+        })
+
+    pending_ids = []
+
+    def approve(client, i):
+        if not pending_ids:
+            with app.app_context():
+                pending_ids.extend(row[0] for row in db.session.query(LeaveApplication.id).filter_by(
+                    user_id=bench_user_id, status='pending').order_by(LeaveApplication.id.desc()))
+        if not pending_ids:
+            raise RuntimeError('no pending applications left to approve; run leave.apply first')
+        return client.post(f'/leave/approve/{pending_ids.pop()}', data={
+            'status': 'approved', 'comments': 'Benchmark approval'})
+
+    return {
+        'dashboard.admin': (admin, lambda client, i: client.get('/dashboard/admin'), {200}),
+        'dashboard.staff': (staff, lambda client, i: client.get('/dashboard/staff'), {200}),
+        'leave.calendar_view': (admin, lambda client, i: client.get('/leave/calendar'), {200}),
+        'leave.history': (staff, lambda client, i: client.get('/leave/history'), {200}),
+        'admin.users': (admin, lambda client, i: client.get(
+            '/admin/users', query_string={'search': search_terms[i % len(search_terms)]}), {200}),
+        'leave.apply': (applicant, apply, {302}),
+        'leave.approve': (admin, approve, {302}),
+    }
+
+
+def run_scenario(client, request, expected, counter, requests, warmup):
+    for i in range(warmup):
+        request(client, i)
+
+    latencies, queries, errors = [], [], 0
+    started = time.perf_counter()
+    for i in range(warmup, warmup + requests):
+        counter.count = 0
+        request_started = time.perf_counter()
+        response = request(client, i)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        queries.append(counter.count)
+        if response.status_code not in expected:
+            errors += 1
+        response.close()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'mean': round(sum(latencies) / len(latencies), 2),
+            'max': round(latencies[-1], 2),
+        },
+        'queries_per_request': {
+            'median': percentile(sorted(queries), 50),
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries),
+        },
+    }
+
+
+def compare(results, baseline, latency_tolerance, query_tolerance):
+    """Regression messages for scenarios present in both runs"""
+    regressions = []
+    for name, result in results.items():
+        if result['errors']:
+            regressions.append(f"{name}: {result['errors']} request(s) returned an unexpected status")
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        # The median ignores the odd request that refreshes a cache
+        queries, allowed = result['queries_per_request']['median'], previous['queries_per_request']['median']
+        if queries > allowed + query_tolerance:
+            regressions.append(f"{name}: {queries} queries per request, baseline {allowed}")
+        p95, baseline_p95 = result['latency_ms']['p95'], previous['latency_ms']['p95']
+        # The 1 ms floor keeps sub-millisecond noise from failing fast routes
+        if p95 > baseline_p95 * (1 + latency_tolerance) and p95 - baseline_p95 > 1:
+            regressions.append(f"{name}: p95 {p95} ms, baseline {baseline_p95} ms "
+                               f"(+{(p95 / baseline_p95 - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f"{'scenario':<22}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'base p95':>10}{'base q':>8}")
+    for name, result in results.items():
+        latency, previous = result['latency_ms'], baseline.get(name)
+        base_p95 = f"{previous['latency_ms']['p95']:.1f}" if previous else '-'
+        base_queries = f"{previous['queries_per_request']['median']:g}" if previous else '-'
+        print(f"{name:<22}{result['throughput_rps']:>9.1f}{latency['p50']:>9.1f}{latency['p95']:>9.1f}"
+              f"{latency['p99']:>9.1f}{result['queries_per_request']['median']:>9g}{base_p95:>10}{base_queries:>8}")
+
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix='leave-bench-'), 'bench.db')
+    os.environ.setdefault('NOTIFICATION_DISPATCHER', 'off')
+
+    import logging
+    from app import create_app, db
+
+    app = create_app({'WTF_CSRF_ENABLED': False})
+
+    logging.disable(logging.WARNING)
+
+    bench_user_id, leave_type_id = prepare_dataset(args, app, db)
+    scenarios = build_scenarios(app, db, bench_user_id, leave_type_id)
+    selected = args.scenario or list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        print(f"Unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(scenarios)}")
+        return 2
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        database = db.engine.dialect.name
+
+    results = {}
+    for name in selected:
+        client, request, expected = scenarios[name]
+        print(f"Running {name}...", end=' ', flush=True)
+        started = time.perf_counter()
+        results[name] = run_scenario(client, request, expected, counter, args.requests, args.warmup)
+        print(f"{time.perf_counter() - started:.1f}s")
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)['results']
+
+    print_table(results, baseline)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': database,
+            'dataset': {'users': args.users, 'applications': args.applications,
+                        'audit_logs': args.audit_logs, 'days': args.days, 'seed': args.seed},
+            'requests': args.requests,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.latency_tolerance, args.query_tolerance)
+    for message in regressions:
+        print(f"  ✗ {message}")
+    if not baseline:
+        print("No baseline to compare against (use --update-baseline to store one)")
+    elif not regressions:
+        print("  ✓ No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Write-concurrency benchmark for the SQLite connection profile (sqlite_profile.py).
+
+Simulates several gunicorn workers sharing one SQLite file: --writers
+processes each submit --requests leave applications through POST
+/leave/apply (as their own staff member, so there are no logical
+conflicts), while --readers processes keep loading the staff dashboard.
+Every profile runs against a fresh database file:
+
+  * default - SQLite's own settings (rollback journal, synchronous=FULL,
+              deferred transactions, the driver's 5 s lock timeout)
+  * tuned   - the profile the app ships with (WAL, synchronous=NORMAL,
+              busy_timeout, mmap, cache_size, BEGIN IMMEDIATE before writes)
+
+and reports write throughput, write latency percentiles, failed writes
+(mostly "database is locked") and dashboard reads per second.
+
+Usage: python benchmarks/sqlite_concurrency.py [--writers 4] [--readers 2] [--requests 100]
+                                               [--profile default --profile tuned] [--output results.json]
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROFILES = ('default', 'tuned')
+PASSWORD = 'bench-password'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4, help='processes submitting applications')
+    parser.add_argument('--readers', type=int, default=2, help='processes loading the dashboard')
+    parser.add_argument('--requests', type=int, default=100, help='applications per writer')
+    parser.add_argument('--profile', action='append', choices=PROFILES, help='profiles to run (repeatable)')
+    parser.add_argument('--output', help='write results JSON here')
+    return parser.parse_args()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def make_app(profile):
+    from app import create_app
+    return create_app({'WTF_CSRF_ENABLED': False, 'PROPAGATE_EXCEPTIONS': False,
+                       'SQLITE_TUNING': profile == 'tuned', 'SQLITE_MAINTENANCE_INTERVAL': 0})
+
+
+def prepare(profile, staff):
+    """Fresh database with one leave type and ``staff`` staff members; returns their employee ids"""
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from migrations import init_db
+    from models import LeaveBalance, LeaveType, User
+
+    app = make_app(profile)
+    year = date.today().year
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    with app.app_context():
+        init_db()
+        leave_type = LeaveType(name='Casual Leave', max_days_per_year=5000)
+        users = [User(employee_id=f'CONC{n:03}', email=f'conc{n}@college.edu', password_hash=password_hash,
+                      first_name=f'Writer{n}', last_name='Bench', department='QA', designation='Bot',
+                      staff_type='teaching') for n in range(staff)]
+        db.session.add(leave_type)
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=y,
+                                        allocated_days=5000)
+                           for user in users for y in (year, year + 1))
+        db.session.commit()
+        leave_type_id, employee_ids = leave_type.id, [user.employee_id for user in users]
+        db.engine.dispose()
+    return leave_type_id, employee_ids
+
+
+def login(app, employee_id):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'employee_id': employee_id, 'password': PASSWORD})
+    assert response.status_code == 302, f'login failed for {employee_id}'
+    return client
+
+
+def working_days_from(start):
+    day = start
+    while True:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def writer(profile, employee_id, leave_type_id, requests, start, results):
+    import logging
+    logging.disable(logging.CRITICAL)
+    app = make_app(profile)
+    client = login(app, employee_id)
+    days = working_days_from(date.today() + timedelta(days=1))
+    latencies, failures = [], 0
+
+    start.wait()
+    for _ in range(requests):
+        day = next(days).isoformat()
+        started = time.perf_counter()
+        response = client.post('/leave/apply', data={
+            'leave_type_id': leave_type_id, 'start_date': day, 'end_date': day,
+            'reason': 'Concurrency benchmark application'})
+        latencies.append(time.perf_counter() - started)
+        # Success redirects to the history page; errors return 500 or re-render the form
+        failures += response.status_code != 302
+    results.put(('write', latencies, failures))
+
+
+def reader(profile, employee_id, start, stop, results):
+    import logging
+    logging.disable(logging.CRITICAL)
+    app = make_app(profile)
+    client = login(app, employee_id)
+    reads = failures = 0
+
+    start.wait()
+    started = time.perf_counter()
+    while not stop.is_set():
+        failures += client.get('/dashboard/staff').status_code != 200
+        reads += 1
+    results.put(('read', reads / (time.perf_counter() - started), failures))
+
+
+def run_profile(profile, args):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(
+        tempfile.mkdtemp(prefix=f'leave-sqlite-{profile}-'), 'bench.db')
+    leave_type_id, employee_ids = prepare(profile, args.writers + args.readers)
+
+    context = multiprocessing.get_context('fork')
+    start, stop, results = context.Event(), context.Event(), context.Queue()
+    writers = [context.Process(target=writer, args=(profile, employee_ids[n], leave_type_id, args.requests,
+                                                    start, results))
+               for n in range(args.writers)]
+    readers = [context.Process(target=reader, args=(profile, employee_ids[args.writers + n], start, stop, results))
+               for n in range(args.readers)]
+    for process in writers + readers:
+        process.start()
+
+    time.sleep(1.0)  # let every process log in before the clock starts
+    started = time.perf_counter()
+    start.set()
+    collected = [results.get() for _ in writers]
+    elapsed = time.perf_counter() - started
+    stop.set()
+    collected += [results.get() for _ in readers]
+    for process in writers + readers:
+        process.join()
+
+    latencies = [seconds for kind, values, _ in collected if kind == 'write' for seconds in values]
+    write_failures = sum(failures for kind, _, failures in collected if kind == 'write')
+    return {
+        'writes': len(latencies),
+        'failed_writes': write_failures,
+        'writes_per_second': round((len(latencies) - write_failures) / elapsed, 1),
+        'write_p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'write_p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'write_max_ms': round(max(latencies) * 1000, 1),
+        'reads_per_second': round(sum(rate for kind, rate, _ in collected if kind == 'read'), 1),
+        'failed_reads': sum(failures for kind, _, failures in collected if kind == 'read'),
+    }
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault('NOTIFICATION_DISPATCHER', 'off')
+    os.environ.setdefault('METRICS_ENABLED', 'false')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    results = {}
+    for profile in args.profile or PROFILES:
+        print(f"Running {profile} ({args.writers} writers x {args.requests}, {args.readers} readers)...", flush=True)
+        results[profile] = run_profile(profile, args)
+
+    columns = ('writes_per_second', 'write_p50_ms', 'write_p95_ms', 'write_max_ms', 'failed_writes',
+               'reads_per_second', 'failed_reads')
+    print(f"\n{'profile':<10}" + ''.join(f"{column:>18}" for column in columns))
+    for profile, row in results.items():
+        print(f"{profile:<10}" + ''.join(f"{row[column]:>18}" for column in columns))
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump({'writers': args.writers, 'readers': args.readers, 'requests': args.requests,
+                       'results': results}, handle, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Small in-process caches shared by the views.
+
+Every gunicorn worker keeps its own copy, so entries also carry a TTL that
+bounds how long a worker can serve a value another worker has changed.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class SnapshotCache:
+    """Caches the result of ``loader(key)`` for one key at a time.
+
+    Writers either ``invalidate()`` the snapshot or ``adjust()`` its counters
+    in place when they know the exact delta, which keeps the snapshot warm.
+    Both bump a generation number; a load that was already running when the
+    generation changed may predate the write, so its result is returned to
+    its caller but not stored.
+    """
+
+    def __init__(self, loader, ttl=60):
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._key = None
+        self._value = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key=None):
+        with self._lock:
+            if (self._value is not None and self._key == key
+                    and time.monotonic() - self._loaded_at < self._ttl):
+                self.hits += 1
+                return dict(self._value)
+            self.misses += 1
+            generation = self._generation
+
+        value = self._loader(key) if key is not None else self._loader()
+        with self._lock:
+            if self._generation == generation:
+                self._key = key
+                self._value = dict(value)
+                self._loaded_at = time.monotonic()
+        return dict(value)
+
+    def adjust(self, **deltas):
+        """Add deltas to cached counters; a cold cache is left cold"""
+        with self._lock:
+            self._generation += 1
+            if self._value is None:
+                return
+            for name, delta in deltas.items():
+                self._value[name] = self._value.get(name, 0) + delta
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ``ttl`` seconds after insertion."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data),
+                    'maxsize': self.maxsize, 'ttl': self.ttl}
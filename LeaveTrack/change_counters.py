@@ -0,0 +1,133 @@
+"""Change counters for conditional GETs.
+
+Every write that can change what the dashboard JSON endpoints return bumps a
+per-scope version row in ``change_counters``. A poll then costs one
+primary-key lookup: the versions form the ETag (and the latest
+``updated_at`` the Last-Modified date), and when the client already has them
+the endpoint answers 304 without running any aggregate query.
+
+The bump is only recorded on the session; the counter rows are updated after
+the business transaction commits, in a short transaction of their own.
+Updating them inside every write transaction would hold the row lock on a
+scope's single counter row until commit and serialise all writers behind it.
+A poll landing between the two commits sees the old version once and the new
+data on its next poll.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from flask import current_app, jsonify, request
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import db
+from models import ChangeCounter
+
+logger = logging.getLogger(__name__)
+
+APPLICATIONS = 'applications'
+USERS = 'users'
+HOLIDAYS = 'holidays'
+
+_PENDING_KEY = 'pending_version_bumps'
+_bump_listeners = {}
+
+
+def bump_version(*scopes):
+    """Increment the scopes' versions once the current transaction commits"""
+    db.session.info.setdefault(_PENDING_KEY, set()).update(scopes)
+
+
+def on_version_bump(scope, listener):
+    """Call ``listener()`` in this process after a commit that bumped ``scope``"""
+    _bump_listeners.setdefault(scope, []).append(listener)
+
+
+def _increment(connection, scopes):
+    counters = ChangeCounter.__table__
+    now = datetime.utcnow()
+    result = connection.execute(
+        update(counters).where(counters.c.name.in_(scopes))
+        .values(version=counters.c.version + 1, updated_at=now)
+    )
+    if result.rowcount == len(scopes):
+        return
+
+    # First change ever recorded for a scope: create its row
+    existing = set(connection.scalars(select(counters.c.name).where(counters.c.name.in_(scopes))))
+    for name in scopes:
+        if name in existing:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(counters).values(name=name, version=1, updated_at=now))
+        except IntegrityError:
+            # Another transaction created it first
+            connection.execute(
+                update(counters).where(counters.c.name == name)
+                .values(version=counters.c.version + 1, updated_at=now)
+            )
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_versions(session_):
+    scopes = session_.info.pop(_PENDING_KEY, None)
+    if not scopes:
+        return
+    try:
+        with db.engine.begin() as connection:
+            _increment(connection, sorted(scopes))
+    except SQLAlchemyError:
+        # The change itself is committed; pollers catch up on the next bump
+        logger.exception("Could not bump change counters %s", ', '.join(sorted(scopes)))
+
+    for scope in sorted(scopes):
+        for listener in _bump_listeners.get(scope, ()):
+            listener()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_version_bumps(session_):
+    session_.info.pop(_PENDING_KEY, None)
+
+
+def get_versions(*scopes):
+    """Map of scope to (version, updated_at); unknown scopes are (0, None)"""
+    rows = db.session.query(ChangeCounter.name, ChangeCounter.version, ChangeCounter.updated_at)\
+        .filter(ChangeCounter.name.in_(scopes)).all()
+    versions = {name: (0, None) for name in scopes}
+    versions.update({row.name: (row.version, row.updated_at) for row in rows})
+    return versions
+
+
+def conditional_json(scopes, build, key=''):
+    """JSON response for ``build()``, or 304 if the client's copy is current.
+
+    ``key`` distinguishes responses whose content also depends on request
+    parameters (e.g. a limit) rather than only on the scopes' data.
+    """
+    versions = get_versions(*scopes)
+    etag = '-'.join([key] + [f'{name}.{versions[name][0]}' for name in scopes]).lstrip('-')
+    updated = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    last_modified = max(updated).replace(microsecond=0, tzinfo=timezone.utc) if updated else None
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = (last_modified is not None and request.if_modified_since is not None
+                        and request.if_modified_since >= last_modified)
+
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build({name: version for name, (version, _) in versions.items()}))
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,199 @@
+"""Flask CLI commands (``flask --app main <command>``)."""
+
+import click
+
+
+def register_commands(app):
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create any missing tables, then apply pending migrations."""
+        from migrations import init_db
+
+        applied = init_db()
+        click.echo("✓ Tables created")
+        for name in applied:
+            click.echo(f"✓ Applied {name}")
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Apply pending schema migrations."""
+        from migrations import upgrade
+
+        applied = upgrade()
+        if applied:
+            for name in applied:
+                click.echo(f"✓ Applied {name}")
+        else:
+            click.echo("✓ Database is up to date")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Minify, fingerprint and precompress the CSS and JS under static/."""
+        from assets import brotli, build
+
+        report = build(app.static_folder)
+        for source, built, raw, minified, gzipped, brotlied in report:
+            sizes = f"{raw:,} -> {minified:,} B, gzip {gzipped:,} B"
+            if brotlied is not None:
+                sizes += f", brotli {brotlied:,} B"
+            click.echo(f"✓ {source} -> {built} ({sizes})")
+        if brotli is None:
+            click.echo("! brotli is not installed; only gzip variants were written")
+        click.echo(f"✓ Wrote {len(report)} asset(s) and static/dist/manifest.json")
+
+    @app.cli.command('sync-replicas')
+    def sync_replicas_command():
+        """Copy the primary SQLite database into the SQLite read replicas."""
+        from db_routing import sync_sqlite_replicas
+
+        try:
+            synced = sync_sqlite_replicas()
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        if not synced:
+            click.echo("! No replicas configured (set DATABASE_REPLICA_URLS)")
+        for key in synced:
+            click.echo(f"✓ Synced {key}")
+
+    @app.cli.command('sqlite-maintenance')
+    @click.option('--checkpoint', type=click.Choice(['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE']),
+                  default='TRUNCATE', show_default=True, help='WAL checkpoint mode.')
+    def sqlite_maintenance_command(checkpoint):
+        """Checkpoint the SQLite WAL and run PRAGMA optimize."""
+        from app import db
+        from sqlite_profile import run_maintenance
+
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException("The database is not SQLite.")
+        result = run_maintenance(db.engine, checkpoint)
+        if result['busy']:
+            click.echo("! Checkpoint could not finish; readers or a writer were active")
+        click.echo(f"✓ Checkpointed {result['checkpointed_pages']} of {result['wal_pages']} WAL page(s)")
+        click.echo("✓ Planner statistics optimized")
+
+    @app.cli.command('check-indexes')
+    @click.option('--verbose', is_flag=True, help='Print the full plan for every query.')
+    def check_indexes(verbose):
+        """EXPLAIN the hot queries and fail if any is not index-backed."""
+        from migrations import missing_indexes
+        from query_plans import check_hot_queries
+
+        missing = missing_indexes()
+        if missing:
+            click.echo(f"! Missing indexes: {', '.join(missing)} (run 'flask db-upgrade')")
+
+        failures = 0
+        for name, index_name, used, plan in check_hot_queries():
+            click.echo(f"{'✓' if used else '✗'} {name}: {index_name}")
+            if verbose or not used:
+                click.echo('    ' + plan.replace('\n', '\n    '))
+            failures += not used
+
+        if failures:
+            raise SystemExit(1)
+
+    @app.cli.command('rollover-year')
+    @click.option('--from-year', type=int, default=None, help='Year to close (default: current year).')
+    @click.option('--dry-run', is_flag=True, help='Only report how many balances would be created.')
+    def rollover_year_command(from_year, dry_run):
+        """Allocate next year's leave balances with carry-forward."""
+        from datetime import date
+        from balances import rollover_year, unsettled_balances
+
+        from_year = from_year or date.today().year
+        unsettled = unsettled_balances(from_year)
+        if unsettled:
+            click.echo(f"! {unsettled} balance(s) in {from_year} still have pending days; "
+                       f"carry-forward uses what is available now")
+
+        created = rollover_year(from_year, dry_run=dry_run)
+        verb = 'Would create' if dry_run else 'Created'
+        for name, count in created.items():
+            click.echo(f"✓ {name}: {verb.lower()} {count} balance(s) for {from_year + 1}")
+        click.echo(f"✓ {verb} {sum(created.values())} balance(s) in total")
+
+    @app.cli.command('archive-audit-logs')
+    @click.option('--retention-days', type=int, default=None,
+                  help='Keep this many days in the database (default: AUDIT_RETENTION_DAYS).')
+    @click.option('--dry-run', is_flag=True, help='Only report how many rows would be archived.')
+    def archive_audit_logs_command(retention_days, dry_run):
+        """Move audit log rows past retention into the compressed archive."""
+        from audit_archive import archive_audit_logs
+
+        if retention_days is None:
+            retention_days = app.config['AUDIT_RETENTION_DAYS']
+        if retention_days < 1:
+            raise click.ClickException("--retention-days must be at least 1.")
+
+        archived = archive_audit_logs(retention_days, app.config['AUDIT_ARCHIVE_DIR'],
+                                      batch_size=app.config['AUDIT_ARCHIVE_BATCH_SIZE'],
+                                      months_ahead=app.config['AUDIT_PARTITION_MONTHS_AHEAD'], dry_run=dry_run)
+        for month in archived:
+            if dry_run:
+                click.echo(f"✓ {month.month:%Y-%m}: would archive {month.rows} row(s)")
+            else:
+                dropped = ", partition dropped" if month.dropped_partition else ""
+                click.echo(f"✓ {month.month:%Y-%m}: archived {month.rows} row(s) to {month.path}{dropped}")
+        verb = 'Would archive' if dry_run else 'Archived'
+        click.echo(f"✓ {verb} {sum(month.rows for month in archived)} row(s) older than {retention_days} day(s)")
+
+    @app.cli.command('import-staff')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--dry-run', is_flag=True, help='Validate the file without importing anything.')
+    @click.option('--report', type=click.Path(dir_okay=False), help='Write rejected rows to this CSV file.')
+    @click.option('--workers', type=int, default=None,
+                  help='Password hashing processes (default: STAFF_IMPORT_WORKERS; 1 hashes in-process).')
+    def import_staff_command(path, dry_run, report, workers):
+        """Register staff in bulk from a CSV or JSON file."""
+        from staff_import import StaffImportError, detect_format, import_staff, read_rows
+
+        try:
+            with open(path, 'rb') as handle:
+                result = import_staff(read_rows(handle, detect_format(path)), dry_run=dry_run,
+                                      batch_size=app.config['STAFF_IMPORT_BATCH_SIZE'],
+                                      workers=workers or app.config['STAFF_IMPORT_WORKERS'])
+        except StaffImportError as e:
+            raise click.ClickException(str(e))
+
+        verb = 'Would import' if dry_run else 'Imported'
+        click.echo(f"✓ {verb} {result.imported} staff member(s)")
+        if not dry_run:
+            click.echo(f"✓ Created {result.balances} leave balance(s)")
+        if result.rejected:
+            click.echo(f"! Rejected {len(result.rejected)} row(s)")
+            if report:
+                with open(report, 'w', newline='') as handle:
+                    handle.write(result.report_csv())
+                click.echo(f"  Error report written to {report}")
+            else:
+                for rejected in result.rejected[:20]:
+                    click.echo(f"  line {rejected.line}: {rejected.reason}")
+                if len(result.rejected) > 20:
+                    click.echo("  ... use --report to see every rejected row")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Repopulate the staff search index from the users table."""
+        from app import db
+        from search import rebuild_search_index, search_backend
+
+        with db.engine.begin() as connection:
+            rebuild_search_index(connection)
+        click.echo(f"✓ Search backend: {search_backend().name}")
+
+    @app.cli.command('dispatch-notifications')
+    @click.option('--once', is_flag=True, help='Drain the outbox once and exit.')
+    def dispatch_notifications(once):
+        """Deliver queued leave notifications from the outbox."""
+        dispatcher = app.extensions['outbox_dispatcher']
+
+        if once:
+            sent, failed = dispatcher.drain()
+            click.echo(f"✓ Sent {sent} notification(s), {failed} failed")
+            return
+
+        click.echo("Dispatching notifications (Ctrl+C to stop)...")
+        try:
+            dispatcher.run_forever()
+        except KeyboardInterrupt:
+            dispatcher.stop()
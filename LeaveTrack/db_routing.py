@@ -0,0 +1,136 @@
+"""Read-replica routing for ``db.session``.
+
+Replicas are listed in ``DATABASE_REPLICA_URLS`` (comma separated) and become
+the ``replica_0``, ``replica_1``, ... entries of ``SQLALCHEMY_BINDS``. Without
+any, every statement goes to the primary as before.
+
+Per request, ``RoutingSession`` sends SELECTs to one replica when the request
+is a GET/HEAD or its view is decorated with ``@read_only``. Everything else
+stays on the primary:
+
+* flushes, INSERT/UPDATE/DELETE, ``SELECT ... FOR UPDATE`` and raw SQL;
+* views decorated with ``@use_primary`` (GET routes that write, such as
+  logout or cancelling an application, and must read what they change);
+* work outside a request (CLI commands, background threads);
+* the rest of a request once it has written, and every request from the same
+  browser session for ``REPLICA_STICKY_SECONDS`` after a write, so users see
+  their own changes even when the replicas lag behind.
+
+To try it locally with SQLite, point ``DATABASE_REPLICA_URLS`` at a second
+file and copy the primary into it with ``flask sync-replicas``; with
+PostgreSQL, use a second database kept in sync by streaming replication.
+"""
+
+import random
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_PREFIX = 'replica_'
+STICKY_KEY = '_db_primary_until'
+READ_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def replica_binds(urls):
+    """``SQLALCHEMY_BINDS`` entries for a comma-separated list of replica URLs"""
+    urls = [url.strip() for url in (urls or '').split(',') if url.strip()]
+    return {f'{REPLICA_PREFIX}{index}': url for index, url in enumerate(urls)}
+
+
+def read_only(view):
+    """Let a non-GET view read from a replica (it must not write)"""
+    view._db_read_only = True
+    return view
+
+
+def use_primary(view):
+    """Keep a view on the primary even for GET requests"""
+    view._db_use_primary = True
+    return view
+
+
+def _replica_keys(engines):
+    return [key for key in engines if key and key.startswith(REPLICA_PREFIX)]
+
+
+def _is_write(clause):
+    if isinstance(clause, UpdateBase):
+        return True
+    return isinstance(clause, Select) and clause._for_update_arg is not None
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from a replica when the request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or _is_write(clause):
+                _note_write()
+            elif isinstance(clause, Select) and g.get('db_replica') is not None:
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _note_write():
+    """Pin the rest of this request, and the session for a while, to the primary"""
+    if not g.get('db_routed'):
+        return
+    g.db_replica = None
+    session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+def _choose_route():
+    from app import db
+
+    keys = _replica_keys(db.engines)
+    g.db_replica = None
+    g.db_routed = bool(keys)
+    if not keys:
+        return
+
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, '_db_use_primary', False):
+        return
+    if request.method not in READ_METHODS and not getattr(view, '_db_read_only', False):
+        return
+    if session.get(STICKY_KEY, 0) > time.time():
+        return
+    g.db_replica = random.choice(keys)
+
+
+def current_route():
+    """'primary' or the replica bind key the current request reads from"""
+    return g.get('db_replica') or 'primary'
+
+
+def sync_sqlite_replicas():
+    """Copy the primary SQLite database into every SQLite replica; returns their bind keys"""
+    from app import db
+
+    primary = db.engines[None]
+    if primary.dialect.name != 'sqlite':
+        raise ValueError('Only SQLite replicas can be synced locally; use database replication instead.')
+
+    synced = []
+    for key in _replica_keys(db.engines):
+        replica = db.engines[key]
+        if replica.dialect.name != 'sqlite':
+            raise ValueError(f'Replica {key} is not SQLite.')
+        replica.dispose()
+        source = primary.raw_connection()
+        target = replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        synced.append(key)
+    return synced
+
+
+def init_db_routing(app):
+    """Pick the database route at the start of every request"""
+    app.before_request(_choose_route)
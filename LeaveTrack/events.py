@@ -0,0 +1,226 @@
+"""Server-Sent Events for per-user leave notifications.
+
+Approvals, rejections and cancellations already write a ``NotificationOutbox``
+row in the same transaction as the status change, so outbox ids double as
+durable, ordered event ids. Each worker process runs one feeder thread that
+reads new outbox rows (``WHERE id > :last``) and publishes them to an
+in-process broker, which fans them out to the SSE connections of the
+applicant. The leave service pokes the feeder right after committing, so
+events raised in the same process are pushed immediately; events committed
+by other processes arrive within ``SSE_POLL_INTERVAL`` seconds. Either way a
+process issues one cheap query per interval, not one per open tab.
+
+Reconnecting browsers send ``Last-Event-ID`` and the stream replays what
+they missed from the outbox before switching to live events.
+
+Long-lived streams need a worker class that does not pin a sync worker per
+connection; see gunicorn.conf.py.
+"""
+
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from app import db
+from models import LeaveApplication, NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+EVENT_STATUSES = ('approved', 'rejected', 'cancelled')
+REPLAY_LIMIT = 50
+
+
+def _event_rows(after_id, user_id=None, limit=500):
+    stmt = select(
+        NotificationOutbox.id,
+        NotificationOutbox.subject,
+        NotificationOutbox.created_at,
+        LeaveApplication.id.label('application_id'),
+        LeaveApplication.user_id,
+        LeaveApplication.status,
+    ).join(
+        LeaveApplication, NotificationOutbox.application_id == LeaveApplication.id
+    ).where(
+        NotificationOutbox.id > after_id,
+        LeaveApplication.status.in_(EVENT_STATUSES)
+    )
+    if user_id is not None:
+        stmt = stmt.where(LeaveApplication.user_id == user_id)
+    return db.session.execute(stmt.order_by(NotificationOutbox.id).limit(limit)).all()
+
+
+def _event(row):
+    return {
+        'id': row.id,
+        'type': f'leave.{row.status}',
+        'user_id': row.user_id,
+        'data': {
+            'application_id': row.application_id,
+            'status': row.status,
+            'message': row.subject,
+            'created_at': row.created_at.isoformat() + 'Z' if row.created_at else None,
+        },
+    }
+
+
+def format_event(event):
+    """Serialize an event in the text/event-stream wire format"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+class Subscription:
+    def __init__(self, user_id, maxsize=100):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.start_id = 0
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """In-process fan-out of outbox events to per-user subscriptions"""
+
+    def __init__(self, app, poll_interval=2.0):
+        self.app = app
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_id = None
+
+    def subscribe(self, user_id):
+        """Register a subscription; must be called inside a request or app context.
+
+        ``subscription.start_id`` is the newest event id at subscription time;
+        anything newer is delivered live.
+        """
+        subscription = Subscription(user_id)
+        with self._lock:
+            if not self._subscribers:
+                # The feeder was idle; start from now rather than replaying the gap to everyone
+                self._last_id = None
+            self._subscribers[user_id].add(subscription)
+        if self._last_id is None:
+            self._last_id = self._newest_id()
+        subscription.start_id = self._last_id
+        self._ensure_feeder()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event['user_id'], ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                # A stalled client; it will catch up from the outbox on reconnect
+                logger.warning("Dropping event %s for a slow subscriber", event['id'])
+
+    def poke(self):
+        """Ask the feeder to look for new events now"""
+        self._wakeup.set()
+
+    def replay(self, user_id, last_event_id):
+        """Events for ``user_id`` after ``last_event_id``, read from the outbox"""
+        return [_event(row) for row in _event_rows(last_event_id, user_id=user_id, limit=REPLAY_LIMIT)]
+
+    def _newest_id(self):
+        # The stream view is @use_primary: a lagging replica would hand back an old id
+        # and make the feeder re-push events subscribers have already seen
+        return db.session.query(db.func.max(NotificationOutbox.id)).scalar() or 0
+
+    def feed_once(self):
+        """Publish outbox events newer than the last one seen; returns how many"""
+        if self._last_id is None:
+            self._last_id = self._newest_id()
+            return 0
+
+        rows = _event_rows(self._last_id)
+        for row in rows:
+            self.publish(_event(row))
+        if rows:
+            self._last_id = rows[-1].id
+        return len(rows)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                idle = not self._subscribers
+            if idle:
+                continue
+            try:
+                with self.app.app_context():
+                    self.feed_once()
+                    db.session.remove()
+            except Exception:
+                logger.exception("Event feeder failed, retrying")
+
+    def _ensure_feeder(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sse-feeder', daemon=True)
+                self._thread.start()
+                self._wakeup.set()
+
+
+_broker = None
+
+
+def init_events(app):
+    """Attach the event broker; its feeder thread starts with the first subscriber"""
+    global _broker
+    _broker = EventBroker(app, poll_interval=app.config.get('SSE_POLL_INTERVAL', 2.0))
+    app.extensions['event_broker'] = _broker
+    return _broker
+
+
+def get_broker():
+    return _broker
+
+
+def notify_committed():
+    """Called after a commit that may have queued leave notifications"""
+    if _broker is not None:
+        _broker.poke()
+
+
+def event_stream(subscription, replayed, heartbeat=15.0):
+    """Generator of SSE text: replayed events, then live ones, with keep-alives"""
+    last_sent = subscription.start_id
+    try:
+        yield "retry: 5000\n\n"
+        for event in replayed:
+            last_sent = max(last_sent, event['id'])
+            yield format_event(event)
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            if event['id'] <= last_sent:
+                continue
+            last_sent = event['id']
+            yield format_event(event)
+    finally:
+        _broker.unsubscribe(subscription)
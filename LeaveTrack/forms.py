@@ -1,9 +1,10 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SelectField, TextAreaField, DateField, IntegerField, BooleanField, HiddenField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError, NumberRange
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, PasswordField, SelectField, SelectMultipleField, TextAreaField, DateField, IntegerField, BooleanField, HiddenField
+from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError, NumberRange, Optional
 from wtforms.widgets import TextArea
 from datetime import date, datetime
-from models import User, LeaveType
+from models import User, LeaveType, Holiday
 
 class LoginForm(FlaskForm):
     employee_id = StringField('Employee ID', validators=[DataRequired(), Length(min=3, max=20)])
@@ -70,6 +71,17 @@ class LeaveApprovalForm(FlaskForm):
         if self.status.data == 'rejected' and not rejection_reason.data:
             raise ValidationError('Rejection reason is required when rejecting a leave application.')
 
+class BulkApprovalForm(FlaskForm):
+    application_ids = SelectMultipleField('Applications', coerce=int, validate_choice=False,
+                                          validators=[DataRequired(message='Select at least one application.')])
+    status = SelectField('Status', choices=[('approved', 'Approve'), ('rejected', 'Reject')], validators=[DataRequired()])
+    comments = TextAreaField('Comments', validators=[Length(max=500)])
+    rejection_reason = TextAreaField('Rejection Reason (required if rejecting)', validators=[Length(max=500)])
+    
+    def validate_rejection_reason(self, rejection_reason):
+        if self.status.data == 'rejected' and not rejection_reason.data:
+            raise ValidationError('Rejection reason is required when rejecting leave applications.')
+
 class ProfileUpdateForm(FlaskForm):
     first_name = StringField('First Name', validators=[DataRequired(), Length(min=2, max=50)])
     last_name = StringField('Last Name', validators=[DataRequired(), Length(min=2, max=50)])
@@ -104,7 +116,24 @@ class LeaveTypeForm(FlaskForm):
     name = StringField('Leave Type Name', validators=[DataRequired(), Length(min=2, max=50)])
     description = TextAreaField('Description')
     max_days_per_year = IntegerField('Maximum Days Per Year', validators=[NumberRange(min=0, max=365)])
+    max_carry_forward_days = IntegerField('Maximum Carry-Forward Days', default=0,
+                                          validators=[Optional(), NumberRange(min=0, max=365)])
     requires_medical_certificate = BooleanField('Requires Medical Certificate')
     applicable_to_teaching = BooleanField('Applicable to Teaching Staff', default=True)
     applicable_to_non_teaching = BooleanField('Applicable to Non-Teaching Staff', default=True)
     color_code = StringField('Color Code', validators=[Length(min=7, max=7)], default='#007bff')
+
+class HolidayForm(FlaskForm):
+    name = StringField('Holiday Name', validators=[DataRequired(), Length(min=2, max=100)])
+    holiday_date = DateField('Date', validators=[DataRequired()])
+    description = TextAreaField('Description')
+    
+    def validate_holiday_date(self, holiday_date):
+        holiday = Holiday.query.filter_by(holiday_date=holiday_date.data).first()
+        if holiday:
+            raise ValidationError(f'{holiday_date.data.strftime("%B %d, %Y")} is already marked as {holiday.name}.')
+
+class StaffImportForm(FlaskForm):
+    staff_file = FileField('Staff File (CSV or JSON)',
+                           validators=[FileRequired(), FileAllowed(['csv', 'json'], 'CSV or JSON files only.')])
+    dry_run = BooleanField('Validate only (do not import)')
@@ -0,0 +1,74 @@
+"""Gunicorn settings: ``gunicorn -c gunicorn.conf.py main:app``.
+
+The SSE endpoint (/dashboard/events) keeps one connection open per browser
+tab. With the default sync worker each of those would occupy a whole worker
+process, so this config uses the gevent worker when gevent is installed (one
+greenlet per connection) and otherwise the threaded gthread worker, where an
+open stream only holds one of the worker's threads.
+
+With the gthread worker the app is preloaded in the master and warmed up
+(warmup.py) before the workers are forked, so they start with compiled
+templates and loaded holiday tables shared copy-on-write. Set
+GUNICORN_PRELOAD=false to load the app in each worker instead. Preloading
+stops ``--reload`` from picking up code changes, so it defaults to off when
+reload is requested (``--reload`` on the command line or in
+GUNICORN_CMD_ARGS, or GUNICORN_RELOAD=true), and the master warns if both
+are forced on.
+"""
+
+import multiprocessing
+import os
+import sys
+
+wsgi_app = 'main:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+try:
+    import gevent  # noqa: F401
+except ImportError:
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    threads = int(os.environ.get('GUNICORN_THREADS', 50))
+else:
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+reload = (os.environ.get('GUNICORN_RELOAD', 'false').lower() == 'true'
+          or '--reload' in sys.argv or '--reload' in os.environ.get('GUNICORN_CMD_ARGS', '').split())
+
+# gevent patches the stdlib in each worker after the fork, too late for locks
+# the preloaded app already created, so preloading defaults to gthread only
+preload_app = os.environ.get('GUNICORN_PRELOAD', str(worker_class == 'gthread' and not reload)).lower() == 'true'
+
+# Streams send a keep-alive comment every SSE_HEARTBEAT seconds, well inside this
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+graceful_timeout = 10
+accesslog = '-'
+
+
+def on_starting(server):
+    if server.cfg.reload and server.cfg.preload_app:
+        server.log.warning("preload_app is on, so --reload will not pick up code changes; "
+                           "unset GUNICORN_PRELOAD to reload")
+
+    # Worker snapshots from a previous run would otherwise be summed into the new totals
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.startswith('metrics-') and name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from warmup import warm_up
+        warm_up(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    # Drop any pooled connection the master may have opened after warm-up
+    if server.cfg.preload_app:
+        from app import db
+        with server.app.wsgi().app_context():
+            db.engine.dispose(close=False)
@@ -0,0 +1,238 @@
+"""Opt-in per-request SQL instrumentation and slow-query log.
+
+Enabled with ``SQL_INSTRUMENTATION=on``. SQLAlchemy engine events time every
+statement; Flask request hooks collect them per request:
+
+* query count and total time spent in the database;
+* the slowest statements, each with the application call site that issued it;
+* N+1 patterns: the same statement shape (literals and IN lists collapsed)
+  run ``N_PLUS_ONE_THRESHOLD`` or more times in one request.
+
+Statements slower than ``SLOW_QUERY_MS`` are logged wherever they run.
+Requests slower than ``SLOW_REQUEST_MS``, over ``SLOW_REQUEST_QUERIES``
+statements, or with an N+1 pattern are logged with their worst statements
+and kept for the admin diagnostics page. In debug mode every response also
+carries ``X-DB-Query-Count``, ``X-DB-Time-Ms``, ``X-Request-Time-Ms``,
+``X-DB-N-Plus-One`` and ``X-DB-Route`` (primary or replica) headers.
+"""
+
+import heapq
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app import db
+from db_routing import current_route
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SLOWEST_KEPT = 5
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|'[^']*'|-?\d+(?:\.\d+)?)"
+_VALUE_LIST = re.compile(r"\(\s*" + _PLACEHOLDER + r"(?:\s*,\s*" + _PLACEHOLDER + r")*\s*\)")
+_LITERAL = re.compile(r"'[^']*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """Statement text with whitespace, literals and IN/VALUES lists normalised"""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _VALUE_LIST.sub('(?)', shape)
+    return _LITERAL.sub('?', shape)
+
+
+def call_site():
+    """``file:line in function`` of the innermost application frame"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(APP_DIR) and filename != __file__
+                and os.sep + 'site-packages' + os.sep not in filename):
+            return f"{os.path.relpath(filename, APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return '?'
+
+
+class RequestStats:
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.endpoint = None
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.slowest = []  # min-heap of (seconds, sequence, statement, call site)
+        self.shapes = Counter()
+        self.shape_sites = {}
+
+    def record(self, statement, seconds, site):
+        self.query_count += 1
+        self.db_time += seconds
+        entry = (seconds, self.query_count, statement, site)
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        self.shape_sites.setdefault(shape, site)
+
+    def repeated(self, threshold):
+        """[(count, shape, first call site)] for shapes run ``threshold`` or more times"""
+        return [(count, shape, self.shape_sites[shape])
+                for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self, elapsed, threshold):
+        return {
+            'at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'method': self.method,
+            'path': self.path,
+            'endpoint': self.endpoint,
+            'duration_ms': round(elapsed * 1000, 1),
+            'query_count': self.query_count,
+            'db_time_ms': round(self.db_time * 1000, 1),
+            'slowest': [{'ms': round(seconds * 1000, 2), 'statement': statement, 'call_site': site}
+                        for seconds, _, statement, site in sorted(self.slowest, reverse=True)],
+            'n_plus_one': [{'count': count, 'statement': shape, 'call_site': site}
+                           for count, shape, site in self.repeated(threshold)],
+        }
+
+
+class SQLInstrumentation:
+    """Engine and request hooks plus the aggregates shown on the diagnostics page"""
+
+    def __init__(self, app):
+        self.app = app
+        self.slow_query = app.config['SLOW_QUERY_MS'] / 1000
+        self.slow_request = app.config['SLOW_REQUEST_MS'] / 1000
+        self.slow_request_queries = app.config['SLOW_REQUEST_QUERIES']
+        self.n_plus_one = app.config['N_PLUS_ONE_THRESHOLD']
+        self._lock = threading.Lock()
+        self.flagged = deque(maxlen=app.config['INSTRUMENTATION_HISTORY'])
+        self.endpoints = {}
+
+    def attach(self, engines):
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_execute)
+            event.listen(engine, 'handle_error', self._on_error)
+        self.app.before_request(self._before_request)
+        self.app.after_request(self._after_request)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        stats = g.get('sql_stats') if has_request_context() else None
+        if stats is None and seconds < self.slow_query:
+            return
+
+        site = call_site()
+        if stats is not None:
+            stats.record(statement, seconds, site)
+        if seconds >= self.slow_query:
+            logger.warning("Slow query (%.1f ms) at %s: %s", seconds * 1000, site,
+                           _WHITESPACE.sub(' ', statement)[:500])
+
+    def _on_error(self, context):
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def _before_request(self):
+        g.sql_stats = RequestStats(request.method, request.path)
+
+    def _after_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        stats.endpoint = request.endpoint
+        elapsed = time.perf_counter() - stats.started
+        repeated = stats.repeated(self.n_plus_one)
+
+        self._aggregate(stats, elapsed, bool(repeated))
+        if (elapsed >= self.slow_request or stats.query_count >= self.slow_request_queries or repeated):
+            summary = stats.summary(elapsed, self.n_plus_one)
+            with self._lock:
+                self.flagged.appendleft(summary)
+            self._log(summary)
+
+        if self.app.debug or self.app.config.get('INSTRUMENTATION_HEADERS'):
+            response.headers['X-DB-Query-Count'] = str(stats.query_count)
+            response.headers['X-DB-Time-Ms'] = f"{stats.db_time * 1000:.1f}"
+            response.headers['X-Request-Time-Ms'] = f"{elapsed * 1000:.1f}"
+            response.headers['X-DB-N-Plus-One'] = str(len(repeated))
+            response.headers['X-DB-Route'] = current_route()
+        return response
+
+    def _aggregate(self, stats, elapsed, n_plus_one):
+        key = stats.endpoint or stats.path
+        with self._lock:
+            totals = self.endpoints.setdefault(key, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_time': 0.0, 'time': 0.0,
+                'max_time': 0.0, 'n_plus_one': 0})
+            totals['requests'] += 1
+            totals['queries'] += stats.query_count
+            totals['max_queries'] = max(totals['max_queries'], stats.query_count)
+            totals['db_time'] += stats.db_time
+            totals['time'] += elapsed
+            totals['max_time'] = max(totals['max_time'], elapsed)
+            totals['n_plus_one'] += n_plus_one
+
+    def _log(self, summary):
+        lines = [f"{summary['method']} {summary['path']}: {summary['duration_ms']} ms, "
+                 f"{summary['query_count']} queries ({summary['db_time_ms']} ms in DB)"]
+        for slow in summary['slowest'][:3]:
+            lines.append(f"  {slow['ms']} ms at {slow['call_site']}: {slow['statement'][:200]}")
+        for repeated in summary['n_plus_one']:
+            lines.append(f"  N+1: {repeated['count']}x at {repeated['call_site']}: {repeated['statement'][:200]}")
+        logger.warning("Flagged request %s", '\n'.join(lines))
+
+    def endpoint_stats(self):
+        """Per-endpoint averages, slowest mean first"""
+        with self._lock:
+            rows = [{
+                'endpoint': endpoint,
+                'requests': totals['requests'],
+                'avg_queries': round(totals['queries'] / totals['requests'], 1),
+                'max_queries': totals['max_queries'],
+                'avg_db_ms': round(totals['db_time'] * 1000 / totals['requests'], 1),
+                'avg_ms': round(totals['time'] * 1000 / totals['requests'], 1),
+                'max_ms': round(totals['max_time'] * 1000, 1),
+                'n_plus_one': totals['n_plus_one'],
+            } for endpoint, totals in self.endpoints.items()]
+        return sorted(rows, key=lambda row: row['avg_ms'], reverse=True)
+
+    def flagged_requests(self):
+        with self._lock:
+            return list(self.flagged)
+
+    def reset(self):
+        with self._lock:
+            self.flagged.clear()
+            self.endpoints.clear()
+
+
+def init_instrumentation(app):
+    """Attach the SQL instrumentation when SQL_INSTRUMENTATION is on"""
+    if not app.config.get('SQL_INSTRUMENTATION'):
+        return None
+    instrumentation = SQLInstrumentation(app)
+    instrumentation.attach(db.engines.values())
+    app.extensions['sql_instrumentation'] = instrumentation
+    return instrumentation
+
+
+def get_instrumentation(app):
+    return app.extensions.get('sql_instrumentation')
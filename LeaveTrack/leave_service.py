@@ -0,0 +1,361 @@
+"""Leave workflow operations: submit, decide, cancel and recompute.
+
+Every operation runs as one transaction with a single commit. Balance
+counters are never read, changed in Python and written back; they are moved
+with single-statement ``UPDATE ... SET pending_days = pending_days + :n``
+updates, and a reservation only succeeds when the same statement's WHERE
+clause finds enough available days. Status transitions are guarded the same
+way (``... WHERE status = 'pending'``), so two workers racing on one
+application cannot both apply it.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, case, select, tuple_, update
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from audit import record_audit
+from change_counters import APPLICATIONS, bump_version
+from events import notify_committed
+from metrics import applications_cancelled, applications_decided, applications_submitted
+from models import LeaveApplication, LeaveBalance
+from utils import (calculate_working_days, calculate_working_days_batch, check_leave_conflict,
+                   dashboard_stats_cache, send_leave_notification)
+from working_days import WorkingDayCalendar
+
+
+class LeaveServiceError(Exception):
+    """Base class for workflow errors that should be shown to the user"""
+
+
+class LeaveConflictError(LeaveServiceError):
+    pass
+
+
+class InsufficientBalanceError(LeaveServiceError):
+    def __init__(self, available, requested):
+        super().__init__(f'Insufficient leave balance: {requested} day(s) requested, '
+                         f'{available} day(s) available.')
+        self.available = available
+        self.requested = requested
+
+
+class ApplicationNotPendingError(LeaveServiceError):
+    def __init__(self):
+        super().__init__('This application has already been processed.')
+
+
+def _balance_filter(user_id, leave_type_id, year):
+    return and_(
+        LeaveBalance.user_id == user_id,
+        LeaveBalance.leave_type_id == leave_type_id,
+        LeaveBalance.year == year
+    )
+
+
+def _returning_supported():
+    return db.session.get_bind(mapper=LeaveBalance).dialect.update_returning
+
+
+def reserve_days(user_id, leave_type_id, year, days):
+    """Atomically add ``days`` to pending_days if that many are available.
+
+    Returns the new pending_days, or None when the user has no balance row
+    for that leave type and year (untracked leave is not limited). Raises
+    InsufficientBalanceError when the balance exists but is too small.
+    """
+    stmt = update(LeaveBalance).where(
+        _balance_filter(user_id, leave_type_id, year),
+        LeaveBalance.allocated_days - LeaveBalance.used_days - LeaveBalance.pending_days >= days
+    ).values(pending_days=LeaveBalance.pending_days + days)
+
+    if _returning_supported():
+        row = db.session.execute(
+            stmt.returning(LeaveBalance.pending_days),
+            execution_options={'synchronize_session': False}
+        ).first()
+        if row is not None:
+            return row.pending_days
+    else:
+        result = db.session.execute(stmt, execution_options={'synchronize_session': False})
+        if result.rowcount:
+            return db.session.query(LeaveBalance.pending_days).filter(
+                _balance_filter(user_id, leave_type_id, year)).scalar()
+
+    # Nothing updated: either no balance row or not enough days left
+    balance = db.session.query(
+        LeaveBalance.allocated_days - LeaveBalance.used_days - LeaveBalance.pending_days
+    ).filter(_balance_filter(user_id, leave_type_id, year)).first()
+    if balance is None:
+        return None
+    raise InsufficientBalanceError(balance[0], days)
+
+
+def release_days(user_id, leave_type_id, year, days, consume=False):
+    """Atomically move ``days`` out of pending_days, into used_days if consume"""
+    values = {'pending_days': LeaveBalance.pending_days - days}
+    if consume:
+        values['used_days'] = LeaveBalance.used_days + days
+
+    db.session.execute(
+        update(LeaveBalance).where(_balance_filter(user_id, leave_type_id, year)).values(**values),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def _transition(application, from_status, to_status, **values):
+    """Guarded status change; raises if another request got there first"""
+    result = db.session.execute(
+        update(LeaveApplication)
+        .where(LeaveApplication.id == application.id, LeaveApplication.status == from_status)
+        .values(status=to_status, **values)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        raise ApplicationNotPendingError()
+
+
+def submit_application(user, leave_type_id, start_date, end_date, reason, contact_during_leave=None,
+                       emergency_contact=None, medical_certificate_provided=False, ip_address=None):
+    """Create a pending application and reserve its days against the balance"""
+    if check_leave_conflict(user.id, start_date, end_date):
+        raise LeaveConflictError('You have overlapping leave applications for the selected dates.')
+
+    total_days = calculate_working_days(start_date, end_date)
+
+    try:
+        reserve_days(user.id, leave_type_id, start_date.year, total_days)
+    except InsufficientBalanceError:
+        db.session.rollback()
+        raise
+
+    application = LeaveApplication(
+        user_id=user.id,
+        leave_type_id=leave_type_id,
+        start_date=start_date,
+        end_date=end_date,
+        total_days=total_days,
+        reason=reason,
+        contact_during_leave=contact_during_leave,
+        emergency_contact=emergency_contact,
+        medical_certificate_provided=medical_certificate_provided
+    )
+    db.session.add(application)
+    db.session.flush()
+
+    record_audit(user.id, 'Leave Application Submitted', 'LeaveApplication',
+                 application.id, ip_address=ip_address)
+    bump_version(APPLICATIONS)
+    db.session.commit()
+
+    dashboard_stats_cache.adjust(total_applications=1, pending_applications=1)
+    applications_submitted.inc()
+    return application
+
+
+def decide_application(application, status, approver_id, comments=None, rejection_reason=None,
+                       ip_address=None):
+    """Approve or reject a pending application"""
+    values = {'approved_by': approver_id, 'approved_at': datetime.utcnow(), 'comments': comments}
+    if status == 'rejected':
+        values['rejection_reason'] = rejection_reason
+
+    _transition(application, 'pending', status, **values)
+    release_days(application.user_id, application.leave_type_id, application.start_date.year,
+                 application.total_days, consume=status == 'approved')
+    send_leave_notification(application, status)
+    record_audit(approver_id, f'Leave Application {status.title()}', 'LeaveApplication',
+                 application.id, old_values='pending', new_values=status, ip_address=ip_address)
+    applied_this_year = application.applied_at.year == datetime.now().year
+    bump_version(APPLICATIONS)
+    db.session.commit()
+
+    dashboard_stats_cache.adjust(pending_applications=-1,
+                                 **({f'{status}_applications': 1} if applied_this_year else {}))
+    applications_decided.inc(status=status)
+    notify_committed()
+    return application
+
+
+def cancel_application(application, user_id, ip_address=None):
+    """Cancel one of the user's own pending applications"""
+    _transition(application, 'pending', 'cancelled')
+    release_days(application.user_id, application.leave_type_id, application.start_date.year,
+                 application.total_days)
+    send_leave_notification(application, 'cancelled')
+    record_audit(user_id, 'Leave Application Cancelled', 'LeaveApplication', application.id,
+                 old_values='pending', new_values='cancelled', ip_address=ip_address)
+    bump_version(APPLICATIONS)
+    db.session.commit()
+
+    dashboard_stats_cache.adjust(pending_applications=-1)
+    applications_cancelled.inc()
+    notify_committed()
+    return application
+
+
+def bulk_decide_applications(application_ids, status, approver_id, comments=None,
+                             rejection_reason=None, ip_address=None):
+    """Approve or reject many pending applications in a single transaction.
+
+    The selected applications and their leave balances are each locked with
+    one SELECT ... FOR UPDATE. Status changes go out as one guarded UPDATE,
+    balance deltas are summed per balance row and applied as atomic
+    increments in one executemany, and everything commits once.
+    Returns one result dict per requested id, in request order.
+    """
+    application_ids = list(dict.fromkeys(application_ids))
+    applications = LeaveApplication.query.options(
+        joinedload(LeaveApplication.applicant, innerjoin=True),
+        joinedload(LeaveApplication.leave_type, innerjoin=True)
+    ).filter(
+        LeaveApplication.id.in_(application_ids)
+    ).with_for_update(of=LeaveApplication).all()
+    by_id = {application.id: application for application in applications}
+
+    pending_ids = [application.id for application in applications if application.status == 'pending']
+    decided_ids = set()
+    if pending_ids:
+        values = {'approved_by': approver_id, 'approved_at': datetime.utcnow(), 'comments': comments}
+        if status == 'rejected':
+            values['rejection_reason'] = rejection_reason
+        stmt = update(LeaveApplication).where(
+            LeaveApplication.id.in_(pending_ids), LeaveApplication.status == 'pending'
+        ).values(status=status, **values)
+
+        if _returning_supported():
+            decided_ids = set(db.session.execute(stmt.returning(LeaveApplication.id)).scalars())
+        elif db.session.execute(stmt).rowcount == len(pending_ids):
+            decided_ids = set(pending_ids)
+        else:
+            db.session.rollback()
+            raise ApplicationNotPendingError()
+
+    deltas = {}
+    for application_id in decided_ids:
+        application = by_id[application_id]
+        key = (application.user_id, application.leave_type_id, application.start_date.year)
+        pending, used = deltas.get(key, (0, 0))
+        deltas[key] = (pending + application.total_days,
+                       used + (application.total_days if status == 'approved' else 0))
+
+    if deltas:
+        balance_key = tuple_(LeaveBalance.user_id, LeaveBalance.leave_type_id, LeaveBalance.year)
+        balance_ids = {
+            (row.user_id, row.leave_type_id, row.year): row.id
+            for row in db.session.query(
+                LeaveBalance.id, LeaveBalance.user_id, LeaveBalance.leave_type_id, LeaveBalance.year
+            ).filter(balance_key.in_(deltas)).with_for_update()
+        }
+        params = [{'balance_id': balance_ids[key], 'pending': pending, 'used': used}
+                  for key, (pending, used) in deltas.items() if key in balance_ids]
+        if params:
+            balances = LeaveBalance.__table__
+            db.session.execute(
+                balances.update()
+                .where(balances.c.id == bindparam('balance_id'))
+                .values(pending_days=balances.c.pending_days - bindparam('pending'),
+                        used_days=balances.c.used_days + bindparam('used')),
+                params
+            )
+
+    results = []
+    applied_this_year = 0
+    for application_id in application_ids:
+        application = by_id.get(application_id)
+        if application is None:
+            results.append({'id': application_id, 'result': 'not_found',
+                            'message': 'Application not found.'})
+            continue
+        if application_id not in decided_ids:
+            results.append({'id': application_id, 'result': 'skipped',
+                            'message': f'Application is already {application.status}.'})
+            continue
+
+        send_leave_notification(application, status)
+        record_audit(approver_id, f'Leave Application {status.title()}', 'LeaveApplication',
+                     application.id, old_values='pending', new_values=status,
+                     ip_address=ip_address)
+        results.append({'id': application_id, 'result': status,
+                        'message': f'Application {status}.'})
+        applied_this_year += application.applied_at.year == datetime.now().year
+
+    if decided_ids:
+        bump_version(APPLICATIONS)
+    db.session.commit()
+
+    dashboard_stats_cache.adjust(pending_applications=-len(decided_ids),
+                                 **{f'{status}_applications': applied_this_year})
+    applications_decided.inc(len(decided_ids), status=status)
+    notify_committed()
+
+    return results
+
+
+def recompute_pending_working_days(start_date, end_date):
+    """Refresh total_days of pending applications overlapping a date range.
+
+    Used after the holiday calendar changes so pending requests and the
+    pending_days held against balances reflect the new working-day counts.
+    Days are counted against the holidays as this transaction sees them, on
+    a throwaway calendar, so nothing uncommitted reaches the shared cache.
+    The new counts go out in one guarded UPDATE and the balance deltas in
+    one executemany. Returns the number of applications whose day count
+    changed. The caller commits.
+    """
+    applications = LeaveApplication.query.filter(
+        and_(
+            LeaveApplication.status == 'pending',
+            LeaveApplication.start_date <= end_date,
+            LeaveApplication.end_date >= start_date
+        )
+    ).with_for_update(of=LeaveApplication).all()
+
+    counts = calculate_working_days_batch(
+        ((application.start_date, application.end_date) for application in applications),
+        WorkingDayCalendar(version_loader=lambda: None)
+    )
+    new_days = {application.id: total_days for application, total_days in zip(applications, counts)
+                if total_days != application.total_days}
+    if not new_days:
+        return 0
+
+    # Guarded on status: a decision or cancellation committed since the SELECT
+    # has already settled that application's balance
+    stmt = update(LeaveApplication).where(
+        LeaveApplication.id.in_(new_days), LeaveApplication.status == 'pending'
+    ).values(total_days=case(new_days, value=LeaveApplication.id))
+    if _returning_supported():
+        changed_ids = set(db.session.execute(stmt.returning(LeaveApplication.id),
+                                             execution_options={'synchronize_session': False}).scalars())
+    else:
+        db.session.execute(stmt, execution_options={'synchronize_session': False})
+        changed_ids = set(db.session.scalars(select(LeaveApplication.id).where(
+            LeaveApplication.id.in_(new_days), LeaveApplication.status == 'pending')))
+
+    deltas = {}
+    for application in applications:
+        if application.id not in changed_ids:
+            continue
+        key = (application.user_id, application.leave_type_id, application.start_date.year)
+        deltas[key] = deltas.get(key, 0) + new_days[application.id] - application.total_days
+        set_committed_value(application, 'total_days', new_days[application.id])
+
+    params = [{'b_user_id': user_id, 'b_leave_type_id': leave_type_id, 'b_year': year, 'delta': delta}
+              for (user_id, leave_type_id, year), delta in deltas.items() if delta]
+    if params:
+        balances = LeaveBalance.__table__
+        db.session.execute(
+            balances.update()
+            .where(balances.c.user_id == bindparam('b_user_id'),
+                   balances.c.leave_type_id == bindparam('b_leave_type_id'),
+                   balances.c.year == bindparam('b_year'))
+            .values(pending_days=balances.c.pending_days + bindparam('delta')),
+            params
+        )
+
+    if changed_ids:
+        bump_version(APPLICATIONS)
+    return len(changed_ids)
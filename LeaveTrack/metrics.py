@@ -0,0 +1,451 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms are plain dicts updated under a lock, so an
+increment costs a dictionary lookup and an add. With several gunicorn
+workers each process only sees its own numbers, so when ``METRICS_DIR`` is
+set every process also writes a snapshot of its values to
+``METRICS_DIR/metrics-<pid>.json`` every ``METRICS_FLUSH_INTERVAL``
+seconds (and at exit). ``/metrics`` merges the files of every process with
+its own live values: counters and histograms are summed, including those
+of workers that have exited, and gauges are summed over live processes only.
+
+Request metrics come from hooks installed on each blueprint; database pool
+metrics from engine pool events; cache and backlog figures are read when a
+snapshot or scrape is taken.
+"""
+
+import atexit
+import glob
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import current_app, g, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+POOL_HOLD_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# The scrape itself and the long-lived SSE stream would only distort the latency figures
+UNTRACKED_ENDPOINTS = {'main.metrics', 'dashboard.events'}
+# Any of these means the request came through a reverse proxy, whose own address is loopback
+FORWARDING_HEADERS = ('Forwarded', 'X-Forwarded-For', 'X-Forwarded-Host', 'X-Forwarded-Proto', 'X-Real-IP')
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self):
+        """{label values: value} copy safe to serialize"""
+        with self._lock:
+            return {key: value for key, value in self._values.items()}
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """Mirror a cumulative count kept elsewhere, such as a cache's hit counter"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    """``aggregate='sum'`` adds live processes together; ``'local'`` reports only
+    the scraping process, for figures that are already global (database counts)"""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), aggregate='sum'):
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, the +Inf overflow, then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_interval = 5.0
+        self._flusher = None
+        self._stop = threading.Event()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), aggregate='sum'):
+        return self.register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """``collect()`` is called before each snapshot to refresh computed metrics"""
+        self._collectors.append(collect)
+
+    def _collect(self):
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception:
+                logger.exception("Metrics collector %r failed", collect)
+
+    def process_snapshot(self):
+        self._collect()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+            for metric in metrics
+        }
+
+    # Multi-process aggregation
+
+    def enable_directory(self, directory, flush_interval):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def flush(self):
+        """Write this process's values for the other workers to read"""
+        if self.directory is None:
+            return
+        path = self._snapshot_path(os.getpid())
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump({'pid': os.getpid(), 'metrics': self.process_snapshot()}, handle)
+        os.replace(temporary, path)
+
+    def ensure_flusher(self):
+        if self.directory is None or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run_flusher, name='metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Could not write metrics snapshot")
+
+    def _after_fork(self):
+        # A forked worker starts from zero; the parent's values stay in the parent's file
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+        for metric in self._metrics.values():
+            metric._lock = threading.Lock()
+            metric.reset()
+
+    def _other_snapshots(self):
+        if self.directory is None:
+            return []
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            if data.get('pid') != os.getpid():
+                data['alive'] = _pid_alive(data.get('pid'))
+                snapshots.append(data)
+        return snapshots
+
+    def merged(self):
+        """[(metric, {label values: value})] across every process"""
+        own = self.process_snapshot()
+        snapshots = [{'metrics': own, 'alive': True}] + self._other_snapshots()
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        merged = []
+        for metric in metrics:
+            values = {}
+            for snapshot in snapshots:
+                if metric.type == 'gauge' and not snapshot['alive']:
+                    continue
+                if getattr(metric, 'aggregate', 'sum') == 'local' and snapshot['metrics'] is not own:
+                    continue
+                for key, value in snapshot['metrics'].get(metric.name, ()):
+                    key = tuple(key)
+                    if metric.type == 'histogram':
+                        state = values.setdefault(key, [0] * len(value))
+                        values[key] = [a + b for a, b in zip(state, value)]
+                    else:
+                        values[key] = values.get(key, 0) + value
+            merged.append((metric, values))
+        return merged
+
+    def exposition(self):
+        """Prometheus text format (version 0.0.4)"""
+        lines = []
+        for metric, values in self.merged():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for key, value in sorted(values.items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.type == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{metric.name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_labels(labels)} {value[-1]}")
+                    lines.append(f"{metric.name}_count{_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{metric.name}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry._after_fork)
+
+http_requests = registry.counter(
+    'leavetrack_http_requests_total', 'HTTP requests handled.', ('blueprint', 'endpoint', 'method', 'status'))
+http_latency = registry.histogram(
+    'leavetrack_http_request_duration_seconds', 'HTTP request latency.', ('blueprint', 'endpoint'))
+http_in_flight = registry.gauge(
+    'leavetrack_http_requests_in_flight', 'Requests currently being handled.')
+
+pool_checkouts = registry.counter(
+    'leavetrack_db_pool_checkouts_total', 'Connections checked out of the pool.')
+pool_wait = registry.histogram(
+    'leavetrack_db_pool_wait_seconds', 'Time spent waiting for a pooled connection.', buckets=POOL_WAIT_BUCKETS)
+pool_hold = registry.histogram(
+    'leavetrack_db_pool_checkout_seconds', 'Time a connection stayed checked out.', buckets=POOL_HOLD_BUCKETS)
+pool_checked_out = registry.gauge(
+    'leavetrack_db_pool_checked_out', 'Connections currently checked out.')
+
+cache_hits = registry.counter('leavetrack_cache_hits_total', 'Cache hits.', ('cache',))
+cache_misses = registry.counter('leavetrack_cache_misses_total', 'Cache misses.', ('cache',))
+
+applications_submitted = registry.counter(
+    'leavetrack_leave_applications_submitted_total', 'Leave applications submitted.')
+applications_decided = registry.counter(
+    'leavetrack_leave_applications_decided_total', 'Leave applications approved or rejected.', ('status',))
+applications_cancelled = registry.counter(
+    'leavetrack_leave_applications_cancelled_total', 'Leave applications cancelled.')
+pending_backlog = registry.gauge(
+    'leavetrack_leave_applications_pending', 'Leave applications awaiting a decision.', aggregate='local')
+
+
+_instrumented = set()
+_instrumented_engines = weakref.WeakSet()
+_collecting = set()
+
+
+def _request_started():
+    if request.endpoint in UNTRACKED_ENDPOINTS:
+        return
+    g.metrics_started = time.perf_counter()
+    http_in_flight.inc()
+    registry.ensure_flusher()
+
+
+def _request_finished(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    http_in_flight.dec()
+    blueprint, endpoint = request.blueprint or '', request.endpoint or 'unmatched'
+    http_requests.inc(blueprint=blueprint, endpoint=endpoint, method=request.method, status=response.status_code)
+    http_latency.observe(time.perf_counter() - started, blueprint=blueprint, endpoint=endpoint)
+    return response
+
+
+def instrument_blueprint(blueprint):
+    """Install request-metric hooks; call before the blueprint is registered"""
+    if blueprint.name in _instrumented:
+        return blueprint
+    _instrumented.add(blueprint.name)
+    blueprint.before_request(_request_started)
+    blueprint.after_request(_request_finished)
+    return blueprint
+
+
+def _instrument_pool(engine):
+    if engine in _instrumented_engines:
+        return
+    _instrumented_engines.add(engine)
+    pool = engine.pool
+
+    @event.listens_for(pool, 'checkout')
+    def on_checkout(dbapi_connection, record, proxy):
+        record.info['metrics_checked_out'] = time.perf_counter()
+        pool_checkouts.inc()
+        pool_checked_out.inc()
+
+    @event.listens_for(pool, 'checkin')
+    def on_checkin(dbapi_connection, record):
+        started = record.info.pop('metrics_checked_out', None)
+        if started is not None:
+            pool_hold.observe(time.perf_counter() - started)
+            pool_checked_out.dec()
+
+    # The pool has no "checkout requested" event, so time the engine's call into
+    # it (wrapping the engine rather than the pool survives engine.dispose())
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        started = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            pool_wait.observe(time.perf_counter() - started)
+
+    engine.raw_connection = timed_raw_connection
+
+
+def _cache_collector(caches):
+    def collect():
+        for name, cache in caches.items():
+            cache_hits.set_total(cache.hits, cache=name)
+            cache_misses.set_total(cache.misses, cache=name)
+    return collect
+
+
+def init_metrics(app):
+    """Wire pool, cache and backlog metrics; blueprints are instrumented in register_blueprints"""
+    from app import db
+    from pagination import count_cache
+    from user_cache import user_cache
+    from utils import dashboard_stats_cache
+
+    if app.config.get('METRICS_DIR'):
+        registry.enable_directory(app.config['METRICS_DIR'], app.config.get('METRICS_FLUSH_INTERVAL', 5.0))
+        if 'flush_at_exit' not in _collecting:
+            _collecting.add('flush_at_exit')
+            atexit.register(registry.flush)
+
+    # Engines are per app, but the registry and the caches are process-wide
+    _instrument_pool(db.engine)
+    if 'caches' not in _collecting:
+        _collecting.add('caches')
+        registry.add_collector(_cache_collector({
+            'user_loader': user_cache,
+            'dashboard_stats': dashboard_stats_cache,
+            'keyset_count': count_cache,
+        }))
+    app.extensions['metrics'] = registry
+    return registry
+
+
+def refresh_backlog():
+    """Read the pending backlog from the database (a global figure, not per process)"""
+    from models import LeaveApplication
+
+    pending_backlog.set(LeaveApplication.query.filter_by(status='pending').count())
+
+
+def metrics_allowed():
+    """Token or loopback check for the /metrics endpoint.
+
+    Without a token only direct loopback connections may scrape. Behind the
+    reverse proxy every request arrives from loopback (ProxyFix does not trust
+    X-Forwarded-For), so anything carrying forwarding headers is refused.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    if current_app.config.get('METRICS_LOCAL_ONLY', True):
+        return (request.remote_addr in ('127.0.0.1', '::1')
+                and not any(header in request.headers for header in FORWARDING_HEADERS))
+    return True
@@ -0,0 +1,150 @@
+"""Schema migrations for existing databases.
+
+``db.create_all()`` only creates missing tables, so changes to tables that
+already exist (new indexes, columns) are shipped here as ordered, named
+steps. Applied steps are recorded in ``schema_migrations`` and every step is
+written to be safe to re-run against a database created by ``create_all()``.
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from app import db
+from models import AuditLog, LeaveApplication, LeaveBalance, User
+
+logger = logging.getLogger(__name__)
+
+
+def _create_indexes(connection, *tables):
+    for table in tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def add_hot_query_indexes(connection):
+    """Composite indexes backing the dashboard, conflict check and history queries"""
+    _create_indexes(connection, LeaveApplication.__table__, LeaveBalance.__table__)
+
+
+def add_user_search_index(connection):
+    """FTS5 table and triggers on SQLite, trigram/tsvector GIN indexes on PostgreSQL"""
+    from search import create_search_index
+    create_search_index(connection)
+
+
+def add_keyset_pagination_indexes(connection):
+    """Name index for the staff directory; history index gains id as a tiebreaker"""
+    connection.execute(text("DROP INDEX IF EXISTS ix_leave_applications_user_applied_at"))
+    _create_indexes(connection, LeaveApplication.__table__, User.__table__)
+
+
+def _add_column(connection, table_name, column_name, ddl):
+    columns = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    if column_name not in columns:
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+
+def add_carry_forward_columns(connection):
+    """Carry-forward cap per leave type and the carried portion of each balance"""
+    _add_column(connection, 'leave_types', 'max_carry_forward_days', 'INTEGER DEFAULT 0')
+    _add_column(connection, 'leave_balances', 'carried_forward_days', 'INTEGER DEFAULT 0')
+
+
+def add_audit_log_partitioning(connection):
+    """Timestamp index on SQLite, monthly range partitions on PostgreSQL"""
+    from audit_archive import partition_audit_logs
+    partition_audit_logs(connection)
+
+
+def use_trigram_user_search(connection):
+    """Recreate the SQLite FTS5 table with the trigram tokenizer for substring search"""
+    from search import create_search_index, drop_search_index
+    drop_search_index(connection)
+    create_search_index(connection)
+
+
+def require_audit_log_timestamp(connection):
+    """Backfill missing audit log timestamps and make the column NOT NULL"""
+    connection.execute(text('UPDATE audit_logs SET "timestamp" = :now WHERE "timestamp" IS NULL'),
+                       {'now': datetime.utcnow()})
+    columns = {column['name']: column for column in inspect(connection).get_columns('audit_logs')}
+    if not columns['timestamp']['nullable']:
+        return
+
+    if connection.dialect.name != 'sqlite':
+        connection.execute(text('ALTER TABLE audit_logs ALTER COLUMN "timestamp" SET NOT NULL'))
+        return
+
+    # SQLite cannot change a column's constraints, so rebuild the table
+    names = ', '.join(f'"{column.name}"' for column in AuditLog.__table__.columns)
+    connection.execute(text("DROP INDEX IF EXISTS ix_audit_logs_timestamp"))
+    connection.execute(text("ALTER TABLE audit_logs RENAME TO audit_logs_nullable"))
+    AuditLog.__table__.create(connection)
+    connection.execute(text(f"INSERT INTO audit_logs ({names}) SELECT {names} FROM audit_logs_nullable"))
+    connection.execute(text("DROP TABLE audit_logs_nullable"))
+
+
+# Ordered (name, callable) pairs; never rename or reorder applied steps
+MIGRATIONS = [
+    ('0001_hot_query_indexes', add_hot_query_indexes),
+    ('0002_user_search_index', add_user_search_index),
+    ('0003_keyset_pagination_indexes', add_keyset_pagination_indexes),
+    ('0004_carry_forward_columns', add_carry_forward_columns),
+    ('0005_audit_log_partitioning', add_audit_log_partitioning),
+    ('0006_user_search_trigram', use_trigram_user_search),
+    ('0007_audit_log_timestamp_not_null', require_audit_log_timestamp),
+]
+
+
+def _ensure_migrations_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "name VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_migrations():
+    """Names of the migrations already applied to the current database"""
+    with db.engine.begin() as connection:
+        _ensure_migrations_table(connection)
+        rows = connection.execute(text("SELECT name FROM schema_migrations"))
+        return {row.name for row in rows}
+
+
+def upgrade():
+    """Apply pending migrations in order, each in its own transaction"""
+    done = applied_migrations()
+    applied = []
+
+    for name, step in MIGRATIONS:
+        if name in done:
+            continue
+
+        with db.engine.begin() as connection:
+            logger.info("Applying migration %s", name)
+            step(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :applied_at)"),
+                {'name': name, 'applied_at': datetime.utcnow()}
+            )
+        applied.append(name)
+
+    return applied
+
+
+def init_db():
+    """Create the tables of a new database (or any missing ones) and migrate it"""
+    db.create_all(bind_key=None)  # replicas are copies of the primary, never created directly
+    return upgrade()
+
+
+def missing_indexes():
+    """Model-declared indexes that do not exist in the database yet"""
+    inspector = inspect(db.engine)
+    missing = []
+    for table in (LeaveApplication.__table__, LeaveBalance.__table__, User.__table__, AuditLog.__table__):
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(index.name for index in table.indexes if index.name not in existing)
+    return missing
@@ -22,6 +22,11 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Staff directory keyset pagination, ordered by name
+        db.Index('ix_users_name', 'first_name', 'last_name', 'id'),
+    )
+    
     # Relationships
     leave_applications = db.relationship('LeaveApplication', backref='applicant', lazy=True, foreign_keys='LeaveApplication.user_id')
     approved_leaves = db.relationship('LeaveApplication', backref='approver', lazy=True, foreign_keys='LeaveApplication.approved_by')
@@ -47,6 +52,7 @@ class LeaveType(db.Model):
     name = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.Text)
     max_days_per_year = db.Column(db.Integer, default=0)
+    max_carry_forward_days = db.Column(db.Integer, default=0)  # Unused days carried into next year
     requires_medical_certificate = db.Column(db.Boolean, default=False)
     applicable_to_teaching = db.Column(db.Boolean, default=True)
     applicable_to_non_teaching = db.Column(db.Boolean, default=True)
@@ -81,6 +87,15 @@ class LeaveApplication(db.Model):
     rejection_reason = db.Column(db.Text, nullable=True)
     comments = db.Column(db.Text, nullable=True)
     
+    __table_args__ = (
+        # Pending queue and "this year" counts filter on status and an applied_at range
+        db.Index('ix_leave_applications_status_applied_at', 'status', 'applied_at'),
+        # check_leave_conflict: one user's pending/approved leaves overlapping a date range
+        db.Index('ix_leave_applications_user_status_dates', 'user_id', 'status', 'start_date', 'end_date'),
+        # Leave history and recent applications, newest first; id completes the keyset cursor
+        db.Index('ix_leave_applications_user_applied_at', 'user_id', 'applied_at', 'id'),
+    )
+    
     def __repr__(self):
         return f'<LeaveApplication {self.id}: {self.applicant.full_name} - {self.status}>'
     
@@ -104,8 +119,12 @@ class LeaveBalance(db.Model):
     allocated_days = db.Column(db.Integer, default=0)
     used_days = db.Column(db.Integer, default=0)
     pending_days = db.Column(db.Integer, default=0)
+    carried_forward_days = db.Column(db.Integer, default=0)  # Part of allocated_days carried from last year
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'leave_type_id', 'year'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'leave_type_id', 'year'),
+        db.Index('ix_leave_balances_user_year', 'user_id', 'year'),
+    )
     
     @property
     def available_days(self):
@@ -124,10 +143,62 @@ class AuditLog(db.Model):
     entity_id = db.Column(db.Integer, nullable=False)
     old_values = db.Column(db.Text)
     new_values = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     ip_address = db.Column(db.String(45))
     
+    __table_args__ = (
+        # Recent activity, audit search and retention (partitioned by month on PostgreSQL, see audit_archive.py)
+        db.Index('ix_audit_logs_timestamp', 'timestamp', 'id'),
+    )
+    
     user = db.relationship('User', backref='audit_logs')
     
     def __repr__(self):
         return f'<AuditLog {self.action} by {self.user.full_name}>'
+
+class Holiday(db.Model):
+    __tablename__ = 'holidays'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    holiday_date = db.Column(db.Date, unique=True, nullable=False)
+    description = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Holiday {self.holiday_date}: {self.name}>'
+
+class NotificationOutbox(db.Model):
+    __tablename__ = 'notification_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.Integer, db.ForeignKey('leave_applications.id'), nullable=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending')  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(36), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id} to {self.recipient} - {self.status}>'
+
+class ChangeCounter(db.Model):
+    __tablename__ = 'change_counters'
+    
+    # One row per data scope ('applications', 'users'); bumped right after the change commits
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ChangeCounter {self.name} v{self.version}>'
@@ -0,0 +1,263 @@
+"""Outbox-backed delivery of leave notifications.
+
+Views never talk to a mail server. ``utils.send_leave_notification`` only
+adds a ``NotificationOutbox`` row to the session, so the message commits (or
+rolls back) together with the status change that caused it. An
+``OutboxDispatcher`` then drains the outbox in batches, either on a
+background thread inside each web worker (``NOTIFICATION_DISPATCHER=thread``)
+or as a separate process (``flask dispatch-notifications``).
+
+Rows are claimed with a conditional UPDATE before sending, so several
+dispatchers can run against the same database without double delivery.
+Failed sends are retried with exponential backoff until ``max_attempts``.
+"""
+
+import json
+import logging
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from sqlalchemy import update
+
+from app import db
+from models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class Transport:
+    """Delivers one outbox message; raise to signal a retryable failure."""
+
+    def send(self, message):
+        raise NotImplementedError
+
+
+class ConsoleTransport(Transport):
+    def send(self, message):
+        logger.info("Email notification to %s: %s", message.recipient, message.subject)
+
+
+class MemoryTransport(Transport):
+    """Keeps sent messages in a list; handy for tests and local debugging."""
+
+    def __init__(self):
+        self.outbox = []
+
+    def send(self, message):
+        self.outbox.append({'to': message.recipient, 'subject': message.subject, 'body': message.body})
+
+
+class FileTransport(Transport):
+    """Appends each message as a JSON line to a local file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        line = json.dumps({
+            'id': message.id,
+            'to': message.recipient,
+            'subject': message.subject,
+            'body': message.body,
+            'sent_at': datetime.utcnow().isoformat(),
+        })
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(line + '\n')
+
+
+class SMTPTransport(Transport):
+    def __init__(self, host, port=25, username=None, password=None, use_tls=False,
+                 sender='noreply@college.edu', timeout=10):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+        self.timeout = timeout
+
+    def send(self, message):
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = message.recipient
+        email['Subject'] = message.subject
+        email.set_content(message.body)
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(email)
+
+
+def get_transport(config):
+    """Build the transport named by NOTIFICATION_TRANSPORT"""
+    name = config.get('NOTIFICATION_TRANSPORT', 'console')
+    if name == 'console':
+        return ConsoleTransport()
+    if name == 'memory':
+        return MemoryTransport()
+    if name == 'file':
+        return FileTransport(config.get('NOTIFICATION_FILE_PATH', 'notifications.jsonl'))
+    if name == 'smtp':
+        return SMTPTransport(
+            config['MAIL_SERVER'],
+            port=int(config.get('MAIL_PORT', 25)),
+            username=config.get('MAIL_USERNAME'),
+            password=config.get('MAIL_PASSWORD'),
+            use_tls=config.get('MAIL_USE_TLS', False),
+            sender=config.get('MAIL_DEFAULT_SENDER', 'noreply@college.edu'),
+        )
+    raise ValueError(f"Unknown NOTIFICATION_TRANSPORT: {name}")
+
+
+class OutboxDispatcher:
+    def __init__(self, app, transport, batch_size=50, poll_interval=5.0,
+                 max_attempts=5, backoff_base=30, claim_timeout=600):
+        self.app = app
+        self.transport = transport
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.claim_timeout = claim_timeout
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _release_stale_claims(self, now):
+        """Return rows claimed by a dispatcher that died mid-batch to the queue"""
+        result = db.session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.status == 'sending',
+                   NotificationOutbox.claimed_at < now - timedelta(seconds=self.claim_timeout))
+            .values(status='pending', claimed_by=None, claimed_at=None)
+        )
+        if result.rowcount:
+            db.session.commit()
+
+    def _claim_batch(self, now):
+        token = str(uuid.uuid4())
+        due_ids = [row.id for row in NotificationOutbox.query.with_entities(NotificationOutbox.id).filter(
+            NotificationOutbox.status == 'pending',
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.id).limit(self.batch_size)]
+        if not due_ids:
+            return []
+
+        db.session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(due_ids), NotificationOutbox.status == 'pending')
+            .values(status='sending', claimed_by=token, claimed_at=now)
+        )
+        db.session.commit()
+
+        return NotificationOutbox.query.filter_by(claimed_by=token, status='sending')\
+            .order_by(NotificationOutbox.id).all()
+
+    def dispatch_batch(self):
+        """Send one batch of due messages; returns (sent, failed) counts"""
+        now = datetime.utcnow()
+        self._release_stale_claims(now)
+        messages = self._claim_batch(now)
+        if not messages:
+            db.session.rollback()
+            return 0, 0
+
+        sent = failed = 0
+        for message in messages:
+            message.attempts = (message.attempts or 0) + 1
+            message.claimed_by = None
+            message.claimed_at = None
+            try:
+                self.transport.send(message)
+            except Exception as exc:
+                failed += 1
+                message.last_error = str(exc)[:1000]
+                if message.attempts >= self.max_attempts:
+                    message.status = 'failed'
+                    logger.error("Giving up on notification %s after %s attempts: %s",
+                                 message.id, message.attempts, exc)
+                else:
+                    delay = self.backoff_base * 2 ** (message.attempts - 1)
+                    message.status = 'pending'
+                    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                    logger.warning("Notification %s failed (attempt %s), retrying in %ss: %s",
+                                   message.id, message.attempts, delay, exc)
+            else:
+                sent += 1
+                message.status = 'sent'
+                message.sent_at = datetime.utcnow()
+                message.last_error = None
+
+        db.session.commit()
+        return sent, failed
+
+    def drain(self):
+        """Dispatch batches until nothing is due; returns total (sent, failed)"""
+        total_sent = total_failed = 0
+        with self.app.app_context():
+            try:
+                while True:
+                    sent, failed = self.dispatch_batch()
+                    total_sent += sent
+                    total_failed += failed
+                    if sent + failed < self.batch_size:
+                        break
+            finally:
+                db.session.remove()
+        return total_sent, total_failed
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Notification dispatcher batch failed")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self.run_forever, name='outbox-dispatcher', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def create_dispatcher(app):
+    return OutboxDispatcher(
+        app,
+        get_transport(app.config),
+        batch_size=app.config.get('NOTIFICATION_BATCH_SIZE', 50),
+        poll_interval=app.config.get('NOTIFICATION_POLL_INTERVAL', 5.0),
+        max_attempts=app.config.get('NOTIFICATION_MAX_ATTEMPTS', 5),
+    )
+
+
+def init_notifications(app):
+    """Attach a dispatcher to the app and, in thread mode, start it on the first request.
+
+    Starting lazily keeps CLI commands and the gunicorn master from spawning
+    dispatcher threads.
+    """
+    dispatcher = create_dispatcher(app)
+    app.extensions['outbox_dispatcher'] = dispatcher
+
+    if app.config.get('NOTIFICATION_DISPATCHER', 'thread') == 'thread':
+        @app.before_request
+        def _start_outbox_dispatcher():
+            dispatcher.start()
+
+    return dispatcher
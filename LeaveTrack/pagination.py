@@ -0,0 +1,142 @@
+"""Keyset (cursor) pagination.
+
+``.paginate()`` costs an OFFSET scan plus a COUNT on every page, so deep pages
+get slower the further in they are. Here a page is fetched with a row-value
+comparison against the sort key of the last (or first) row already shown,
+e.g. ``WHERE (applied_at, id) < (:applied_at, :id) ORDER BY applied_at DESC,
+id DESC LIMIT 11``, which an index on the sort key answers directly.
+
+Cursors are signed, URL-safe tokens so clients treat them as opaque. The
+total count is optional and cached for a short TTL per filter combination.
+"""
+
+from datetime import date, datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import tuple_
+
+from cache import TTLCache
+
+count_cache = TTLCache(maxsize=512, ttl=60)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='keyset-cursor')
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(values, direction):
+    return _serializer().dumps({'k': [_encode_value(v) for v in values], 'd': direction})
+
+
+def decode_cursor(token):
+    """Return (key values, direction) or raise InvalidCursor"""
+    try:
+        data = _serializer().loads(token)
+        return [_decode_value(v) for v in data['k']], data['d']
+    except (BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor(token)
+
+
+class KeysetPage:
+    """One page of results plus the cursors to its neighbours"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def to_dict(self, serialize):
+        return {
+            'items': [serialize(item) for item in self.items],
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'total': self.total,
+        }
+
+
+def cached_count(query, cache_key):
+    """COUNT(*) of a query, cached for a short TTL under ``cache_key``"""
+    total = count_cache.get(cache_key)
+    if total is None:
+        total = query.order_by(None).count()
+        count_cache.set(cache_key, total)
+    return total
+
+
+def paginate_keyset(query, keys, cursor=None, per_page=20, descending=False, count_key=None):
+    """Fetch one page of ``query`` ordered by the ``keys`` columns.
+
+    ``keys`` must end in a unique column (the primary key) so the order is
+    total. An invalid or tampered cursor restarts from the first page. Pass
+    ``count_key`` to also report the (cached) total number of rows.
+    """
+    direction = 'next'
+    values = None
+    if cursor:
+        try:
+            values, direction = decode_cursor(cursor)
+        except InvalidCursor:
+            values, direction = None, 'next'
+
+    # Walking backwards means flipping both the comparison and the sort order
+    forward = direction == 'next'
+    ascending = forward != descending
+    ordered = query.order_by(None).order_by(*(key.asc() if ascending else key.desc() for key in keys))
+
+    if values is not None and len(values) == len(keys):
+        row_key = tuple_(*keys)
+        ordered = ordered.filter(row_key > tuple_(*values) if ascending else row_key < tuple_(*values))
+    else:
+        values = None
+
+    rows = ordered.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def key_of(row):
+        return [getattr(row, key.key) for key in keys]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if (more if forward else values is not None):
+            next_cursor = encode_cursor(key_of(rows[-1]), 'next')
+        if (values is not None if forward else more):
+            prev_cursor = encode_cursor(key_of(rows[0]), 'prev')
+
+    total = cached_count(query, count_key) if count_key is not None else None
+    return KeysetPage(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor, total=total)
@@ -2,15 +2,31 @@
 """
 Demo Data Population Script for College Leave Management System
 Creates sample users, leave types, and leave applications for hackathon presentation
+
+The same generator builds production-sized datasets for load tests and
+benchmarks. Rows are produced from a seeded RNG with per-department and
+per-leave-type distributions and written with batched inserts (COPY on
+PostgreSQL), e.g.:
+
+    python populate_demo_data.py                      # 25 staff, 30 applications
+    python populate_demo_data.py --preset production  # 50k staff, 5M applications, 20M audit rows
+    python populate_demo_data.py --users 5000 --applications 200000 --seed 7
 """
 
-from datetime import datetime, date, timedelta
+import argparse
+import csv
+import io
 import random
+from collections import Counter, namedtuple
+from datetime import datetime, date, time, timedelta
+from time import perf_counter
+
+from sqlalchemy import func
 from werkzeug.security import generate_password_hash
 
-from app import app, db
-from models import User, LeaveType, LeaveApplication, LeaveBalance, AuditLog
-from utils import init_leave_balances
+from app import create_app, db
+from migrations import init_db
+from models import User, LeaveType, LeaveApplication
 
 # Sample Indian names and departments
 INDIAN_NAMES = [
@@ -62,21 +78,79 @@ DEPARTMENTS = [
     'Human Resources'
 ]
 
-POSITIONS = [
-    'Assistant Professor',
-    'Associate Professor',
-    'Professor',
-    'HOD',
-    'Lecturer',
-    'Senior Lecturer',
-    'Lab Assistant',
-    'Administrative Officer',
-    'Librarian',
-    'Clerk',
-    'Registrar',
-    'Dean'
+# Relative department sizes, in DEPARTMENTS order
+DEPARTMENT_WEIGHTS = [14, 10, 9, 8, 7, 6, 5, 5, 5, 6, 6, 4, 3, 7, 2]
+
+DESIGNATIONS = {
+    'teaching': {
+        'Assistant Professor': 40,
+        'Associate Professor': 20,
+        'Lecturer': 15,
+        'Senior Lecturer': 10,
+        'Professor': 10,
+        'HOD': 3,
+        'Dean': 2,
+    },
+    'non_teaching': {
+        'Clerk': 30,
+        'Lab Assistant': 30,
+        'Administrative Officer': 15,
+        'Librarian': 10,
+        'Registrar': 3,
+    },
+}
+
+# name: (teaching weight, non-teaching weight, shortest, longest in working days, gender or None)
+LEAVE_PROFILES = {
+    'Casual Leave': (35, 45, 1, 3, None),
+    'Sick Leave': (25, 25, 1, 5, None),
+    'Earned Leave': (15, 15, 3, 10, None),
+    'Maternity Leave': (1, 1, 60, 130, 'Female'),
+    'Paternity Leave': (1, 1, 5, 15, 'Male'),
+    'Festival Leave': (8, 10, 1, 2, None),
+    'Study Leave': (6, 1, 5, 20, None),
+    'Emergency Leave': (6, 7, 1, 3, None),
+}
+DEFAULT_LEAVE_PROFILE = (5, 5, 1, 3, None)
+
+# Relative chance of leave starting in each month (exam season low, festivals and vacations high)
+MONTH_WEIGHTS = [0.8, 0.6, 0.7, 0.8, 1.0, 0.9, 0.6, 0.6, 0.7, 1.0, 1.0, 1.0]
+
+REJECTION_REASONS = [
+    'Insufficient staff cover during this period',
+    'Clashes with examination duty',
+    'Please reapply with supporting documents',
 ]
 
+LeaveTypeInfo = namedtuple('LeaveTypeInfo', 'id name allowance applicable_to_teaching applicable_to_non_teaching')
+
+# Presets: staff, applications, audit log rows, days of history
+PRESETS = {
+    'demo': (25, 30, 50, 180),
+    'production': (50_000, 5_000_000, 20_000_000, 5 * 365),
+}
+
+COLUMNS = {
+    'users': ('id', 'employee_id', 'email', 'password_hash', 'first_name', 'last_name', 'department',
+              'designation', 'staff_type', 'role', 'phone', 'address', 'date_joined', 'is_active',
+              'created_at'),
+    'leave_applications': ('id', 'user_id', 'leave_type_id', 'start_date', 'end_date', 'total_days', 'reason',
+                           'contact_during_leave', 'emergency_contact', 'medical_certificate_provided',
+                           'status', 'applied_at', 'approved_by', 'approved_at', 'rejection_reason',
+                           'comments'),
+    'leave_balances': ('user_id', 'leave_type_id', 'year', 'allocated_days', 'used_days', 'pending_days',
+                       'carried_forward_days'),
+    'audit_logs': ('user_id', 'action', 'entity_type', 'entity_id', 'old_values', 'new_values', 'timestamp',
+                   'ip_address'),
+}
+# Column positions holding dates or datetimes, which SQLite stores as text
+TEMPORAL_COLUMNS = {
+    table: frozenset(index for index, column in enumerate(columns)
+                     if column in ('date_joined', 'created_at', 'start_date', 'end_date', 'applied_at',
+                                   'approved_at', 'timestamp'))
+    for table, columns in COLUMNS.items()
+}
+
 LEAVE_REASONS = [
     'Family function and wedding ceremony',
     'Medical treatment and health checkup',
@@ -146,169 +220,354 @@ def create_leave_types():
     else:
         print("✓ Leave types already exist")
 
-def create_sample_users():
-    """Create sample teaching and non-teaching staff"""
-    created_users = []
-    
-    for i, (first_name, last_name, gender) in enumerate(INDIAN_NAMES, 1):
-        employee_id = f"EMP{str(i).zfill(3)}"
-        
-        # Check if user already exists
-        if User.query.filter_by(employee_id=employee_id).first():
+def _sqlite_value(value):
+    # Match SQLAlchemy's SQLite storage formats so range filters compare correctly
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class BulkWriter:
+    """Buffers generated rows per table and writes them in batches.
+
+    PostgreSQL gets ``COPY ... FROM STDIN``; other databases an executemany of
+    plain tuples. Tables are flushed in ``COLUMNS`` order so foreign keys
+    always point at rows that are already written.
+    """
+
+    def __init__(self, connection, batch_size=10000):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.dialect = connection.dialect.name
+        self.counts = Counter()
+        self._buffers = {table: [] for table in COLUMNS}
+
+        if self.dialect == 'sqlite':
+            # Throwaway bulk load: skip the fsync per commit
+            connection.exec_driver_sql('PRAGMA synchronous=OFF')
+
+    def add(self, table, row):
+        buffer = self._buffers[table]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for table, rows in self._buffers.items():
+            if not rows:
+                continue
+            if self.dialect == 'postgresql':
+                self._copy(table, rows)
+            else:
+                self._insert(table, rows)
+            self.counts[table] += len(rows)
+            rows.clear()
+        self.connection.commit()
+
+    def _insert(self, table, rows):
+        columns = COLUMNS[table]
+        marker = '?' if self.connection.dialect.paramstyle == 'qmark' else '%s'
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join([marker] * len(columns))})"
+        if self.dialect == 'sqlite':
+            temporal = TEMPORAL_COLUMNS[table]
+            rows = [tuple(_sqlite_value(value) if index in temporal else value for index, value in enumerate(row))
+                    for row in rows]
+        self.connection.exec_driver_sql(sql, rows)
+
+    def _copy(self, table, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        sql = f"COPY {table} ({', '.join(COLUMNS[table])}) FROM STDIN WITH (FORMAT csv)"
+        cursor = self.connection.connection.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+    def reset_sequences(self, *tables):
+        """Move PostgreSQL id sequences past explicitly inserted ids"""
+        if self.dialect != 'postgresql':
+            return
+        for table in tables:
+            self.connection.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {table}))")
+        self.connection.commit()
+
+
+def _next_weekday(day):
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def _add_working_days(start, days):
+    """Last day of a leave of ``days`` working days starting on ``start``"""
+    end = start
+    while days > 1:
+        end += timedelta(days=1)
+        if end.weekday() < 5:
+            days -= 1
+    return end
+
+
+def _random_datetime(rng, day):
+    return datetime.combine(day, time(rng.randint(8, 18), rng.randint(0, 59), rng.randint(0, 59)))
+
+
+def _ip_address(rng):
+    return f"192.168.{rng.randint(0, 15)}.{rng.randint(1, 254)}"
+
+
+def _split(rng, total, weights):
+    """Share ``total`` out in proportion to ``weights``, rounding stochastically"""
+    scale = total / sum(weights) if weights else 0
+    counts = []
+    for weight in weights:
+        expected = weight * scale
+        whole = int(expected)
+        counts.append(whole + (rng.random() < expected - whole))
+    return counts
+
+
+def generate_users(rng, count, as_of, writer):
+    """Generate staff EMP001..EMP<count> that do not exist yet; returns their profiles"""
+    taken = {row[0] for row in db.session.query(User.employee_id).filter(User.employee_id.like('EMP%'))}
+    next_id = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+    # One hash shared by every generated account; hashing each would take hours at scale
+    password_hash = generate_password_hash('password123')
+    first_names = {gender: [first for first, _, g in INDIAN_NAMES if g == gender] for gender in ('Female', 'Male')}
+    last_names = sorted({last for _, last, _ in INDIAN_NAMES})
+    created_at = datetime.combine(as_of, time(9))
+
+    users = []
+    for number in range(1, count + 1):
+        employee_id = f"EMP{str(number).zfill(3)}"
+        if employee_id in taken:
             continue
-            
-        # Generate email
-        email = f"{first_name.lower()}.{last_name.lower()}@college.edu"
-        
-        # Random department and designation
-        department = random.choice(DEPARTMENTS)
-        designation = random.choice(POSITIONS)
-        
-        # Determine staff type based on department
+
+        if number <= len(INDIAN_NAMES):
+            first_name, last_name, gender = INDIAN_NAMES[number - 1]
+            email = f"{first_name.lower()}.{last_name.lower()}@college.edu"
+        else:
+            gender = rng.choice(('Female', 'Male'))
+            first_name, last_name = rng.choice(first_names[gender]), rng.choice(last_names)
+            email = f"{first_name.lower()}.{last_name.lower()}{number}@college.edu"
+
+        department = rng.choices(DEPARTMENTS, DEPARTMENT_WEIGHTS)[0]
         staff_type = 'teaching' if any(word in department.lower() for word in ['engineering', 'mathematics', 'physics', 'chemistry', 'english', 'commerce', 'economics']) else 'non_teaching'
-        
-        # Random joining date in last 5 years
-        joining_date = date.today() - timedelta(days=random.randint(30, 1825))
-        
-        # Generate phone number
-        phone = f"9{random.randint(100000000, 999999999)}"
-        
-        user = User(
-            employee_id=employee_id,
-            first_name=first_name,
-            last_name=last_name,
-            email=email,
-            phone=phone,
-            department=department,
-            designation=designation,
-            staff_type=staff_type,
-            date_joined=joining_date,
-            role='staff',
-            is_active=True,
-            password_hash=generate_password_hash('password123')
-        )
-        
-        db.session.add(user)
-        created_users.append(f"{first_name} {last_name} ({employee_id})")
-    
-    if created_users:
-        print(f"✓ Created {len(created_users)} sample users")
-        for user in created_users[:5]:  # Show first 5
-            print(f"  - {user}")
-        if len(created_users) > 5:
-            print(f"  ... and {len(created_users) - 5} more users")
-    else:
-        print("✓ Sample users already exist")
+        designations = DESIGNATIONS[staff_type]
+        designation = rng.choices(list(designations), list(designations.values()))[0]
+        date_joined = as_of - timedelta(days=rng.randint(30, 15 * 365))
+        phone = f"9{rng.randint(100000000, 999999999)}"
 
-def create_sample_leave_applications():
-    """Create sample leave applications for demo"""
-    users = User.query.filter_by(role='staff').all()
-    leave_types = LeaveType.query.all()
-    
-    if not users or not leave_types:
-        print("! No users or leave types found. Cannot create applications.")
-        return
-    
-    created_applications = 0
-    statuses = ['pending', 'approved', 'rejected']
-    
-    # Create applications for last 6 months
-    for _ in range(30):  # Create 30 sample applications
-        user = random.choice(users)
-        leave_type = random.choice(leave_types)
-        
-        # Random date in last 6 months
-        start_date = date.today() - timedelta(days=random.randint(0, 180))
-        duration = random.randint(1, 7)  # 1-7 days leave
-        end_date = start_date + timedelta(days=duration - 1)
-        
-        # Skip if application already exists for this user and dates
-        existing = LeaveApplication.query.filter_by(
-            user_id=user.id,
-            start_date=start_date,
-            end_date=end_date
-        ).first()
-        
-        if existing:
+        writer.add('users', (next_id, employee_id, email, password_hash, first_name, last_name, department,
+                             designation, staff_type, 'staff', phone, None, date_joined, True, created_at))
+        users.append({'id': next_id, 'gender': gender, 'staff_type': staff_type, 'date_joined': date_joined,
+                      'phone': phone, 'activity': rng.lognormvariate(0, 0.5)})
+        next_id += 1
+
+    writer.flush()
+    return users
+
+
+def _leave_choices(leave_types, user):
+    choices, weights = [], []
+    for leave_type in leave_types:
+        teaching, non_teaching, shortest, longest, gender = LEAVE_PROFILES.get(leave_type.name, DEFAULT_LEAVE_PROFILE)
+        applicable = leave_type.applicable_to_teaching if user['staff_type'] == 'teaching' else leave_type.applicable_to_non_teaching
+        if not applicable or (gender and gender != user['gender']):
             continue
-        
-        status = random.choice(statuses)
-        reason = random.choice(LEAVE_REASONS)
-        
-        application = LeaveApplication(
-            user_id=user.id,
-            leave_type_id=leave_type.id,
-            start_date=start_date,
-            end_date=end_date,
-            total_days=duration,
-            reason=reason,
-            contact_during_leave=user.phone,
-            emergency_contact=f"9{random.randint(100000000, 999999999)}",
-            medical_certificate_provided=(leave_type.name == 'Sick Leave'),
-            status=status,
-            applied_at=datetime.now() - timedelta(days=random.randint(0, 30))
-        )
-        
-        # If approved or rejected, set admin as approver
-        if status != 'pending':
-            admin = User.query.filter_by(role='admin').first()
-            if admin:
-                application.approved_by = admin.id
-                application.approved_at = application.applied_at + timedelta(days=random.randint(1, 5))
-        
-        db.session.add(application)
-        created_applications += 1
-    
-    print(f"✓ Created {created_applications} sample leave applications")
-
-def initialize_leave_balances():
-    """Initialize leave balances for all users"""
-    users = User.query.filter_by(role='staff').all()
-    for user in users:
-        init_leave_balances(user)  # Pass user object instead of user.id
-    print(f"✓ Initialized leave balances for {len(users)} users")
-
-def create_sample_audit_logs():
-    """Create sample audit logs for system activity"""
-    users = User.query.all()
-    actions = [
-        'User Login',
-        'Profile Updated',
-        'Leave Application Submitted',
-        'Leave Application Approved',
-        'Leave Application Rejected',
-        'Password Changed'
-    ]
-    
-    created_logs = 0
-    for _ in range(50):  # Create 50 sample logs
-        user = random.choice(users)
-        action = random.choice(actions)
-        timestamp = datetime.now() - timedelta(days=random.randint(0, 30))
-        
-        log = AuditLog(
-            user_id=user.id,
-            action=action,
-            entity_type='User',  # Required field
-            entity_id=user.id,
-            timestamp=timestamp,
-            ip_address=f"192.168.1.{random.randint(1, 254)}"
-        )
-        
-        db.session.add(log)
-        created_logs += 1
-    
-    print(f"✓ Created {created_logs} sample audit logs")
+        choices.append((leave_type, shortest, longest))
+        weights.append(teaching if user['staff_type'] == 'teaching' else non_teaching)
+    return choices, weights
+
+
+def _decide_status(rng, start, as_of):
+    roll = rng.random()
+    if start > as_of:
+        return 'approved' if roll < 0.5 else 'pending' if roll < 0.95 else 'cancelled'
+    return 'approved' if roll < 0.82 else 'rejected' if roll < 0.92 else 'cancelled' if roll < 0.97 else 'pending'
+
+
+def generate_user_history(rng, user, count, leave_types, approver_ids, window, as_of, state, writer):
+    """Write one user's applications, their audit entries and the user's balances.
+
+    Applications never overlap, and approved or pending days never exceed the
+    yearly allowance for their leave type; requests that would are rejected.
+    """
+    choices, weights = _leave_choices(leave_types, user)
+    first_day = max(window[0], user['date_joined'])
+    if first_day > window[1]:
+        return
+    now = datetime.combine(as_of, time(18))
+
+    starts = []
+    while len(starts) < count and choices:
+        day = first_day + timedelta(days=rng.randint(0, (window[1] - first_day).days))
+        if rng.random() < MONTH_WEIGHTS[day.month - 1]:
+            starts.append(day)
+    starts.sort()
+
+    used, pending = Counter(), Counter()
+    previous_end = None
+    for start in starts:
+        start = _next_weekday(start)
+        if previous_end is not None and start <= previous_end:
+            start = _next_weekday(previous_end + timedelta(days=1))
+        if start > window[1]:
+            break
+
+        leave_type, shortest, longest = rng.choices(choices, weights)[0]
+        total_days = rng.randint(shortest, longest)
+        end = _add_working_days(start, total_days)
+        status = _decide_status(rng, start, as_of)
+        rejection_reason = None
+
+        key = (leave_type.id, start.year)
+        allowance = leave_type.allowance
+        if status in ('approved', 'pending') and used[key] + pending[key] + total_days > allowance:
+            status, rejection_reason = 'rejected', 'Insufficient leave balance'
+        elif status == 'rejected':
+            rejection_reason = rng.choice(REJECTION_REASONS)
+        if status == 'approved':
+            used[key] += total_days
+        elif status == 'pending':
+            pending[key] += total_days
+
+        applied_at = min(_random_datetime(rng, start - timedelta(days=rng.randint(1, 21))), now)
+        approved_by = approved_at = None
+        if status in ('approved', 'rejected'):
+            approved_by = rng.choice(approver_ids) if approver_ids else None
+            approved_at = min(applied_at + timedelta(hours=rng.randint(2, 96)), now)
+
+        application_id = state['next_application_id']
+        state['next_application_id'] += 1
+        writer.add('leave_applications', (
+            application_id, user['id'], leave_type.id, start, end, total_days, rng.choice(LEAVE_REASONS),
+            user['phone'], f"9{rng.randint(100000000, 999999999)}", leave_type.name == 'Sick Leave',
+            status, applied_at, approved_by, approved_at, rejection_reason, None))
+        previous_end = end
 
-def main():
+        if state['audit_budget'] > 0:
+            writer.add('audit_logs', (user['id'], 'Leave Application Submitted', 'LeaveApplication',
+                                      application_id, None, status, applied_at, _ip_address(rng)))
+            state['audit_budget'] -= 1
+        if approved_at is not None and state['audit_budget'] > 0:
+            writer.add('audit_logs', (approved_by, f'Leave Application {status.title()}', 'LeaveApplication',
+                                      application_id, 'pending', status, approved_at, _ip_address(rng)))
+            state['audit_budget'] -= 1
+
+    for year in range(max(window[0].year, user['date_joined'].year), window[1].year + 1):
+        for leave_type, _, _ in choices:
+            key = (leave_type.id, year)
+            writer.add('leave_balances', (user['id'], leave_type.id, year, leave_type.allowance,
+                                          used[key], pending[key], 0))
+
+
+def generate_sessions(rng, count, user_ids, window, writer):
+    """Fill the audit trail with Login/Logout pairs"""
+    span = (window[1] - window[0]).days
+    for _ in range(count // 2):
+        user_id = rng.choice(user_ids)
+        login = _random_datetime(rng, window[0] + timedelta(days=rng.randint(0, span)))
+        ip_address = _ip_address(rng)
+        writer.add('audit_logs', (user_id, 'Login', 'User', user_id, None, None, login, ip_address))
+        writer.add('audit_logs', (user_id, 'Logout', 'User', user_id, None, None,
+                                  login + timedelta(minutes=rng.randint(5, 480)), ip_address))
+    if count % 2:
+        user_id = rng.choice(user_ids)
+        writer.add('audit_logs', (user_id, 'Login', 'User', user_id, None, None,
+                                  _random_datetime(rng, window[1]), _ip_address(rng)))
+
+
+def generate_dataset(users=25, applications=30, audit_logs=50, days=180, seed=42, as_of=None, batch_size=10000):
+    """Generate a reproducible dataset on top of the admin user and leave types.
+
+    Applications span ``days`` of history up to a month past ``as_of``. The
+    same seed and ``as_of`` always produce the same rows.
+    """
+    rng = random.Random(seed)
+    as_of = as_of or date.today()
+    window = (as_of - timedelta(days=days), as_of + timedelta(days=30))
+
+    # Plain tuples: ORM attribute access is measurable over millions of rows
+    leave_types = [LeaveTypeInfo(leave_type.id, leave_type.name, leave_type.max_days_per_year or 0,
+                                 leave_type.applicable_to_teaching, leave_type.applicable_to_non_teaching)
+                   for leave_type in LeaveType.query.filter_by(is_active=True).order_by(LeaveType.id)]
+    approver_ids = [row[0] for row in db.session.query(User.id).filter_by(role='admin').order_by(User.id)]
+    next_application_id = (db.session.query(func.max(LeaveApplication.id)).scalar() or 0) + 1
+    db.session.commit()
+
+    with db.engine.connect() as connection:
+        writer = BulkWriter(connection, batch_size=batch_size)
+
+        started = perf_counter()
+        staff = generate_users(rng, users, as_of, writer)
+        if not staff:
+            print("✓ Sample users already exist")
+            return writer.counts
+        print(f"✓ Created {len(staff):,} staff in {perf_counter() - started:.1f}s")
+
+        started = perf_counter()
+        state = {'next_application_id': next_application_id, 'audit_budget': audit_logs}
+        counts = _split(rng, applications, [user['activity'] for user in staff])
+        for user, count in zip(staff, counts):
+            generate_user_history(rng, user, count, leave_types, approver_ids, window, as_of, state, writer)
+        writer.flush()
+        print(f"✓ Created {writer.counts['leave_applications']:,} leave applications and "
+              f"{writer.counts['leave_balances']:,} leave balances in {perf_counter() - started:.1f}s")
+
+        started = perf_counter()
+        generate_sessions(rng, state['audit_budget'], [user['id'] for user in staff], window, writer)
+        writer.flush()
+        writer.reset_sequences('users', 'leave_applications')
+        print(f"✓ Created {writer.counts['audit_logs']:,} audit logs in {perf_counter() - started:.1f}s")
+
+    return writer.counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Populate the database with demo or benchmark-sized data.')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='demo',
+                        help='Dataset size; the options below override individual numbers.')
+    parser.add_argument('--users', type=int, help='Number of staff members.')
+    parser.add_argument('--applications', type=int, help='Number of leave applications.')
+    parser.add_argument('--audit-logs', type=int, help='Number of audit log rows.')
+    parser.add_argument('--days', type=int, help='Days of history to spread applications over.')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42).')
+    parser.add_argument('--as-of', type=date.fromisoformat, default=None,
+                        help='Date the history ends at, YYYY-MM-DD (default: today).')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows per bulk insert.')
+    args = parser.parse_args(argv)
+
+    users, applications, audit_logs, days = PRESETS[args.preset]
+    args.users = users if args.users is None else args.users
+    args.applications = applications if args.applications is None else args.applications
+    args.audit_logs = audit_logs if args.audit_logs is None else args.audit_logs
+    args.days = days if args.days is None else args.days
+    return args
+
+
+def main(argv=None):
     """Main function to populate demo data"""
+    args = parse_args(argv)
     print("🚀 Starting demo data population for College Leave Management System...")
     print("=" * 70)
     
+    app = create_app()
     with app.app_context():
         try:
-            # Create tables if they don't exist
-            db.create_all()
+            # Create missing tables and apply the migrations (search index, later indexes),
+            # exactly as 'flask init-db' does
+            init_db()
             
             # Create admin user
             create_admin_user()
@@ -316,23 +575,12 @@ def main():
             # Create leave types
             create_leave_types()
             
-            # Create sample users
-            create_sample_users()
-            
-            # Commit user creation
+            # Commit so the generator sees the admin and leave types
             db.session.commit()
             
-            # Initialize leave balances (skip if already done)
-            # initialize_leave_balances()
-            
-            # Create sample applications
-            create_sample_leave_applications()
-            
-            # Create audit logs
-            create_sample_audit_logs()
-            
-            # Final commit
-            db.session.commit()
+            # Staff, applications, balances and audit logs in bulk
+            generate_dataset(users=args.users, applications=args.applications, audit_logs=args.audit_logs,
+                             days=args.days, seed=args.seed, as_of=args.as_of, batch_size=args.batch_size)
             
             print("=" * 70)
             print("✅ Demo data population completed successfully!")
@@ -350,4 +598,4 @@ def main():
             raise
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
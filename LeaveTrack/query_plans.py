@@ -0,0 +1,86 @@
+"""EXPLAIN checks for the hot LeaveApplication/LeaveBalance queries.
+
+``check_hot_queries()`` runs the planner over the same queries the views use
+and reports whether each one is served by its intended index. It works on
+SQLite (``EXPLAIN QUERY PLAN``) and PostgreSQL (``EXPLAIN`` with sequential
+scans disabled, so small development tables still show the usable index).
+"""
+
+from datetime import date, datetime
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app import db
+from models import LeaveApplication, LeaveBalance
+from utils import get_year_bounds, leave_conflict_query, pending_applications_query, user_history_query
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = 'EXPLAIN QUERY PLAN ' if compiler.dialect.name == 'sqlite' else 'EXPLAIN '
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def hot_queries():
+    """Map of query name to (statement, expected index name)"""
+    year_start, year_end = get_year_bounds(datetime.now().year)
+    today = date.today()
+
+    return {
+        'pending_queue': (
+            pending_applications_query().statement,
+            'ix_leave_applications_status_applied_at',
+        ),
+        'approved_this_year': (
+            select(func.count(LeaveApplication.id)).where(
+                LeaveApplication.status == 'approved',
+                LeaveApplication.applied_at >= year_start,
+                LeaveApplication.applied_at < year_end
+            ),
+            'ix_leave_applications_status_applied_at',
+        ),
+        'leave_conflict': (
+            leave_conflict_query(1, today, today).with_entities(LeaveApplication.id).statement,
+            'ix_leave_applications_user_status_dates',
+        ),
+        'leave_history': (
+            user_history_query(1).statement,
+            'ix_leave_applications_user_applied_at',
+        ),
+        'leave_balances': (
+            select(LeaveBalance).where(LeaveBalance.user_id == 1, LeaveBalance.year == today.year),
+            'ix_leave_balances_user_year',
+        ),
+    }
+
+
+def explain(connection, statement):
+    """Planner output for a statement as a single string"""
+    rows = connection.execute(Explain(statement)).fetchall()
+    if connection.dialect.name == 'sqlite':
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(row[0] for row in rows)
+
+
+def check_hot_queries():
+    """Return [(name, expected_index, used, plan)] for every hot query"""
+    results = []
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('SET LOCAL enable_seqscan = off'))
+
+        for name, (statement, index_name) in hot_queries().items():
+            plan = explain(connection, statement)
+            results.append((name, index_name, index_name in plan, plan))
+
+        connection.rollback()
+    return results
@@ -1,15 +1,34 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort
+from flask import (Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort, Response,
+                   stream_with_context, current_app)
 from flask_login import login_user, logout_user, login_required, current_user
-from datetime import datetime, date, timedelta
-from sqlalchemy import and_, or_, extract, func
+from datetime import datetime, date
+from sqlalchemy import and_, func
+from sqlalchemy.orm import joinedload
 from werkzeug.security import generate_password_hash
 import calendar
 
 from app import db
-from models import User, LeaveApplication, LeaveType, LeaveBalance, AuditLog
+from models import User, LeaveApplication, LeaveType, AuditLog, Holiday
 from forms import (LoginForm, RegistrationForm, LeaveApplicationForm, LeaveApprovalForm, 
-                  ProfileUpdateForm, PasswordChangeForm, LeaveTypeForm)
-from utils import calculate_working_days, get_leave_statistics, check_leave_conflict, init_leave_balances
+                  ProfileUpdateForm, PasswordChangeForm, LeaveTypeForm, HolidayForm, BulkApprovalForm,
+                  StaffImportForm)
+from utils import (get_leave_statistics, init_leave_balances, get_monthly_leave_data, build_calendar_buckets,
+                   get_cached_dashboard_stats, dashboard_stats_cache, user_history_query,
+                   pending_applications_query)
+from leave_service import (LeaveServiceError, submit_application, decide_application, cancel_application,
+                           bulk_decide_applications, recompute_pending_working_days)
+from audit import record_audit
+from events import get_broker, event_stream
+from change_counters import APPLICATIONS, HOLIDAYS, USERS, bump_version, conditional_json, get_versions
+from pagination import InvalidCursor, decode_cursor, encode_cursor, paginate_keyset
+from reports import iter_leave_report, iter_csv, iter_xlsx, xlsx_available
+from search import filter_users, autocomplete_users
+from staff_import import StaffImportError, detect_format, import_staff, read_rows
+from user_cache import remember_user_version, user_cache
+from instrumentation import get_instrumentation
+from db_routing import use_primary
+from audit_archive import search_audit_logs
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, instrument_blueprint, metrics_allowed, refresh_backlog
 
 # Create blueprints
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -28,6 +47,15 @@ def index():
             return redirect(url_for('dashboard.staff'))
     return render_template('index.html')
 
+@main_bp.route('/metrics')
+def metrics():
+    if not current_app.config.get('METRICS_ENABLED') or 'metrics' not in current_app.extensions:
+        abort(404)
+    if not metrics_allowed():
+        abort(403)
+    refresh_backlog()
+    return Response(current_app.extensions['metrics'].exposition(), content_type=METRICS_CONTENT_TYPE)
+
 # Authentication routes
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -39,13 +67,12 @@ def login():
         user = User.query.filter_by(employee_id=form.employee_id.data).first()
         if user and user.check_password(form.password.data) and user.is_active:
             login_user(user)
+            remember_user_version(user)
             flash('Login successful!', 'success')
             
             # Log the login
-            log = AuditLog(user_id=user.id, action='Login', entity_type='User', 
-                          entity_id=user.id, ip_address=request.remote_addr)
-            db.session.add(log)
-            db.session.commit()
+            if not record_audit(user.id, 'Login', 'User', user.id, ip_address=request.remote_addr):
+                db.session.commit()
             
             next_page = request.args.get('next')
             if next_page:
@@ -74,11 +101,15 @@ def register():
         user.set_password(form.password.data)
         
         db.session.add(user)
+        bump_version(USERS)
         db.session.commit()
         
         # Initialize leave balances for the new user
         init_leave_balances(user)
         
+        dashboard_stats_cache.adjust(total_staff=1, teaching_staff=user.staff_type == 'teaching',
+                                     non_teaching_staff=user.staff_type == 'non_teaching')
+        
         flash('Registration successful! You can now log in.', 'success')
         return redirect(url_for('auth.login'))
     
@@ -86,12 +117,11 @@ def register():
 
 @auth_bp.route('/logout')
 @login_required
+@use_primary
 def logout():
     # Log the logout
-    log = AuditLog(user_id=current_user.id, action='Logout', entity_type='User', 
-                  entity_id=current_user.id, ip_address=request.remote_addr)
-    db.session.add(log)
-    db.session.commit()
+    if not record_audit(current_user.id, 'Logout', 'User', current_user.id, ip_address=request.remote_addr):
+        db.session.commit()
     
     logout_user()
     flash('You have been logged out.', 'info')
@@ -126,6 +156,8 @@ def staff():
                          recent_applications=recent_applications,
                          upcoming_leaves=upcoming_leaves)
 
+PENDING_PAGE_SIZE = 20
+
 @dashboard_bp.route('/admin')
 @login_required
 def admin():
@@ -133,43 +165,92 @@ def admin():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('dashboard.staff'))
     
-    # Get pending applications
-    pending_applications = LeaveApplication.query.filter_by(status='pending')\
-        .order_by(LeaveApplication.applied_at.desc()).all()
-    
-    # Get overall statistics
-    total_staff = User.query.filter_by(role='staff', is_active=True).count()
-    teaching_staff = User.query.filter_by(staff_type='teaching', is_active=True).count()
-    non_teaching_staff = User.query.filter_by(staff_type='non_teaching', is_active=True).count()
+    # One keyset page of the pending queue; its size comes from the cached stats
+    pending_page = paginate_keyset(
+        pending_applications_query().options(
+            joinedload(LeaveApplication.applicant, innerjoin=True),
+            joinedload(LeaveApplication.leave_type, innerjoin=True)
+        ),
+        (LeaveApplication.applied_at, LeaveApplication.id),
+        cursor=request.args.get('cursor'), per_page=PENDING_PAGE_SIZE, descending=True
+    )
     
-    current_year = datetime.now().year
-    total_applications = LeaveApplication.query.filter(
-        extract('year', LeaveApplication.applied_at) == current_year
-    ).count()
-    
-    approved_applications = LeaveApplication.query.filter(
-        and_(
-            LeaveApplication.status == 'approved',
-            extract('year', LeaveApplication.applied_at) == current_year
-        )
-    ).count()
+    # Get overall statistics, rebuilt when another worker has written since
+    versions = get_versions(APPLICATIONS, USERS)
+    stats = get_cached_dashboard_stats({name: version for name, (version, _) in versions.items()})
     
     # Get recent activities
-    recent_activities = AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(10).all()
-    
-    stats = {
-        'total_staff': total_staff,
-        'teaching_staff': teaching_staff,
-        'non_teaching_staff': non_teaching_staff,
-        'total_applications': total_applications,
-        'approved_applications': approved_applications,
-        'pending_applications': len(pending_applications)
-    }
+    recent_activities = AuditLog.query.options(joinedload(AuditLog.user, innerjoin=True))\
+        .order_by(AuditLog.timestamp.desc()).limit(10).all()
     
     return render_template('dashboard/admin.html', 
                          stats=stats, 
-                         pending_applications=pending_applications,
-                         recent_activities=recent_activities)
+                         pending_applications=pending_page.items,
+                         pending_page=pending_page,
+                         pending_page_size=PENDING_PAGE_SIZE,
+                         recent_activities=recent_activities,
+                         bulk_form=BulkApprovalForm())
+
+@dashboard_bp.route('/api/stats')
+@login_required
+def api_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    
+    def build(versions):
+        return {'stats': get_cached_dashboard_stats(versions),
+                'generated_at': datetime.utcnow().isoformat() + 'Z'}
+    
+    return conditional_json((APPLICATIONS, USERS), build, key=f'stats{datetime.now().year}')
+
+@dashboard_bp.route('/api/pending')
+@login_required
+def api_pending():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    
+    def build(versions):
+        applications = pending_applications_query().options(
+            joinedload(LeaveApplication.applicant, innerjoin=True),
+            joinedload(LeaveApplication.leave_type, innerjoin=True)
+        ).limit(limit).all()
+        return {
+            'count': pending_applications_query().order_by(None).count(),
+            'applications': [{
+                'id': application.id,
+                'employee_id': application.applicant.employee_id,
+                'name': application.applicant.full_name,
+                'department': application.applicant.department,
+                'leave_type': application.leave_type.name,
+                'color_code': application.leave_type.color_code,
+                'start_date': application.start_date.isoformat(),
+                'end_date': application.end_date.isoformat(),
+                'total_days': application.total_days,
+                'applied_at': application.applied_at.isoformat(),
+                'review_url': url_for('leave.approve', application_id=application.id),
+            } for application in applications],
+        }
+    
+    return conditional_json((APPLICATIONS, USERS), build, key=f'pending{limit}')
+
+@dashboard_bp.route('/events')
+@login_required
+@use_primary
+def events():
+    """Server-Sent Events stream of the current user's leave notifications"""
+    broker = get_broker()
+    subscription = broker.subscribe(current_user.id)
+    
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    replayed = broker.replay(current_user.id, last_event_id) if last_event_id is not None else []
+    
+    response = Response(event_stream(subscription, replayed, current_app.config.get('SSE_HEARTBEAT', 15.0)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # Leave management routes
 @leave_bp.route('/apply', methods=['GET', 'POST'])
@@ -178,49 +259,22 @@ def apply():
     form = LeaveApplicationForm(user=current_user)
     
     if form.validate_on_submit():
-        # Check for leave conflicts
-        conflict = check_leave_conflict(current_user.id, form.start_date.data, form.end_date.data)
-        if conflict:
-            flash('You have overlapping leave applications for the selected dates.', 'error')
+        try:
+            submit_application(
+                current_user,
+                form.leave_type_id.data,
+                form.start_date.data,
+                form.end_date.data,
+                form.reason.data,
+                contact_during_leave=form.contact_during_leave.data,
+                emergency_contact=form.emergency_contact.data,
+                medical_certificate_provided=form.medical_certificate_provided.data,
+                ip_address=request.remote_addr
+            )
+        except LeaveServiceError as e:
+            flash(str(e), 'error')
             return render_template('leave/apply.html', form=form)
         
-        # Calculate working days
-        total_days = calculate_working_days(form.start_date.data, form.end_date.data)
-        
-        application = LeaveApplication(
-            user_id=current_user.id,
-            leave_type_id=form.leave_type_id.data,
-            start_date=form.start_date.data,
-            end_date=form.end_date.data,
-            total_days=total_days,
-            reason=form.reason.data,
-            contact_during_leave=form.contact_during_leave.data,
-            emergency_contact=form.emergency_contact.data,
-            medical_certificate_provided=form.medical_certificate_provided.data
-        )
-        
-        db.session.add(application)
-        db.session.commit()
-        
-        # Update pending days in leave balance
-        current_year = form.start_date.data.year
-        balance = LeaveBalance.query.filter_by(
-            user_id=current_user.id,
-            leave_type_id=form.leave_type_id.data,
-            year=current_year
-        ).first()
-        
-        if balance:
-            balance.pending_days += total_days
-            db.session.commit()
-        
-        # Log the action
-        log = AuditLog(user_id=current_user.id, action='Leave Application Submitted', 
-                      entity_type='LeaveApplication', entity_id=application.id,
-                      ip_address=request.remote_addr)
-        db.session.add(log)
-        db.session.commit()
-        
         flash('Leave application submitted successfully!', 'success')
         return redirect(url_for('leave.history'))
     
@@ -229,21 +283,41 @@ def apply():
 @leave_bp.route('/history')
 @login_required
 def history():
-    page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', 'all')
-    
-    query = LeaveApplication.query.filter_by(user_id=current_user.id)
-    
-    if status_filter != 'all':
-        query = query.filter_by(status=status_filter)
-    
-    applications = query.order_by(LeaveApplication.applied_at.desc())\
-        .paginate(page=page, per_page=10, error_out=False)
+    applications = _history_page(status_filter, request.args.get('cursor'), with_total=True)
     
     return render_template('leave/history.html', 
                          applications=applications, 
                          status_filter=status_filter)
 
+@leave_bp.route('/api/history')
+@login_required
+def api_history():
+    status_filter = request.args.get('status', 'all')
+    per_page = min(request.args.get('per_page', 10, type=int), 100)
+    applications = _history_page(status_filter, request.args.get('cursor'), per_page=per_page,
+                                 with_total=request.args.get('count', type=int) == 1)
+    
+    return jsonify(applications.to_dict(lambda application: {
+        'id': application.id,
+        'leave_type_id': application.leave_type_id,
+        'start_date': application.start_date.isoformat(),
+        'end_date': application.end_date.isoformat(),
+        'total_days': application.total_days,
+        'status': application.status,
+        'applied_at': application.applied_at.isoformat(),
+    }))
+
+def _history_page(status_filter, cursor, per_page=10, with_total=False):
+    """One keyset page of the current user's applications, newest first"""
+    status = None if status_filter == 'all' else status_filter
+    return paginate_keyset(
+        user_history_query(current_user.id, status),
+        (LeaveApplication.applied_at, LeaveApplication.id),
+        cursor=cursor, per_page=per_page, descending=True,
+        count_key=('history', current_user.id, status) if with_total else None
+    )
+
 @leave_bp.route('/approve/<int:application_id>', methods=['GET', 'POST'])
 @login_required
 def approve(application_id):
@@ -260,45 +334,80 @@ def approve(application_id):
     form = LeaveApprovalForm()
     
     if form.validate_on_submit():
-        old_status = application.status
-        application.status = form.status.data
-        application.approved_by = current_user.id
-        application.approved_at = datetime.utcnow()
-        application.comments = form.comments.data
-        
-        if form.status.data == 'rejected':
-            application.rejection_reason = form.rejection_reason.data
-        
-        # Update leave balance
-        balance = LeaveBalance.query.filter_by(
-            user_id=application.user_id,
-            leave_type_id=application.leave_type_id,
-            year=application.start_date.year
-        ).first()
-        
-        if balance:
-            balance.pending_days -= application.total_days
-            if form.status.data == 'approved':
-                balance.used_days += application.total_days
-        
-        db.session.commit()
-        
-        # Log the action
-        log = AuditLog(user_id=current_user.id, 
-                      action=f'Leave Application {form.status.data.title()}', 
-                      entity_type='LeaveApplication', entity_id=application.id,
-                      old_values=old_status, new_values=form.status.data,
-                      ip_address=request.remote_addr)
-        db.session.add(log)
-        db.session.commit()
+        try:
+            decide_application(application, form.status.data, current_user.id,
+                               comments=form.comments.data,
+                               rejection_reason=form.rejection_reason.data,
+                               ip_address=request.remote_addr)
+        except LeaveServiceError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('dashboard.admin'))
         
         flash(f'Leave application {form.status.data} successfully!', 'success')
         return redirect(url_for('dashboard.admin'))
     
     return render_template('leave/approve.html', application=application, form=form)
 
+@leave_bp.route('/approve/bulk', methods=['POST'])
+@login_required
+def bulk_approve():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
+    
+    form = BulkApprovalForm()
+    
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, 'error')
+        return redirect(url_for('dashboard.admin'))
+    
+    results = bulk_decide_applications(form.application_ids.data, form.status.data, current_user.id,
+                                       comments=form.comments.data,
+                                       rejection_reason=form.rejection_reason.data,
+                                       ip_address=request.remote_addr)
+    
+    processed = sum(1 for result in results if result['result'] == form.status.data)
+    skipped = len(results) - processed
+    flash(f'{processed} leave application(s) {form.status.data} successfully!', 'success')
+    if skipped:
+        flash(f'{skipped} application(s) were skipped because they were already processed or not found.', 'info')
+    
+    return redirect(url_for('dashboard.admin'))
+
+@leave_bp.route('/api/approve/bulk', methods=['POST'])
+@login_required
+def api_bulk_approve():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    application_ids = payload.get('application_ids')
+    status = payload.get('status')
+    
+    if (not isinstance(application_ids, list) or not application_ids
+            or not all(type(application_id) is int for application_id in application_ids)):
+        return jsonify({'error': 'application_ids must be a non-empty list of integers.'}), 400
+    if status not in ('approved', 'rejected'):
+        return jsonify({'error': "status must be 'approved' or 'rejected'."}), 400
+    if status == 'rejected' and not payload.get('rejection_reason'):
+        return jsonify({'error': 'rejection_reason is required when rejecting.'}), 400
+    
+    results = bulk_decide_applications(application_ids, status, current_user.id,
+                                       comments=payload.get('comments'),
+                                       rejection_reason=payload.get('rejection_reason'),
+                                       ip_address=request.remote_addr)
+    
+    return jsonify({
+        'status': status,
+        'processed': sum(1 for result in results if result['result'] == status),
+        'results': results
+    })
+
 @leave_bp.route('/cancel/<int:application_id>')
 @login_required
+@use_primary
 def cancel(application_id):
     application = LeaveApplication.query.get_or_404(application_id)
     
@@ -310,28 +419,11 @@ def cancel(application_id):
         flash('You can only cancel pending applications.', 'error')
         return redirect(url_for('leave.history'))
     
-    old_status = application.status
-    application.status = 'cancelled'
-    
-    # Update leave balance
-    balance = LeaveBalance.query.filter_by(
-        user_id=current_user.id,
-        leave_type_id=application.leave_type_id,
-        year=application.start_date.year
-    ).first()
-    
-    if balance:
-        balance.pending_days -= application.total_days
-    
-    db.session.commit()
-    
-    # Log the action
-    log = AuditLog(user_id=current_user.id, action='Leave Application Cancelled', 
-                  entity_type='LeaveApplication', entity_id=application.id,
-                  old_values=old_status, new_values='cancelled',
-                  ip_address=request.remote_addr)
-    db.session.add(log)
-    db.session.commit()
+    try:
+        cancel_application(application, current_user.id, ip_address=request.remote_addr)
+    except LeaveServiceError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('leave.history'))
     
     flash('Leave application cancelled successfully!', 'info')
     return redirect(url_for('leave.history'))
@@ -342,61 +434,40 @@ def calendar_view():
     year = request.args.get('year', datetime.now().year, type=int)
     month = request.args.get('month', datetime.now().month, type=int)
     
-    # Get leaves for the month
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    if not 1 <= month <= 12:
+        abort(404)
     
-    if current_user.role == 'admin':
-        # Admin can see all approved leaves
-        leaves = LeaveApplication.query.filter(
-            and_(
-                LeaveApplication.status == 'approved',
-                or_(
-                    and_(LeaveApplication.start_date <= end_date, LeaveApplication.end_date >= start_date)
-                )
-            )
-        ).all()
-    else:
-        # Staff can see only their own leaves
-        leaves = LeaveApplication.query.filter(
-            and_(
-                LeaveApplication.user_id == current_user.id,
-                LeaveApplication.status.in_(['approved', 'pending']),
-                or_(
-                    and_(LeaveApplication.start_date <= end_date, LeaveApplication.end_date >= start_date)
-                )
-            )
-        ).all()
+    # Admins see all approved leaves, staff only their own
+    is_admin = current_user.role == 'admin'
+    leaves = get_monthly_leave_data(year, month, user_id=None if is_admin else current_user.id)
+    leave_data = build_calendar_buckets(leaves, year, month, include_staff=is_admin)
     
     # Create calendar data
     cal = calendar.monthcalendar(year, month)
     month_name = calendar.month_name[month]
     
-    # Process leaves for calendar display
-    leave_data = {}
-    for leave in leaves:
-        current_date = leave.start_date
-        while current_date <= leave.end_date:
-            if start_date <= current_date <= end_date:
-                if current_date not in leave_data:
-                    leave_data[current_date] = []
-                leave_data[current_date].append({
-                    'application': leave,
-                    'type': leave.leave_type.name,
-                    'color': leave.leave_type.color_code,
-                    'staff': leave.applicant.full_name if current_user.role == 'admin' else None
-                })
-            current_date += timedelta(days=1)
+    summary = {
+        'days_with_leave': sum(1 for events in leave_data if events),
+        'approved': sum(1 for leave in leaves if leave.status == 'approved'),
+        'pending': sum(1 for leave in leaves if leave.status == 'pending'),
+        'staff': len({leave.user_id for leave in leaves})
+    }
+    
+    prev_year, prev_month = (year, month - 1) if month > 1 else (year - 1, 12)
+    next_year, next_month = (year, month + 1) if month < 12 else (year + 1, 1)
     
     return render_template('leave/calendar.html', 
                          calendar=cal, 
                          year=year, 
                          month=month, 
                          month_name=month_name,
-                         leave_data=leave_data)
+                         leave_data=leave_data,
+                         summary=summary,
+                         prev_year=prev_year,
+                         prev_month=prev_month,
+                         next_year=next_year,
+                         next_month=next_month,
+                         today=date.today())
 
 # Admin routes
 @admin_bp.route('/users')
@@ -406,32 +477,100 @@ def users():
         flash('Access denied. Admin privileges required.', 'error')
         return redirect(url_for('dashboard.staff'))
     
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     staff_type = request.args.get('staff_type', 'all')
+    users = _users_page(search, staff_type, request.args.get('cursor'), with_total=True)
     
-    query = User.query.filter_by(is_active=True)
-    
-    if search:
-        query = query.filter(
-            or_(
-                User.first_name.contains(search),
-                User.last_name.contains(search),
-                User.employee_id.contains(search),
-                User.email.contains(search)
-            )
-        )
+    return render_template('admin/users.html', 
+                         users=users, 
+                         search=search, 
+                         staff_type=staff_type)
+
+@admin_bp.route('/api/users')
+@login_required
+def api_users():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    users = _users_page(request.args.get('search', ''), request.args.get('staff_type', 'all'),
+                        request.args.get('cursor'), per_page=per_page,
+                        with_total=request.args.get('count', type=int) == 1)
+    
+    return jsonify(users.to_dict(lambda user: {
+        'id': user.id,
+        'employee_id': user.employee_id,
+        'name': user.full_name,
+        'email': user.email,
+        'department': user.department,
+        'designation': user.designation,
+        'staff_type': user.staff_type,
+    }))
+
+def _users_page(search, staff_type, cursor, per_page=20, with_total=False):
+    """One keyset page of active users ordered by name"""
+    query = filter_users(User.query.filter_by(is_active=True), search)
     
     if staff_type != 'all':
         query = query.filter_by(staff_type=staff_type)
     
-    users = query.order_by(User.first_name, User.last_name)\
-        .paginate(page=page, per_page=20, error_out=False)
+    return paginate_keyset(
+        query, (User.first_name, User.last_name, User.id),
+        cursor=cursor, per_page=per_page,
+        count_key=('users', search.strip().lower(), staff_type) if with_total else None
+    )
+
+@admin_bp.route('/users/import', methods=['GET', 'POST'])
+@login_required
+def import_users():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
     
-    return render_template('admin/users.html', 
-                         users=users, 
-                         search=search, 
-                         staff_type=staff_type)
+    form = StaffImportForm()
+    result = None
+    
+    if form.validate_on_submit():
+        upload = form.staff_file.data
+        try:
+            rows = read_rows(upload.stream, detect_format(upload.filename))
+            result = import_staff(rows, dry_run=form.dry_run.data,
+                                  batch_size=current_app.config['STAFF_IMPORT_BATCH_SIZE'],
+                                  max_rows=current_app.config['STAFF_IMPORT_MAX_UPLOAD_ROWS'])
+        except StaffImportError as e:
+            flash(str(e), 'error')
+        else:
+            if result.dry_run:
+                flash(f'{result.imported} row(s) would be imported, {len(result.rejected)} rejected.', 'info')
+            else:
+                if result.imported:
+                    dashboard_stats_cache.adjust(total_staff=result.imported,
+                                                 teaching_staff=result.by_staff_type['teaching'],
+                                                 non_teaching_staff=result.by_staff_type['non_teaching'])
+                    if not record_audit(current_user.id, 'Staff Import', 'User', current_user.id,
+                                        new_values=f'{result.imported} imported, {len(result.rejected)} rejected',
+                                        ip_address=request.remote_addr):
+                        db.session.commit()
+                flash(f'Imported {result.imported} staff member(s); {len(result.rejected)} row(s) rejected.',
+                      'success' if not result.rejected else 'warning')
+    
+    return render_template('admin/import_users.html', form=form, result=result)
+
+@admin_bp.errorhandler(413)
+def upload_too_large(error):
+    limit = current_app.config['MAX_CONTENT_LENGTH'] // 1024
+    flash(f'The upload is larger than {limit} KB; import large staff files with "flask import-staff".', 'error')
+    return redirect(url_for('admin.import_users'))
+
+@admin_bp.route('/api/users/autocomplete')
+@login_required
+def api_user_autocomplete():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    
+    term = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 25)
+    return jsonify({'query': term, 'results': autocomplete_users(term, limit=limit)})
 
 @admin_bp.route('/leave_types', methods=['GET', 'POST'])
 @login_required
@@ -447,6 +586,7 @@ def leave_types():
             name=form.name.data,
             description=form.description.data,
             max_days_per_year=form.max_days_per_year.data,
+            max_carry_forward_days=form.max_carry_forward_days.data or 0,
             requires_medical_certificate=form.requires_medical_certificate.data,
             applicable_to_teaching=form.applicable_to_teaching.data,
             applicable_to_non_teaching=form.applicable_to_non_teaching.data,
@@ -462,9 +602,180 @@ def leave_types():
     leave_types = LeaveType.query.filter_by(is_active=True).all()
     return render_template('admin/leave_types.html', form=form, leave_types=leave_types)
 
+@admin_bp.route('/holidays', methods=['GET', 'POST'])
+@login_required
+def holidays():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
+    
+    form = HolidayForm()
+    
+    if form.validate_on_submit():
+        holiday = Holiday(
+            name=form.name.data,
+            holiday_date=form.holiday_date.data,
+            description=form.description.data
+        )
+        
+        db.session.add(holiday)
+        db.session.flush()
+        
+        # Pending applications spanning the new holiday now cover one working day less;
+        # cached working-day tables are dropped once this commits
+        bump_version(HOLIDAYS)
+        updated = recompute_pending_working_days(holiday.holiday_date, holiday.holiday_date)
+        
+        record_audit(current_user.id, 'Holiday Added', 'Holiday', holiday.id,
+                     new_values=holiday.holiday_date.isoformat(), ip_address=request.remote_addr)
+        db.session.commit()
+        
+        flash(f'Holiday added successfully! {updated} pending application(s) recalculated.', 'success')
+        return redirect(url_for('admin.holidays'))
+    
+    year = request.args.get('year', datetime.now().year, type=int)
+    holidays = Holiday.query.filter(
+        and_(Holiday.holiday_date >= date(year, 1, 1), Holiday.holiday_date < date(year + 1, 1, 1))
+    ).order_by(Holiday.holiday_date).all()
+    
+    return render_template('admin/holidays.html', form=form, holidays=holidays, year=year)
+
+@admin_bp.route('/holidays/<int:holiday_id>/delete', methods=['POST'])
+@login_required
+def delete_holiday(holiday_id):
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
+    
+    holiday = Holiday.query.get_or_404(holiday_id)
+    holiday_date = holiday.holiday_date
+    
+    db.session.delete(holiday)
+    db.session.flush()
+    
+    bump_version(HOLIDAYS)
+    updated = recompute_pending_working_days(holiday_date, holiday_date)
+    
+    record_audit(current_user.id, 'Holiday Removed', 'Holiday', holiday_id,
+                 old_values=holiday_date.isoformat(), ip_address=request.remote_addr)
+    db.session.commit()
+    
+    flash(f'Holiday removed. {updated} pending application(s) recalculated.', 'info')
+    return redirect(url_for('admin.holidays', year=holiday_date.year))
+
+@admin_bp.route('/api/cache-stats')
+@login_required
+def api_cache_stats():
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin privileges required.'}), 403
+    
+    return jsonify({
+        'user_loader': user_cache.stats(),
+        'dashboard_stats': dashboard_stats_cache.stats()
+    })
+
+@admin_bp.route('/diagnostics')
+@login_required
+def diagnostics():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
+    
+    instrumentation = get_instrumentation(current_app)
+    return render_template('admin/diagnostics.html',
+                         instrumentation=instrumentation,
+                         endpoints=instrumentation.endpoint_stats() if instrumentation else [],
+                         flagged=instrumentation.flagged_requests() if instrumentation else [])
+
+@admin_bp.route('/diagnostics/reset', methods=['POST'])
+@login_required
+def reset_diagnostics():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
+    
+    instrumentation = get_instrumentation(current_app)
+    if instrumentation:
+        instrumentation.reset()
+        flash('Diagnostics cleared.', 'info')
+    return redirect(url_for('admin.diagnostics'))
+
+@admin_bp.route('/audit')
+@login_required
+def audit_log():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
+    
+    filters = {
+        'employee_id': request.args.get('employee_id', '').strip(),
+        'action': request.args.get('action', '').strip(),
+        'entity_type': request.args.get('entity_type', '').strip(),
+        'start': request.args.get('start', type=date.fromisoformat),
+        'end': request.args.get('end', type=date.fromisoformat),
+    }
+    before = None
+    if request.args.get('cursor'):
+        try:
+            before, _ = decode_cursor(request.args['cursor'])
+        except InvalidCursor:
+            pass
+    
+    user_id = None
+    if filters['employee_id']:
+        user = User.query.filter_by(employee_id=filters['employee_id']).first()
+        user_id = user.id if user else -1
+    
+    entries, next_key = search_audit_logs(
+        current_app.config['AUDIT_ARCHIVE_DIR'], start=filters['start'], end=filters['end'], user_id=user_id,
+        action=filters['action'], entity_type=filters['entity_type'], before=before
+    )
+    user_ids = {entry.user_id for entry in entries}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    
+    return render_template('admin/audit.html',
+                         entries=entries,
+                         users=users,
+                         filters=filters,
+                         next_cursor=encode_cursor(next_key, 'next') if next_key else None,
+                         paged=before is not None,
+                         retention_days=current_app.config['AUDIT_RETENTION_DAYS'])
+
+@admin_bp.route('/reports/export')
+@login_required
+def export_report():
+    if current_user.role != 'admin':
+        flash('Access denied. Admin privileges required.', 'error')
+        return redirect(url_for('dashboard.staff'))
+    
+    export_format = request.args.get('format', 'csv')
+    filters = {
+        'user_id': request.args.get('user_id', type=int),
+        'start_date': request.args.get('start_date', type=date.fromisoformat),
+        'end_date': request.args.get('end_date', type=date.fromisoformat),
+        'leave_type_id': request.args.get('leave_type_id', type=int),
+        'status': request.args.get('status') or None,
+    }
+    filename = f"leave_report_{datetime.now():%Y%m%d_%H%M%S}"
+    
+    if export_format == 'xlsx':
+        if not xlsx_available():
+            flash('XLSX export needs the optional xlsxwriter package (pip install ".[xlsx]"); '
+                  'please export as CSV instead.', 'error')
+            return redirect(url_for('dashboard.admin'))
+        body = iter_xlsx(iter_leave_report(**filters))
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        export_format = 'csv'
+        body = iter_csv(iter_leave_report(**filters))
+        mimetype = 'text/csv'
+    
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'
+    })
+
 def register_blueprints(app):
-    app.register_blueprint(main_bp)
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(dashboard_bp)
-    app.register_blueprint(leave_bp)
-    app.register_blueprint(admin_bp)
+    for blueprint in (main_bp, auth_bp, dashboard_bp, leave_bp, admin_bp):
+        if app.config.get('METRICS_ENABLED'):
+            instrument_blueprint(blueprint)
+        app.register_blueprint(blueprint)
@@ -0,0 +1,230 @@
+"""Staff directory search.
+
+The admin user list and the autocomplete endpoint search first name, last
+name, employee ID and email. Instead of four ``LIKE '%x%'`` scans the search
+goes through an index chosen by dialect:
+
+* SQLite: an external-content FTS5 table ``users_fts`` using the trigram
+  tokenizer, kept in sync with ``users`` by triggers. Every word of the
+  search must appear somewhere in the document, as with the old LIKE filters
+  ("pri sha" finds Priya Sharma, "001" finds EMP001, "sharma@" finds
+  sharma@college.edu). Trigrams cannot index words shorter than three
+  characters, so those words are checked with LIKE against the rows the
+  longer words already matched.
+* PostgreSQL: GIN expression indexes over the same document, one trigram
+  (pg_trgm) index serving substring search and one ``simple`` tsvector index
+  serving prefix typeahead. Expression indexes are maintained by the
+  database itself, so inserts and profile updates need no extra work.
+
+The index is created by the ``0002_user_search_index`` migration and moved
+to trigrams by ``0006_user_search_trigram`` (``flask db-upgrade``). Until it exists, or on other dialects, searches fall
+back to the old LIKE filters.
+"""
+
+import logging
+import re
+
+from sqlalchemy import and_, column, func, inspect, literal_column, select, table, text
+
+from app import db
+from models import User
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Shortest word the FTS5 trigram tokenizer can match
+_TRIGRAM = 3
+
+# Must stay byte-for-byte identical to the indexed expressions below
+_DOCUMENT = "first_name || ' ' || last_name || ' ' || employee_id || ' ' || email"
+_PG_TRGM_DOCUMENT = f"lower({_DOCUMENT})"
+_PG_TSV_DOCUMENT = f"to_tsvector('simple', {_DOCUMENT})"
+
+users_fts = table('users_fts', column('rowid'), column('rank'))
+
+
+def search_tokens(term):
+    """Split a search string into lowercase word tokens"""
+    return [token.lower() for token in _TOKEN_RE.findall(term or '')][:8]
+
+
+class LikeSearch:
+    """Unindexed fallback: every token must appear somewhere in the document"""
+
+    name = 'like'
+
+    def filter(self, tokens):
+        return and_(*(
+            User.first_name.contains(token, autoescape=True) | User.last_name.contains(token, autoescape=True)
+            | User.employee_id.contains(token, autoescape=True) | User.email.contains(token, autoescape=True)
+            for token in tokens
+        ))
+
+
+class SQLiteFTSSearch:
+    name = 'sqlite-fts5'
+
+    @staticmethod
+    def split(tokens):
+        """(words the trigram index can match, words too short for it)"""
+        return ([token for token in tokens if len(token) >= _TRIGRAM],
+                [token for token in tokens if len(token) < _TRIGRAM])
+
+    def _match(self, tokens):
+        return literal_column('users_fts').op('MATCH')(' '.join(f'"{token}"' for token in tokens))
+
+    def filter(self, tokens):
+        indexed, short = self.split(tokens)
+        clauses = []
+        if indexed:
+            clauses.append(User.id.in_(select(users_fts.c.rowid).where(self._match(indexed))))
+        if short:
+            clauses.append(LikeSearch().filter(short))
+        return and_(*clauses)
+
+    def ranked(self, tokens):
+        """(rowid, rank) subquery ordered by bm25 relevance; tokens must be indexable"""
+        return select(users_fts.c.rowid, users_fts.c.rank).where(self._match(tokens)).subquery()
+
+
+class PostgresSearch:
+    name = 'postgresql-trgm'
+
+    def filter(self, tokens):
+        document = literal_column(_PG_TRGM_DOCUMENT)
+        return and_(*(document.like('%' + token.replace('_', '\\_') + '%', escape='\\')
+                      for token in tokens))
+
+    def tsquery(self, tokens):
+        return func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+
+    def prefix_filter(self, tokens):
+        return literal_column(_PG_TSV_DOCUMENT).op('@@')(self.tsquery(tokens))
+
+
+_backends = {}
+
+
+def _index_exists(bind):
+    if bind.dialect.name == 'sqlite':
+        return inspect(bind).has_table('users_fts')
+    if bind.dialect.name == 'postgresql':
+        indexes = {index['name'] for index in inspect(bind).get_indexes('users')}
+        return {'ix_users_search_trgm', 'ix_users_search_tsv'} <= indexes
+    return False
+
+
+def search_backend():
+    """Backend for the current engine, detected once per engine"""
+    engine = db.engine
+    backend = _backends.get(engine)
+    if backend is None:
+        if _index_exists(engine):
+            backend = SQLiteFTSSearch() if engine.dialect.name == 'sqlite' else PostgresSearch()
+        else:
+            if engine.dialect.name in ('sqlite', 'postgresql'):
+                logger.warning("User search index missing, falling back to LIKE (run 'flask db-upgrade')")
+            backend = LikeSearch()
+        _backends[engine] = backend
+    return backend
+
+
+def filter_users(query, term):
+    """Restrict a User query to rows matching the search term"""
+    tokens = search_tokens(term)
+    if not tokens:
+        return query
+    return query.filter(search_backend().filter(tokens))
+
+
+def autocomplete_users(term, limit=10):
+    """Best prefix matches among active users for typeahead"""
+    tokens = search_tokens(term)
+    if not tokens:
+        return []
+
+    backend = search_backend()
+    query = db.session.query(User.id, User.employee_id, User.first_name, User.last_name,
+                             User.email, User.department).filter_by(is_active=True)
+
+    if isinstance(backend, SQLiteFTSSearch) and backend.split(tokens)[0]:
+        indexed, short = backend.split(tokens)
+        ranked = backend.ranked(indexed)
+        query = query.join(ranked, ranked.c.rowid == User.id).order_by(ranked.c.rank)
+        if short:
+            query = query.filter(LikeSearch().filter(short))
+    elif isinstance(backend, PostgresSearch):
+        query = query.filter(backend.prefix_filter(tokens)).order_by(
+            func.ts_rank(literal_column(_PG_TSV_DOCUMENT), backend.tsquery(tokens)).desc())
+    else:
+        query = query.filter(backend.filter(tokens))
+
+    rows = query.order_by(User.first_name, User.last_name).limit(limit).all()
+    return [{
+        'id': row.id,
+        'employee_id': row.employee_id,
+        'name': f'{row.first_name} {row.last_name}',
+        'email': row.email,
+        'department': row.department,
+    } for row in rows]
+
+
+def create_search_index(connection):
+    """Create the dialect's search index; safe to re-run"""
+    dialect = connection.dialect.name
+
+    if dialect == 'sqlite':
+        try:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+                "first_name, last_name, employee_id, email, "
+                "content='users', content_rowid='id', tokenize='trigram')"
+            ))
+        except Exception:
+            logger.warning("SQLite lacks FTS5 or its trigram tokenizer (3.34+); user search stays on LIKE")
+            return
+        columns = 'first_name, last_name, employee_id, email'
+        new_values = 'new.first_name, new.last_name, new.employee_id, new.email'
+        old_values = 'old.first_name, old.last_name, old.employee_id, old.email'
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN "
+            f"INSERT INTO users_fts (rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN "
+            f"INSERT INTO users_fts (users_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        ))
+        connection.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF {columns} ON users BEGIN "
+            f"INSERT INTO users_fts (users_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO users_fts (rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        rebuild_search_index(connection)
+
+    elif dialect == 'postgresql':
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users "
+            f"USING gin (({_PG_TRGM_DOCUMENT}) gin_trgm_ops)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_users_search_tsv ON users USING gin (({_PG_TSV_DOCUMENT}))"
+        ))
+
+    _backends.clear()
+
+
+def drop_search_index(connection):
+    """Drop the SQLite FTS table and its triggers (PostgreSQL indexes are left alone)"""
+    if connection.dialect.name == 'sqlite':
+        for trigger in ('users_fts_insert', 'users_fts_delete', 'users_fts_update'):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        connection.execute(text("DROP TABLE IF EXISTS users_fts"))
+    _backends.clear()
+
+
+def rebuild_search_index(connection):
+    """Repopulate the SQLite FTS table from users (PostgreSQL needs nothing)"""
+    if connection.dialect.name == 'sqlite' and inspect(connection).has_table('users_fts'):
+        connection.execute(text("INSERT INTO users_fts (users_fts) VALUES ('rebuild')"))
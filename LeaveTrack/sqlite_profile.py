@@ -0,0 +1,155 @@
+"""Connection profile for SQLite deployments.
+
+SQLite's defaults suit a single writer: the rollback journal blocks readers
+while a write commits, every commit waits for two fsyncs, and a connection
+that finds the database locked gives up at once. Each new connection to a
+SQLite engine (primary and replicas) is therefore set up with:
+
+* ``journal_mode=WAL`` - readers and the writer no longer block each other;
+* ``synchronous=NORMAL`` - safe with WAL, fsyncs only at checkpoints;
+* ``busy_timeout`` - wait for a competing writer instead of failing with
+  "database is locked";
+* ``mmap_size`` and ``cache_size`` - read pages through the OS page cache
+  and keep more of them per connection;
+* ``foreign_keys=ON`` - enforce the declared foreign keys.
+
+On the primary, the driver opens its implicit transaction (just before the
+first INSERT/UPDATE/DELETE) with ``BEGIN IMMEDIATE`` instead of a deferred
+``BEGIN``. Writes read before they write, and a deferred transaction that
+has to upgrade its read lock fails immediately when another connection is
+writing, whatever the busy timeout; taking the write lock up front makes it
+queue on the timeout instead. Reads keep running outside any transaction,
+so the lock is only held from the first write to the commit.
+
+The WAL file is checkpointed back into the database automatically every
+1000 pages, but a long-running reader can hold that off. A maintenance
+thread (started with the first request, every
+``SQLITE_MAINTENANCE_INTERVAL`` seconds) and ``flask sqlite-maintenance``
+therefore also run ``wal_checkpoint`` and ``PRAGMA optimize``, which
+refreshes the planner statistics.
+"""
+
+import logging
+import threading
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+def is_sqlite(url):
+    return str(url).startswith('sqlite')
+
+
+def engine_options(url):
+    """``SQLALCHEMY_ENGINE_OPTIONS`` for the configured database"""
+    if is_sqlite(url):
+        # There is no server to drop idle connections, so neither a liveness
+        # ping per checkout nor recycling buys anything
+        return {}
+    return {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+
+
+def connection_pragmas(config):
+    """The PRAGMA statements run on every new connection"""
+    pragmas = [
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        # Negative values are KiB rather than pages
+        f"PRAGMA cache_size={-int(config['SQLITE_CACHE_SIZE_KB'])}",
+        f"PRAGMA foreign_keys={'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}",
+    ]
+    return pragmas
+
+
+def tune_engine(engine, config, primary=True):
+    """Apply the profile to an engine before it opens its first connection"""
+    pragmas = connection_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, record):
+        # The driver's implicit BEGIN before the first write; replicas are
+        # only read, so they never need the write lock
+        if primary:
+            dbapi_connection.isolation_level = 'IMMEDIATE'
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def run_maintenance(engine, checkpoint='PASSIVE'):
+    """Checkpoint the WAL and refresh planner statistics; returns the checkpoint result"""
+    if checkpoint not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode {checkpoint!r}")
+    with engine.connect() as connection:
+        busy, log_pages, checkpointed = connection.exec_driver_sql(
+            f"PRAGMA wal_checkpoint({checkpoint})").one()
+        connection.exec_driver_sql("PRAGMA optimize")
+    return {'busy': bool(busy), 'wal_pages': log_pages, 'checkpointed_pages': checkpointed}
+
+
+class MaintenanceThread:
+    """Runs run_maintenance() on the primary every ``interval`` seconds"""
+
+    def __init__(self, engine, interval):
+        self.engine = engine
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                result = run_maintenance(self.engine)
+                logger.debug("SQLite maintenance: %s", result)
+            except Exception:
+                logger.exception("SQLite maintenance failed")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='sqlite-maintenance', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def init_sqlite_profile(app):
+    """Tune every SQLite engine; the maintenance thread starts with the first request"""
+    from app import db
+
+    if not app.config.get('SQLITE_TUNING'):
+        return None
+
+    for key, engine in db.engines.items():
+        if engine.dialect.name == 'sqlite':
+            tune_engine(engine, app.config, primary=key is None)
+
+    primary = db.engines[None]
+    interval = app.config.get('SQLITE_MAINTENANCE_INTERVAL', 0)
+    if primary.dialect.name != 'sqlite' or interval <= 0:
+        return None
+
+    maintenance = MaintenanceThread(primary, interval)
+    app.extensions['sqlite_maintenance'] = maintenance
+
+    @app.before_request
+    def _start_sqlite_maintenance():
+        maintenance.start()
+
+    return maintenance
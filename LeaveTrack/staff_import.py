@@ -0,0 +1,285 @@
+"""Bulk staff import from CSV or JSON.
+
+Registering staff one at a time through ``auth.register`` costs two
+uniqueness queries, a password hash and a commit per user, then one more
+commit for their leave balances. An import instead:
+
+  1. validates every row against the registration rules, including
+     duplicates inside the file;
+  2. checks uniqueness against the database with one set query per batch
+     (``employee_id IN (...) OR email IN (...)``);
+  3. hashes passwords in-process, or on a small pool of spawned processes
+     when ``workers`` asks for one (hashing is CPU bound);
+  4. inserts each batch of users with one executemany and allocates their
+     current-year ``LeaveBalance`` rows with one ``INSERT ... SELECT`` per
+     leave type, committing users and balances together.
+
+Rejected rows never stop the import; they are collected with their line
+number and reason in ``ImportResult.rejected`` and ``report_csv()``.
+
+The admin upload runs inside a request, so it hashes in-process and stops
+reading a file as soon as it has seen more than ``max_rows`` rows; large
+imports go through ``flask import-staff``.
+The pool is only started from the CLI, and uses the ``spawn`` start method
+so no worker inherits a forked copy of the app, its engine or its threads.
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+from collections import namedtuple
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from email_validator import EmailNotValidError, validate_email
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from app import db
+from balances import allocate_user_balances
+from change_counters import USERS, bump_version
+from models import User
+
+BATCH_SIZE = 500
+# Below this many passwords the pool costs more to start than it saves
+POOL_THRESHOLD = 32
+
+REQUIRED_FIELDS = ('employee_id', 'email', 'first_name', 'last_name', 'department', 'designation',
+                   'staff_type', 'password')
+# (min, max) lengths, mirroring RegistrationForm
+LENGTHS = {
+    'employee_id': (3, 20),
+    'email': (0, 120),
+    'first_name': (2, 50),
+    'last_name': (2, 50),
+    'department': (0, 100),
+    'designation': (0, 100),
+    'phone': (0, 15),
+    'password': (6, None),
+}
+STAFF_TYPES = ('teaching', 'non_teaching')
+
+RejectedRow = namedtuple('RejectedRow', 'line employee_id email reason')
+
+
+class StaffImportError(ValueError):
+    """The file as a whole could not be read"""
+
+
+class ImportResult:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.imported = 0
+        self.balances = 0
+        self.rejected = []
+        self.by_staff_type = {staff_type: 0 for staff_type in STAFF_TYPES}
+
+    def reject(self, line, row, reason):
+        self.rejected.append(RejectedRow(line, row.get('employee_id', ''), row.get('email', ''), reason))
+
+    def report_csv(self):
+        """Rejected rows as CSV text"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(RejectedRow._fields)
+        writer.writerows(self.rejected)
+        return buffer.getvalue()
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.csv', '.json'):
+        return extension[1:]
+    raise StaffImportError(f'Unsupported file type {extension or "(none)"}; use .csv or .json')
+
+
+def _normalise_key(key):
+    return (key or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _normalise(record):
+    return {_normalise_key(key): ('' if value is None else str(value).strip())
+            for key, value in record.items() if key is not None}
+
+
+def read_rows(stream, file_format):
+    """Yield (line, row) from a CSV or JSON file object, text or binary.
+
+    For JSON the line is the 1-based position of the record in the array.
+    """
+    if file_format == 'json':
+        try:
+            data = json.load(stream)
+        except ValueError as e:
+            raise StaffImportError(f'Invalid JSON: {e}')
+        if isinstance(data, dict):
+            data = data.get('staff')
+        if not isinstance(data, list):
+            raise StaffImportError('JSON must be an array of staff records (or {"staff": [...]})')
+        for position, record in enumerate(data, start=1):
+            yield position, _normalise(record) if isinstance(record, dict) else {}
+        return
+
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(stream)
+    header = [_normalise_key(name) for name in reader.fieldnames or ()]
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if missing:
+        raise StaffImportError(f'CSV is missing column(s): {", ".join(missing)}')
+    reader.fieldnames = header
+    for row in reader:
+        yield reader.line_num, _normalise(row)
+
+
+def validate_row(row):
+    """Return the reason a row cannot be imported, or None"""
+    for name in REQUIRED_FIELDS:
+        if not row.get(name):
+            return f'{name} is required'
+    for name, (minimum, maximum) in LENGTHS.items():
+        value = row.get(name, '')
+        if value and len(value) < minimum:
+            return f'{name} must be at least {minimum} characters'
+        if maximum is not None and len(value) > maximum:
+            return f'{name} must be at most {maximum} characters'
+    if row['staff_type'] not in STAFF_TYPES:
+        return f'staff_type must be one of: {", ".join(STAFF_TYPES)}'
+    try:
+        validate_email(row['email'], check_deliverability=False)
+    except EmailNotValidError:
+        return 'email is not a valid address'
+    return None
+
+
+def existing_identities(rows):
+    """Employee ids and emails among ``rows`` that are already registered, in one query"""
+    employee_ids = [row['employee_id'] for row in rows]
+    emails = [row['email'] for row in rows]
+    taken = db.session.execute(
+        select(User.employee_id, User.email).where(
+            or_(User.employee_id.in_(employee_ids), User.email.in_(emails)))
+    ).all()
+    return {employee_id for employee_id, _ in taken}, {email for _, email in taken}
+
+
+def hash_passwords(passwords, pool=None, workers=1):
+    """Hash passwords, in ``pool`` (of ``workers`` processes) when the batch is big enough"""
+    if pool is None or len(passwords) < POOL_THRESHOLD:
+        return [generate_password_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(generate_password_hash, passwords, chunksize=chunksize))
+
+
+def _user_values(row, password_hash):
+    return {
+        'employee_id': row['employee_id'],
+        'email': row['email'],
+        'password_hash': password_hash,
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'department': row['department'],
+        'designation': row['designation'],
+        'staff_type': row['staff_type'],
+        'phone': row.get('phone') or None,
+        'address': row.get('address') or None,
+    }
+
+
+def _reject_taken(batch, result):
+    """Drop rows whose employee id or email is already registered"""
+    if not batch:
+        return batch
+    taken_ids, taken_emails = existing_identities([row for _, row in batch])
+    accepted = []
+    for line, row in batch:
+        if row['employee_id'] in taken_ids:
+            result.reject(line, row, 'employee_id already exists')
+        elif row['email'] in taken_emails:
+            result.reject(line, row, 'email already registered')
+        else:
+            accepted.append((line, row))
+    return accepted
+
+
+def _insert_batch(batch, pool, workers, year, result):
+    hashes = hash_passwords([row['password'] for _, row in batch], pool, workers)
+    values = [_user_values(row, password_hash) for (_, row), password_hash in zip(batch, hashes)]
+
+    try:
+        user_ids = db.session.scalars(insert(User).returning(User.id), values).all()
+        result.balances += allocate_user_balances(user_ids, year)
+        bump_version(USERS)
+        db.session.commit()
+    except IntegrityError:
+        # Someone registered one of these identities since the batch was checked
+        db.session.rollback()
+        return False
+
+    result.imported += len(batch)
+    for _, row in batch:
+        result.by_staff_type[row['staff_type']] += 1
+    return True
+
+
+def import_staff(rows, dry_run=False, batch_size=BATCH_SIZE, workers=1, year=None, max_rows=None):
+    """Import ``(line, row)`` pairs as staff users; returns an ImportResult.
+
+    ``workers`` is the password hashing pool size (1 hashes in-process; the
+    pool never grows past the CPU count). A file with more than
+    ``max_rows`` rows raises StaffImportError once row ``max_rows + 1`` is
+    read, before anything is validated or written.
+    """
+    result = ImportResult(dry_run=dry_run)
+    year = year or date.today().year
+
+    if max_rows is not None:
+        rows = list(islice(rows, max_rows + 1))
+        if len(rows) > max_rows:
+            raise StaffImportError(f'The file has more than {max_rows} rows, the most this page imports at once; '
+                                   f'use "flask import-staff" for large files')
+
+    valid = []
+    seen_ids, seen_emails = set(), set()
+    for line, row in rows:
+        reason = validate_row(row)
+        if reason is None and row['employee_id'] in seen_ids:
+            reason = 'duplicate employee_id in file'
+        if reason is None and row['email'] in seen_emails:
+            reason = 'duplicate email in file'
+        if reason is not None:
+            result.reject(line, row, reason)
+            continue
+        seen_ids.add(row['employee_id'])
+        seen_emails.add(row['email'])
+        valid.append((line, row))
+
+    batches = [_reject_taken(valid[start:start + batch_size], result)
+               for start in range(0, len(valid), batch_size)]
+    if dry_run:
+        result.imported = sum(len(batch) for batch in batches)
+        result.rejected.sort(key=lambda rejected: rejected.line)
+        return result
+
+    workers = max(1, min(workers or 1, os.cpu_count() or 1))
+    pool = None
+    if workers > 1 and len(valid) >= POOL_THRESHOLD:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for batch in batches:
+            if batch and not _insert_batch(batch, pool, workers, year, result):
+                # Re-check against the database and retry without the conflicting rows
+                batch = _reject_taken(batch, result)
+                if batch and not _insert_batch(batch, pool, workers, year, result):
+                    for line, row in batch:
+                        result.reject(line, row, 'could not be inserted (conflicting concurrent change)')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result.rejected.sort(key=lambda rejected: rejected.line)
+    return result
@@ -27,6 +27,7 @@ let dashboardState = {
     autoRefresh: false,
     charts: {},
     counters: {},
+    etags: {},
     notifications: []
 };
 
@@ -64,7 +65,6 @@ function initializeDashboard() {
     
     // Setup common dashboard features
     setupQuickActions();
-    initializeNotifications();
     setupSearchFunctionality();
     initializeCalendarIntegration();
     
@@ -133,7 +133,7 @@ function initializeAdminDashboard() {
 function setupDashboardEventListeners() {
     // Refresh button
     document.addEventListener('click', function(e) {
-        if (e.target.matches('[data-action="refresh"]')) {
+        if (e.target.closest('[data-action="refresh"]')) {
             e.preventDefault();
             refreshDashboard();
         }
@@ -472,74 +472,113 @@ function toggleAutoRefresh(enabled) {
 }
 
 /**
- * Refresh dashboard data
+ * Fetch a dashboard JSON endpoint with a conditional GET.
+ * Resolves to the parsed body, or null when the server answered 304.
+ */
+function fetchIfChanged(url) {
+    const headers = {'Accept': 'application/json'};
+    const etag = dashboardState.etags[url];
+    if (etag) {
+        headers['If-None-Match'] = etag;
+    }
+    
+    return fetch(url, {headers: headers, cache: 'no-store', credentials: 'same-origin'})
+        .then(response => {
+            if (response.status === 304) {
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error(`${url} returned ${response.status}`);
+            }
+            dashboardState.etags[url] = response.headers.get('ETag');
+            return response.json();
+        });
+}
+
+/**
+ * Refresh dashboard data from the JSON API
  */
 function refreshDashboardData() {
-    console.log('Refreshing dashboard data...');
+    const section = document.querySelector('[data-stats-url]');
+    if (!section) {
+        return Promise.resolve();
+    }
     
     // Show loading indicator
     const refreshButton = document.querySelector('[data-action="refresh"]');
-    if (refreshButton) {
-        const icon = refreshButton.querySelector('i');
-        if (icon) {
-            icon.className = 'fas fa-sync-alt fa-spin';
-        }
+    const icon = refreshButton ? refreshButton.querySelector('i') : null;
+    if (icon) {
+        icon.className = 'fas fa-sync-alt fa-spin';
     }
     
-    // Simulate data refresh (replace with actual API calls)
-    setTimeout(() => {
-        // Update statistics
-        updateStatisticsCards();
-        
-        // Update charts
-        updateCharts();
-        
-        // Update notifications
-        updateNotifications();
+    return Promise.all([
+        fetchIfChanged(section.dataset.statsUrl),
+        fetchIfChanged(section.dataset.pendingUrl)
+    ]).then(([statsData, pendingData]) => {
+        if (statsData) {
+            updateStatisticsCards(statsData.stats);
+            updateNotifications(statsData.stats.pending_applications);
+        }
+        if (pendingData) {
+            updatePendingQueue(pendingData);
+        }
         
-        // Update timestamp
         dashboardState.lastUpdate = new Date();
         updateLastRefreshTime();
-        
-        // Reset refresh button
-        if (refreshButton) {
-            const icon = refreshButton.querySelector('i');
-            if (icon) {
-                icon.className = 'fas fa-sync-alt';
-            }
+    }).finally(() => {
+        if (icon) {
+            icon.className = 'fas fa-sync-alt';
         }
-        
-        console.log('Dashboard data refreshed');
-    }, 1000);
+    });
 }
 
 /**
  * Update statistics cards with animation
  */
-function updateStatisticsCards() {
-    const statCards = document.querySelectorAll('.stat-card');
-    
-    statCards.forEach((card, index) => {
-        const numberElement = card.querySelector('.stat-number');
-        if (!numberElement) return;
+function updateStatisticsCards(stats) {
+    document.querySelectorAll('[data-stat]').forEach((element, index) => {
+        const name = element.dataset.stat;
+        if (!(name in stats)) return;
         
-        // Simulate new data (replace with actual data)
-        const currentValue = parseInt(numberElement.textContent);
-        const newValue = currentValue + Math.floor(Math.random() * 5) - 2;
+        const currentValue = parseInt(element.textContent) || 0;
+        const newValue = stats[name];
+        if (element.classList.contains('badge')) {
+            element.style.display = newValue > 0 ? '' : 'none';
+        }
+        if (currentValue === newValue) return;
         
-        // Animate counter
-        animateNumber(numberElement, currentValue, Math.max(0, newValue), 1000);
+        animateNumber(element, currentValue, newValue, 1000);
         
-        // Add update animation to card
-        setTimeout(() => {
-            card.classList.add('animate__animated', 'animate__pulse');
+        const card = element.closest('.stat-card');
+        if (card) {
             setTimeout(() => {
-                card.classList.remove('animate__animated', 'animate__pulse');
-            }, 1000);
-        }, index * 200);
+                card.classList.add('animate__animated', 'animate__pulse');
+                setTimeout(() => {
+                    card.classList.remove('animate__animated', 'animate__pulse');
+                }, 1000);
+            }, index * 200);
+        }
     });
 }
 
+/**
+ * Flag the pending table as stale when the queue no longer matches it
+ */
+function updatePendingQueue(data) {
+    const notice = document.getElementById('pendingChangedNotice');
+    if (!notice) return;
+    
+    // The table shows one page of the queue; only the first page can be compared item by item
+    const section = document.querySelector('[data-pending-url]');
+    const shown = Array.from(document.querySelectorAll('.pending-select')).map(box => parseInt(box.value));
+    const firstPage = !section || section.dataset.pendingFirstPage !== 'false';
+    const changed = (section !== null && data.count !== parseInt(section.dataset.pendingTotal)) ||
+        (firstPage && (data.applications.length !== shown.length ||
+            data.applications.some((application, index) => shown[index] !== application.id)));
+    
+    notice.classList.toggle('d-none', !changed);
+}
+
 /**
  * Animate number change
  */
@@ -762,47 +801,15 @@ function setupStatisticsCards() {
     });
 }
 
-/**
- * Initialize notifications
- */
-function initializeNotifications() {
-    // Setup notification polling
-    setInterval(checkForNotifications, 60000); // Check every minute
-    
-    // Initial notification check
-    checkForNotifications();
-}
-
-/**
- * Check for new notifications
- */
-function checkForNotifications() {
-    // Simulate notification checking (replace with actual API call)
-    const notifications = [
-        {
-            type: 'info',
-            message: 'Your leave application has been approved',
-            timestamp: new Date(),
-            read: false
-        }
-    ];
-    
-    notifications.forEach(notification => {
-        if (!notification.read) {
-            showNotification(notification.message, notification.type);
-        }
-    });
-}
-
 /**
  * Update notifications
  */
-function updateNotifications() {
-    // Update notification indicators
+function updateNotifications(count) {
+    if (count === undefined) return;
+    
+    // Update notification indicators with the pending count
     const notificationBadges = document.querySelectorAll('.notification-badge');
     notificationBadges.forEach(badge => {
-        // Simulate new notification count
-        const count = Math.floor(Math.random() * 5);
         badge.textContent = count;
         badge.style.display = count > 0 ? 'block' : 'none';
     });
@@ -916,11 +923,7 @@ function refreshDashboard() {
     }
     
     // Refresh all components
-    Promise.all([
-        refreshDashboardData(),
-        updateCharts(),
-        updateNotifications()
-    ]).then(() => {
+    refreshDashboardData().then(() => {
         if (window.hideLoading) {
             hideLoading();
         }
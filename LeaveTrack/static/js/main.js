@@ -40,9 +40,40 @@ function initializeApp() {
     // Initialize theme
     initializeTheme();
     
+    // Subscribe to pushed leave notifications
+    setupEventStream();
+    
     console.log('Application initialized successfully');
 }
 
+/**
+ * Listen for server-sent leave notifications.
+ * EventSource reconnects on its own and resends Last-Event-ID, so missed
+ * events are replayed by the server.
+ */
+function setupEventStream() {
+    const url = document.body.dataset.eventsUrl;
+    if (!url || !window.EventSource) return;
+    
+    const source = new EventSource(url);
+    const types = {
+        'leave.approved': 'success',
+        'leave.rejected': 'error',
+        'leave.cancelled': 'info'
+    };
+    
+    Object.keys(types).forEach(eventType => {
+        source.addEventListener(eventType, event => {
+            const data = JSON.parse(event.data);
+            const text = document.createElement('span');
+            text.textContent = data.message;
+            showNotification(text.innerHTML, types[eventType], 8000);
+        });
+    });
+    
+    window.addEventListener('beforeunload', () => source.close());
+}
+
 /**
  * Show loading overlay
  */
@@ -0,0 +1,112 @@
+"""Shared fixtures: a fresh SQLite database per test, built through the migrations."""
+
+import itertools
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'test-password'
+# Tests log in many times; the production hash settings would dominate their run time
+PASSWORD_HASH = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+
+_employee_numbers = itertools.count(1)
+
+
+@pytest.fixture
+def app_overrides():
+    """Extra create_app config; override in a test module to change it"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_overrides):
+    from app import create_app, db
+    from migrations import init_db
+    from user_cache import user_cache
+    from utils import dashboard_stats_cache
+    from working_days import working_days
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'WTF_CSRF_ENABLED': False,
+        'METRICS_ENABLED': False,
+        'NOTIFICATION_DISPATCHER': 'off',
+        'SQLITE_MAINTENANCE_INTERVAL': 0,
+        'AUDIT_ARCHIVE_DIR': str(tmp_path / 'audit-archive'),
+        **app_overrides,
+    })
+    # Process-wide caches outlive a test's database
+    working_days.invalidate()
+    user_cache.invalidate()
+    dashboard_stats_cache.invalidate()
+
+    with app.app_context():
+        init_db()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_user(app):
+    from app import db
+    from models import User
+
+    def make_user(role='staff', **fields):
+        number = next(_employee_numbers)
+        values = dict(employee_id=f'T{number:05}', email=f'user{number}@college.edu', password_hash=PASSWORD_HASH,
+                      first_name=f'User{number}', last_name='Test', department='QA', designation='Tester',
+                      staff_type='teaching', role=role)
+        values.update(fields)
+        user = User(**values)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def leave_type(app):
+    from app import db
+    from models import LeaveType
+
+    leave_type = LeaveType(name='Casual Leave', max_days_per_year=100)
+    db.session.add(leave_type)
+    db.session.commit()
+    return leave_type
+
+
+@pytest.fixture
+def login(app):
+    def login(user):
+        client = app.test_client()
+        response = client.post('/auth/login', data={'employee_id': user.employee_id, 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+
+    return login
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager collecting the SQL statements run inside it"""
+    from contextlib import contextmanager
+    from app import db
+
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def record(connection, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    return count_queries
@@ -0,0 +1,26 @@
+from datetime import date, datetime, timedelta
+
+
+def test_admin_dashboard_pages_the_pending_queue(app, make_user, leave_type, login):
+    from app import db
+    from models import LeaveApplication
+    from routes import PENDING_PAGE_SIZE
+
+    admin = make_user(role='admin')
+    staff = make_user()
+    applied = datetime(2026, 1, 1)
+    total = PENDING_PAGE_SIZE + 5
+    db.session.add_all(LeaveApplication(user_id=staff.id, leave_type_id=leave_type.id, start_date=date(2026, 2, 2),
+                                        end_date=date(2026, 2, 2), total_days=1, reason='Paging test',
+                                        applied_at=applied + timedelta(minutes=n)) for n in range(total))
+    db.session.commit()
+
+    client = login(admin)
+    first = client.get('/dashboard/admin')
+    assert first.status_code == 200
+    assert first.data.count(b'name="application_ids"') == PENDING_PAGE_SIZE
+    assert f'{total} pending in total'.encode() in first.data
+
+    next_url = first.data.decode().split('Older')[0].rsplit('href="', 1)[1].split('"')[0].replace('&amp;', '&')
+    second = client.get(next_url)
+    assert second.data.count(b'name="application_ids"') == total - PENDING_PAGE_SIZE
@@ -0,0 +1,105 @@
+"""Audit log retention: archiving old rows, dry runs and the merged search."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+
+RETENTION_DAYS = 180
+
+
+@pytest.fixture
+def audit_rows(app, make_user):
+    """Two rows past retention (in different months) and two recent ones; returns their ids newest first"""
+    from app import db
+    from models import AuditLog
+
+    user = make_user()
+    now = datetime.utcnow()
+    ages = [1, 10, RETENTION_DAYS + 5, RETENTION_DAYS + 60]
+    rows = [AuditLog(user_id=user.id, action='Test', entity_type='User', entity_id=user.id,
+                     timestamp=now - timedelta(days=age)) for age in ages]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [row.id for row in rows]
+
+
+def _hot_ids():
+    from models import AuditLog
+    return {row.id for row in AuditLog.query.filter_by(action='Test')}
+
+
+def test_dry_run_deletes_nothing(app, audit_rows, tmp_path):
+    from audit_archive import archive_audit_logs
+
+    archived = archive_audit_logs(RETENTION_DAYS, str(tmp_path / 'archive'), dry_run=True)
+
+    assert sum(month.rows for month in archived) == 2
+    assert all(month.path is None for month in archived)
+    assert _hot_ids() == set(audit_rows)
+    assert not (tmp_path / 'archive').exists()
+
+
+def test_archive_moves_expired_rows_out_of_the_table(app, audit_rows, tmp_path):
+    from audit_archive import archive_audit_logs, archive_files, read_archive
+
+    directory = str(tmp_path / 'archive')
+    archived = archive_audit_logs(RETENTION_DAYS, directory, batch_size=1)
+
+    assert sum(month.rows for month in archived) == 2
+    assert _hot_ids() == set(audit_rows[:2])
+    paths = [path for paths in archive_files(directory).values() for path in paths]
+    assert {entry.id for path in paths for entry in read_archive(path)} == set(audit_rows[2:])
+
+    # Nothing is left to archive on the next run
+    assert archive_audit_logs(RETENTION_DAYS, directory) == []
+
+
+def test_search_merges_hot_and_archived_rows_newest_first(app, audit_rows, tmp_path):
+    from audit_archive import archive_audit_logs, search_audit_logs
+
+    directory = str(tmp_path / 'archive')
+    archive_audit_logs(RETENTION_DAYS, directory)
+
+    entries, more = search_audit_logs(directory, action='Test')
+    assert [entry.id for entry in entries] == audit_rows
+    assert [entry.archived for entry in entries] == [False, False, True, True]
+    assert more is None
+
+    # Keyset paging crosses from the table into the archive
+    first, before = search_audit_logs(directory, action='Test', per_page=3)
+    second, after = search_audit_logs(directory, action='Test', before=before, per_page=3)
+    assert [entry.id for entry in first + second] == audit_rows
+    assert after is None
+
+
+def test_migration_makes_the_timestamp_required_on_an_old_table(app, make_user):
+    from app import db
+    from migrations import upgrade
+
+    user = make_user()
+    with db.engine.begin() as connection:
+        # audit_logs as created before the timestamp became NOT NULL
+        connection.execute(text("DROP TABLE audit_logs"))
+        connection.execute(text(
+            "CREATE TABLE audit_logs (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id), "
+            "action VARCHAR(100) NOT NULL, entity_type VARCHAR(50) NOT NULL, entity_id INTEGER NOT NULL, "
+            "old_values TEXT, new_values TEXT, timestamp DATETIME, ip_address VARCHAR(45))"
+        ))
+        connection.execute(text(
+            "INSERT INTO audit_logs (id, user_id, action, entity_type, entity_id, timestamp) "
+            "VALUES (1, :user_id, 'Login', 'User', :user_id, NULL), "
+            "(2, :user_id, 'Logout', 'User', :user_id, '2026-01-02 03:04:05.000000')"
+        ), {'user_id': user.id})
+        connection.execute(text("DELETE FROM schema_migrations WHERE name = '0007_audit_log_timestamp_not_null'"))
+
+    assert upgrade() == ['0007_audit_log_timestamp_not_null']
+
+    with db.engine.connect() as connection:
+        inspector = inspect(connection)
+        columns = {column['name']: column for column in inspector.get_columns('audit_logs')}
+        assert not columns['timestamp']['nullable']
+        assert 'ix_audit_logs_timestamp' in {index['name'] for index in inspector.get_indexes('audit_logs')}
+        rows = dict(connection.execute(text("SELECT id, timestamp FROM audit_logs")).all())
+    assert rows[1] is not None
+    assert rows[2].startswith('2026-01-02 03:04:05')
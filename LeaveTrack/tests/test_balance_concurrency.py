@@ -0,0 +1,139 @@
+"""Reduced version of benchmarks/balance_stress.py: two threads racing on one balance."""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+THREADS = 2
+ALLOCATED = 8
+ATTEMPTS = 12
+
+
+def with_retry(fn, retries=50):
+    """Retry on SQLite 'database is locked' errors"""
+    from app import db
+
+    for attempt in range(retries):
+        try:
+            return fn()
+        except OperationalError:
+            db.session.rollback()
+            time.sleep(0.01 * (attempt + 1))
+    raise RuntimeError('gave up after repeated lock errors')
+
+
+def test_racing_submissions_and_decisions_keep_the_balance_consistent(app, make_user):
+    from app import db
+    from leave_service import (InsufficientBalanceError, LeaveServiceError, cancel_application,
+                               decide_application, submit_application)
+    from models import LeaveApplication, LeaveBalance, LeaveType, User
+
+    year = date.today().year + 1
+    user = make_user()
+    admin = make_user(role='admin')
+    leave_type = LeaveType(name='Stress Leave', max_days_per_year=ALLOCATED)
+    db.session.add(leave_type)
+    db.session.flush()
+    db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year, allocated_days=ALLOCATED))
+    db.session.commit()
+    user_id, admin_id, leave_type_id = user.id, admin.id, leave_type.id
+
+    weekdays = [day for day in (date(year, 1, 1) + timedelta(n) for n in range(30)) if day.weekday() < 5][:ATTEMPTS]
+
+    def submit(day):
+        with app.app_context():
+            try:
+                with_retry(lambda: submit_application(db.session.get(User, user_id), leave_type_id, day, day,
+                                                      'Concurrency test'))
+                return 'accepted'
+            except InsufficientBalanceError:
+                return 'insufficient'
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        outcomes = list(pool.map(submit, weekdays))
+
+    db.session.expire_all()
+    balance = LeaveBalance.query.filter_by(user_id=user_id, leave_type_id=leave_type_id, year=year).one()
+    assert outcomes.count('accepted') == ALLOCATED
+    assert (balance.pending_days, balance.used_days) == (ALLOCATED, 0)
+    application_ids = [a.id for a in LeaveApplication.query.filter_by(user_id=user_id, status='pending')]
+
+    actions = [(application_id, status) for application_id in application_ids
+               for status in ('approved', 'rejected', 'cancelled')]
+    random.shuffle(actions)
+
+    def decide(action):
+        application_id, status = action
+        with app.app_context():
+            def run():
+                application = db.session.get(LeaveApplication, application_id)
+                if status == 'cancelled':
+                    cancel_application(application, user_id)
+                else:
+                    decide_application(application, status, admin_id,
+                                       rejection_reason='race' if status == 'rejected' else None)
+            try:
+                with_retry(run)
+                return status
+            except LeaveServiceError:
+                return 'lost-race'
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        decisions = list(pool.map(decide, actions))
+
+    db.session.expire_all()
+    balance = LeaveBalance.query.filter_by(user_id=user_id, leave_type_id=leave_type_id, year=year).one()
+    applications = LeaveApplication.query.filter_by(user_id=user_id).all()
+    assert len(decisions) - decisions.count('lost-race') == len(application_ids)
+    assert not [a for a in applications if a.status == 'pending']
+    assert balance.used_days == sum(a.total_days for a in applications if a.status == 'approved')
+    assert balance.pending_days == 0
+
+
+def test_recompute_skips_applications_decided_after_its_select(app, make_user, leave_type, monkeypatch):
+    import leave_service
+    from app import db
+    from leave_service import recompute_pending_working_days, submit_application
+    from models import Holiday, LeaveApplication, LeaveBalance
+    from working_days import working_days
+
+    year = date.today().year + 1
+    monday = date(year, 3, 2) - timedelta(days=date(year, 3, 2).weekday())
+    user = make_user()
+    db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year, allocated_days=20))
+    db.session.commit()
+    pending = submit_application(user, leave_type.id, monday, monday + timedelta(days=4), 'Pending week')
+    decided = submit_application(user, leave_type.id, monday + timedelta(days=7), monday + timedelta(days=11),
+                                 'Decided week')
+
+    db.session.add_all([Holiday(name='Midweek', holiday_date=monday + timedelta(days=2)),
+                        Holiday(name='Next midweek', holiday_date=monday + timedelta(days=9))])
+    db.session.commit()
+    working_days.invalidate()
+
+    # Reject the second application (releasing its 5 days) after recompute has selected it
+    count_batch = leave_service.calculate_working_days_batch
+
+    def reject_then_count(ranges, *args):
+        db.session.execute(update(LeaveApplication).where(LeaveApplication.id == decided.id)
+                           .values(status='rejected'), execution_options={'synchronize_session': False})
+        db.session.execute(update(LeaveBalance).values(pending_days=LeaveBalance.pending_days - 5))
+        return count_batch(ranges, *args)
+
+    monkeypatch.setattr(leave_service, 'calculate_working_days_batch', reject_then_count)
+    assert recompute_pending_working_days(monday, monday + timedelta(days=11)) == 1
+    db.session.commit()
+
+    db.session.expire_all()
+    balance = LeaveBalance.query.filter_by(user_id=user.id, leave_type_id=leave_type.id, year=year).one()
+    assert db.session.get(LeaveApplication, pending.id).total_days == 4
+    assert db.session.get(LeaveApplication, decided.id).total_days == 5
+    assert balance.pending_days == 4
@@ -0,0 +1,71 @@
+"""Bulk approve/reject: one transaction, pending ids decided, the rest reported as skipped."""
+
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def applications(app, make_user, leave_type):
+    """Two pending applications of one user and one already rejected"""
+    from app import db
+    from leave_service import decide_application, submit_application
+    from models import LeaveBalance
+
+    year = date.today().year + 1
+    monday = date(year, 4, 1) - timedelta(days=date(year, 4, 1).weekday())
+    user = make_user()
+    admin = make_user(role='admin')
+    db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year, allocated_days=20))
+    db.session.commit()
+    first = submit_application(user, leave_type.id, monday, monday + timedelta(days=1), 'Two days off')
+    second = submit_application(user, leave_type.id, monday + timedelta(days=7), monday + timedelta(days=9),
+                                'Three days off')
+    rejected = submit_application(user, leave_type.id, monday + timedelta(days=14), monday + timedelta(days=14),
+                                  'One day off')
+    decide_application(rejected, 'rejected', admin.id, rejection_reason='Short staffed')
+    return user, admin, first, second, rejected
+
+
+def test_bulk_approve_decides_pending_and_skips_the_rest(app, applications, count_queries):
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from app import db
+    from models import LeaveApplication, LeaveBalance
+    from leave_service import bulk_decide_applications
+
+    user, admin, first, second, rejected = applications
+    commits = []
+
+    def record_commit(session_):
+        commits.append(session_)
+
+    event.listen(Session, 'after_commit', record_commit)
+    try:
+        with count_queries() as statements:
+            results = bulk_decide_applications([first.id, rejected.id, second.id, 999999, first.id], 'approved',
+                                               admin.id)
+    finally:
+        event.remove(Session, 'after_commit', record_commit)
+
+    assert [(result['id'], result['result']) for result in results] == [
+        (first.id, 'approved'), (rejected.id, 'skipped'), (second.id, 'approved'), (999999, 'not_found')]
+    assert 'already rejected' in results[1]['message']
+    assert len(commits) == 1
+    assert len([s for s in statements if s.startswith('UPDATE leave_balances')]) == 1
+
+    balance = LeaveBalance.query.filter_by(user_id=user.id).one()
+    assert (balance.pending_days, balance.used_days) == (0, 5)
+    assert db.session.get(LeaveApplication, rejected.id).status == 'rejected'
+
+
+def test_api_rejects_boolean_ids(app, applications, login):
+    user, admin, first, second, rejected = applications
+    client = login(admin)
+
+    response = client.post('/leave/api/approve/bulk', json={'application_ids': [True], 'status': 'approved'})
+    assert response.status_code == 400
+
+    response = client.post('/leave/api/approve/bulk', json={'application_ids': [first.id], 'status': 'approved'})
+    assert response.status_code == 200
+    assert response.get_json()['processed'] == 1
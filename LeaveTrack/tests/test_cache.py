@@ -0,0 +1,47 @@
+"""SnapshotCache must not store a load that a concurrent write made stale."""
+
+import threading
+
+from cache import SnapshotCache
+
+
+def _interleaved(write):
+    """Run ``write(cache)`` while the first load is in flight; return the cache"""
+    loading, written = threading.Event(), threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(None)
+        if len(calls) == 1:
+            loading.set()
+            written.wait(5)
+            return {'pending': 1}
+        return {'pending': 2}
+
+    cache = SnapshotCache(loader, ttl=60)
+    reader = threading.Thread(target=cache.get)
+    reader.start()
+    loading.wait(5)
+    write(cache)
+    written.set()
+    reader.join(5)
+    return cache, calls
+
+
+def test_invalidate_during_load_discards_the_loaded_snapshot():
+    cache, calls = _interleaved(lambda cache: cache.invalidate())
+    assert cache.get() == {'pending': 2}
+    assert len(calls) == 2
+
+
+def test_adjust_during_load_discards_the_loaded_snapshot():
+    cache, calls = _interleaved(lambda cache: cache.adjust(pending=1))
+    assert cache.get() == {'pending': 2}
+    assert len(calls) == 2
+
+
+def test_load_without_writes_is_cached():
+    cache = SnapshotCache(lambda: {'pending': 1}, ttl=60)
+    assert cache.get() == {'pending': 1}
+    assert cache.get() == {'pending': 1}
+    assert cache.stats() == {'hits': 1, 'misses': 1}
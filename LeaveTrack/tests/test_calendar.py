@@ -0,0 +1,32 @@
+from datetime import date
+
+
+def _approved_leave(user, leave_type, day):
+    from models import LeaveApplication
+    return LeaveApplication(user_id=user.id, leave_type_id=leave_type.id, start_date=day, end_date=day,
+                            total_days=1, reason='Query budget test', status='approved')
+
+
+def test_calendar_query_count_does_not_grow_with_leaves(app, make_user, leave_type, login, count_queries):
+    from app import db
+
+    admin = make_user(role='admin')
+    client = login(admin)
+    url = '/leave/calendar?year=2026&month=3'
+    db.session.add(_approved_leave(make_user(), leave_type, date(2026, 3, 2)))
+    db.session.commit()
+
+    # Warm per-process caches (user loader, working-day tables) before counting
+    assert client.get(url).status_code == 200
+    with count_queries() as one_leave:
+        assert client.get(url).status_code == 200
+
+    db.session.add_all(_approved_leave(make_user(), leave_type, date(2026, 3, day)) for day in range(3, 13))
+    db.session.commit()
+    assert client.get(url).status_code == 200
+    with count_queries() as many_leaves:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert response.data.count(b'User') > 10  # the new leaves are actually rendered
+
+    assert len(many_leaves) == len(one_leave), "\n".join(s[:300] for s in many_leaves)
@@ -0,0 +1,31 @@
+"""Change counters are bumped after the business transaction, never inside it."""
+
+
+def test_bump_applies_after_commit_in_its_own_transaction(app, count_queries):
+    from app import db
+    from change_counters import APPLICATIONS, USERS, bump_version, get_versions
+
+    with count_queries() as statements:
+        bump_version(APPLICATIONS, USERS)
+        assert not [s for s in statements if 'change_counters' in s]
+        assert get_versions(APPLICATIONS)[APPLICATIONS][0] == 0
+        db.session.commit()
+
+    assert {name: version for name, (version, _) in get_versions(APPLICATIONS, USERS).items()} == \
+        {APPLICATIONS: 1, USERS: 1}
+
+    bump_version(APPLICATIONS)
+    db.session.commit()
+    assert get_versions(APPLICATIONS)[APPLICATIONS][0] == 2
+
+
+def test_rolled_back_bump_is_discarded(app, leave_type):
+    from app import db
+    from change_counters import APPLICATIONS, bump_version, get_versions
+
+    leave_type.description = 'Rolled back'
+    db.session.flush()
+    bump_version(APPLICATIONS)
+    db.session.rollback()
+    db.session.commit()
+    assert get_versions(APPLICATIONS)[APPLICATIONS][0] == 0
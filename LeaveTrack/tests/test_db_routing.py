@@ -0,0 +1,110 @@
+"""Read-replica routing against two local SQLite files."""
+
+from datetime import date
+
+import pytest
+from flask import jsonify
+from sqlalchemy import event, func, select
+
+
+@pytest.fixture
+def app_overrides(tmp_path):
+    return {
+        'SQLALCHEMY_BINDS': {'replica_0': f"sqlite:///{tmp_path / 'replica.db'}"},
+        'REPLICA_STICKY_SECONDS': 5,
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import db_routing
+
+    now = [1_000_000.0]
+    monkeypatch.setattr(db_routing.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def routed(app, make_user, leave_type, clock):
+    """Register probe views, seed the primary, copy it to the replica and record each statement's engine"""
+    from app import db
+    from db_routing import read_only, sync_sqlite_replicas
+    from models import LeaveType
+
+    @app.route('/_probe/read-only', methods=['POST'])
+    @read_only
+    def probe_read_only():
+        return jsonify(db.session.scalar(select(func.count(LeaveType.id))))
+
+    @app.route('/_probe/post', methods=['POST'])
+    def probe_post():
+        return jsonify(db.session.scalar(select(func.count(LeaveType.id))))
+
+    user = make_user()
+    sync_sqlite_replicas()
+
+    statements = []
+    listeners = []
+    for key, engine in db.engines.items():
+        def record(connection, cursor, statement, parameters, context, executemany, key=key or 'primary'):
+            statements.append((key, statement))
+        event.listen(engine, 'before_cursor_execute', record)
+        listeners.append((engine, record))
+    yield user, statements
+    for engine, record in listeners:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def _engines(statements, request):
+    statements.clear()
+    response = request()
+    return response, {key for key, _ in statements}
+
+
+def test_routing(app, login, routed, leave_type, clock):
+    user, statements = routed
+    client = login(user)
+    # Logging in wrote an audit row, so the session starts pinned to the primary
+    assert _engines(statements, lambda: client.get('/leave/history'))[1] == {'primary'}
+
+    clock[0] += 6
+    response, engines = _engines(statements, lambda: client.get('/leave/history'))
+    assert response.status_code == 200
+    assert engines == {'replica_0'}
+
+    # A POST stays on the primary unless the view is @read_only
+    assert _engines(statements, lambda: client.post('/_probe/post'))[1] == {'primary'}
+    assert _engines(statements, lambda: client.post('/_probe/read-only'))[1] == {'replica_0'}
+
+    # A write pins the following reads to the primary for REPLICA_STICKY_SECONDS
+    year = date.today().year + 1
+    response, engines = _engines(statements, lambda: client.post('/leave/apply', data={
+        'leave_type_id': leave_type.id, 'start_date': f'{year}-03-03', 'end_date': f'{year}-03-03',
+        'reason': 'Attending a family function'}))
+    assert response.status_code == 302
+    assert engines == {'primary'}
+    assert any(statement.startswith('INSERT INTO leave_applications') for _, statement in statements)
+
+    clock[0] += 4
+    response, engines = _engines(statements, lambda: client.get('/leave/history'))
+    assert engines == {'primary'}
+    assert b'Attending a family function' in response.data
+
+    clock[0] += 2
+    response, engines = _engines(statements, lambda: client.get('/leave/history'))
+    assert engines == {'replica_0'}
+    assert b'Attending a family function' not in response.data  # the replica was never synced
+
+
+def test_use_primary_view_reads_from_the_primary(app, login, routed, leave_type, clock):
+    from leave_service import submit_application
+
+    user, statements = routed
+    year = date.today().year + 1
+    application = submit_application(user, leave_type.id, date(year, 5, 5), date(year, 5, 5), 'Doctor appointment')
+    client = login(user)
+    clock[0] += 6
+
+    response, engines = _engines(statements, lambda: client.get(f'/leave/cancel/{application.id}'))
+    assert response.status_code == 302
+    assert engines == {'primary'}
@@ -0,0 +1,85 @@
+"""Event broker: subscription start ids, feeding from the outbox and Last-Event-ID replay."""
+
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def broker(app, monkeypatch):
+    from events import EventBroker
+
+    broker = EventBroker(app, poll_interval=3600)
+    # Drive feed_once by hand instead of from the feeder thread
+    monkeypatch.setattr(broker, '_ensure_feeder', lambda: None)
+    return broker
+
+
+@pytest.fixture
+def decide(app, make_user, leave_type):
+    """decide(user, status) submits a one-day application for ``user`` and decides it"""
+    from app import db
+    from leave_service import cancel_application, decide_application, submit_application
+    from models import LeaveBalance
+
+    admin = make_user(role='admin')
+    year = date.today().year + 1
+    days = iter(day for day in (date(year, 1, 1) + timedelta(n) for n in range(365)) if day.weekday() < 5)
+    balances = set()
+
+    def decide(user, status):
+        if user.id not in balances:
+            db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year,
+                                        allocated_days=50))
+            db.session.commit()
+            balances.add(user.id)
+        day = next(days)
+        application = submit_application(user, leave_type.id, day, day, 'Personal errand')
+        if status == 'cancelled':
+            return cancel_application(application, user.id)
+        return decide_application(application, status, admin.id,
+                                  rejection_reason='Exams week' if status == 'rejected' else None)
+
+    return decide
+
+
+def test_subscription_starts_at_the_newest_event(app, broker, make_user, decide):
+    user = make_user()
+    decide(user, 'approved')
+
+    subscription = broker.subscribe(user.id)
+    assert subscription.start_id > 0
+    assert broker.feed_once() == 0
+    assert subscription.get(timeout=0) is None
+
+
+def test_feed_once_delivers_new_events_to_their_user_only(app, broker, make_user, decide):
+    alice, bob = make_user(), make_user()
+    alice_events, bob_events = broker.subscribe(alice.id), broker.subscribe(bob.id)
+
+    rejected = decide(alice, 'rejected')
+    cancelled = decide(alice, 'cancelled')
+    assert broker.feed_once() == 2
+
+    first, second = alice_events.get(timeout=0), alice_events.get(timeout=0)
+    assert (first['type'], first['data']['application_id']) == ('leave.rejected', rejected.id)
+    assert (second['type'], second['data']['application_id']) == ('leave.cancelled', cancelled.id)
+    assert first['id'] < second['id']
+    assert bob_events.get(timeout=0) is None
+    assert broker.feed_once() == 0
+
+
+def test_last_event_id_replays_only_what_was_missed(app, broker, make_user, decide):
+    user, other = make_user(), make_user()
+    decide(user, 'approved')
+    seen = broker.replay(user.id, 0)[-1]['id']
+    missed = [decide(user, 'rejected'), decide(user, 'approved')]
+    decide(other, 'approved')
+
+    replayed = broker.replay(user.id, seen)
+    assert [event['data']['application_id'] for event in replayed] == [application.id for application in missed]
+    assert [event['type'] for event in replayed] == ['leave.rejected', 'leave.approved']
+
+
+def test_stream_view_reads_from_the_primary(app):
+    assert getattr(app.view_functions['dashboard.events'], '_db_use_primary', False)
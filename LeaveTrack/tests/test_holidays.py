@@ -0,0 +1,72 @@
+"""Holiday edits recount pending applications without caching uncommitted calendars."""
+
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def week(app, make_user, leave_type):
+    """Three pending Monday-Friday applications in one week of next year"""
+    from app import db
+    from leave_service import submit_application
+    from models import LeaveBalance
+
+    year = date.today().year + 1
+    monday = date(year, 6, 1) - timedelta(days=date(year, 6, 1).weekday())
+    users = [make_user() for _ in range(3)]
+    for user in users:
+        db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year, allocated_days=20))
+    db.session.commit()
+    applications = [submit_application(user, leave_type.id, monday, monday + timedelta(days=4), 'Family trip')
+                    for user in users]
+    return monday, applications
+
+
+def _pending_days(user_id):
+    from models import LeaveBalance
+    return LeaveBalance.query.filter_by(user_id=user_id).one().pending_days
+
+
+def test_adding_a_holiday_recounts_pending_applications_in_one_update(app, make_user, login, count_queries, week):
+    from app import db
+    from models import LeaveApplication
+    from working_days import working_days
+
+    monday, applications = week
+    client = login(make_user(role='admin'))
+    wednesday = monday + timedelta(days=2)
+    assert working_days.count(monday, monday + timedelta(days=4)) == 5
+
+    with count_queries() as statements:
+        response = client.post('/admin/holidays', data={'name': 'Founders Day', 'holiday_date': wednesday.isoformat()})
+    assert response.status_code == 302
+    assert len([s for s in statements if s.startswith('UPDATE leave_applications')]) == 1
+
+    db.session.expire_all()
+    for application in applications:
+        assert db.session.get(LeaveApplication, application.id).total_days == 4
+        assert _pending_days(application.user_id) == 4
+    assert working_days.count(monday, monday + timedelta(days=4)) == 4
+
+
+def test_rolled_back_holiday_never_reaches_the_shared_calendar(app, week):
+    from app import db
+    from change_counters import HOLIDAYS, bump_version
+    from leave_service import recompute_pending_working_days
+    from models import Holiday
+    from working_days import working_days
+
+    monday, applications = week
+    friday = monday + timedelta(days=4)
+    assert working_days.count(monday, friday) == 5
+
+    db.session.add(Holiday(name='Cancelled Day', holiday_date=monday))
+    db.session.flush()
+    bump_version(HOLIDAYS)
+    assert recompute_pending_working_days(monday, monday) == 3
+    assert working_days.count(monday, friday) == 5
+    db.session.rollback()
+
+    assert working_days.count(monday, friday) == 5
+    assert _pending_days(applications[0].user_id) == 5
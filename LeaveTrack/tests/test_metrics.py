@@ -0,0 +1,47 @@
+"""Access control on /metrics and idempotent metrics wiring."""
+
+import pytest
+
+
+@pytest.fixture
+def metrics_app(app):
+    from metrics import init_metrics
+
+    app.config['METRICS_ENABLED'] = True
+    init_metrics(app)
+    return app
+
+
+def test_loopback_scrape_is_allowed_only_when_not_proxied(metrics_app):
+    client = metrics_app.test_client()
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 403
+    # Through nginx every client shows up as 127.0.0.1
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.9'}).status_code == 403
+    assert client.get('/metrics', headers={'X-Real-IP': '203.0.113.9'}).status_code == 403
+
+
+def test_token_is_required_when_configured(metrics_app):
+    metrics_app.config['METRICS_TOKEN'] = 's3cret'
+    client = metrics_app.test_client()
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret', 'X-Forwarded-For': '203.0.113.9'},
+                      environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 200
+
+
+def test_init_metrics_wires_each_engine_and_collector_once(metrics_app):
+    from app import db
+    from metrics import init_metrics, pool_checkouts, registry
+
+    collectors = len(registry._collectors)
+    raw_connection = db.engine.raw_connection
+    init_metrics(metrics_app)
+    assert len(registry._collectors) == collectors
+    assert db.engine.raw_connection is raw_connection
+
+    key = pool_checkouts._key({})
+    before = pool_checkouts._values.get(key, 0)
+    with db.engine.connect():
+        pass
+    assert pool_checkouts._values[key] == before + 1
@@ -0,0 +1,135 @@
+"""Outbox delivery: claiming, retries with backoff, and atomicity with the status change."""
+
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from notifications import MemoryTransport, OutboxDispatcher, Transport
+
+
+class FailingTransport(Transport):
+    def send(self, message):
+        raise ConnectionError('mail server unavailable')
+
+
+def _queue(count):
+    from app import db
+    from models import NotificationOutbox
+
+    db.session.add_all([NotificationOutbox(recipient=f'staff{n}@college.edu', subject=f'Message {n}', body=f'body {n}')
+                        for n in range(count)])
+    db.session.commit()
+
+
+def _outbox():
+    from app import db
+    from models import NotificationOutbox
+
+    db.session.expire_all()
+    return NotificationOutbox.query.order_by(NotificationOutbox.id).all()
+
+
+def test_due_message_is_claimed_and_delivered_once(app):
+    _queue(1)
+    transport = MemoryTransport()
+    dispatcher = OutboxDispatcher(app, transport)
+
+    assert dispatcher.drain() == (1, 0)
+    assert dispatcher.drain() == (0, 0)
+    assert transport.outbox == [{'to': 'staff0@college.edu', 'subject': 'Message 0', 'body': 'body 0'}]
+    message, = _outbox()
+    assert (message.status, message.attempts, message.claimed_by) == ('sent', 1, None)
+    assert message.sent_at is not None
+
+
+def test_failing_send_backs_off_then_gives_up(app):
+    from app import db
+
+    _queue(1)
+    dispatcher = OutboxDispatcher(app, FailingTransport(), max_attempts=3, backoff_base=30)
+
+    started = datetime.utcnow()
+    assert dispatcher.drain() == (0, 1)
+    message, = _outbox()
+    assert (message.status, message.attempts) == ('pending', 1)
+    assert 'mail server unavailable' in message.last_error
+    assert message.next_attempt_at >= started + timedelta(seconds=30)
+
+    # Not due yet: nothing is claimed
+    assert dispatcher.drain() == (0, 0)
+
+    message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    retried = datetime.utcnow()
+    assert dispatcher.drain() == (0, 1)
+    message, = _outbox()
+    assert (message.status, message.attempts) == ('pending', 2)
+    assert message.next_attempt_at >= retried + timedelta(seconds=60)
+
+    message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert dispatcher.drain() == (0, 1)
+    message, = _outbox()
+    assert (message.status, message.attempts) == ('failed', 3)
+
+
+def test_two_dispatchers_never_deliver_the_same_row(app):
+    _queue(40)
+    transports = [MemoryTransport(), MemoryTransport()]
+    dispatchers = [OutboxDispatcher(app, transport, batch_size=5) for transport in transports]
+    barrier = threading.Barrier(len(dispatchers))
+
+    def run(dispatcher):
+        barrier.wait(5)
+        for _ in range(20):
+            dispatcher.drain()
+
+    threads = [threading.Thread(target=run, args=(dispatcher,)) for dispatcher in dispatchers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    delivered = [sent['body'] for transport in transports for sent in transport.outbox]
+    assert sorted(delivered) == sorted(f'body {n}' for n in range(40))
+    assert {message.status for message in _outbox()} == {'sent'}
+
+
+def test_claimed_rows_are_invisible_to_another_dispatcher(app):
+    from app import db
+
+    _queue(3)
+    first, second = MemoryTransport(), MemoryTransport()
+    claimed = OutboxDispatcher(app, first)._claim_batch(datetime.utcnow())
+    assert len(claimed) == 3
+
+    assert OutboxDispatcher(app, second).drain() == (0, 0)
+    assert second.outbox == []
+    db.session.rollback()
+
+
+def test_rolled_back_decision_leaves_no_outbox_row(app, make_user, leave_type, monkeypatch):
+    import leave_service
+    from app import db
+    from leave_service import decide_application, submit_application
+    from models import LeaveApplication, LeaveBalance
+
+    year = date.today().year + 1
+    user = make_user()
+    admin = make_user(role='admin')
+    db.session.add(LeaveBalance(user_id=user.id, leave_type_id=leave_type.id, year=year, allocated_days=10))
+    db.session.commit()
+    application = submit_application(user, leave_type.id, date(year, 2, 2), date(year, 2, 3), 'Medical visit')
+
+    def fail(*scopes):
+        raise RuntimeError('simulated failure before commit')
+
+    monkeypatch.setattr(leave_service, 'bump_version', fail)
+    with pytest.raises(RuntimeError):
+        decide_application(application, 'approved', admin.id)
+    db.session.rollback()
+
+    assert _outbox() == []
+    assert db.session.get(LeaveApplication, application.id).status == 'pending'
+    assert LeaveBalance.query.filter_by(user_id=user.id).one().pending_days == 2
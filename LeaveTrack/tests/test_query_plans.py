@@ -0,0 +1,24 @@
+import re
+
+# SQLite reports a full table scan as "SCAN <table>" with no index; PostgreSQL as "Seq Scan"
+_SEQUENTIAL_SCAN = re.compile(r'^\W*(SCAN \w+$|Seq Scan)', re.M)
+
+
+def test_hot_queries_use_their_indexes(app):
+    from migrations import missing_indexes
+    from query_plans import check_hot_queries
+
+    assert missing_indexes() == []
+    results = check_hot_queries()
+    assert results
+    for name, index_name, used, plan in results:
+        assert used, f'{name} does not use {index_name}:\n{plan}'
+        assert not _SEQUENTIAL_SCAN.search(plan), f'{name} scans a whole table:\n{plan}'
+
+
+def test_sequential_scan_pattern():
+    assert _SEQUENTIAL_SCAN.search('SCAN leave_applications')
+    assert _SEQUENTIAL_SCAN.search('  ->  Seq Scan on leave_applications')
+    assert not _SEQUENTIAL_SCAN.search('SEARCH leave_applications USING INDEX ix_leave_applications_status_applied_at')
+    assert not _SEQUENTIAL_SCAN.search('SCAN leave_applications USING INDEX ix_leave_applications_user_applied_at')
+
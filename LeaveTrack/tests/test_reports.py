@@ -0,0 +1,26 @@
+"""Leave report export; XLSX is an optional extra."""
+
+
+def test_xlsx_export_without_xlsxwriter_explains_the_extra(app, make_user, login, monkeypatch):
+    import reports
+
+    monkeypatch.setattr(reports, 'xlsxwriter', None)
+    client = login(make_user(role='admin'))
+
+    response = client.get('/admin/reports/export?format=xlsx')
+    assert response.status_code == 302
+    response = client.get(response.headers['Location'])
+    assert b'xlsxwriter' in response.data
+    assert b'.[xlsx]' in response.data
+
+
+def test_csv_export_needs_no_extra(app, make_user, login, monkeypatch):
+    import reports
+
+    monkeypatch.setattr(reports, 'xlsxwriter', None)
+    client = login(make_user(role='admin'))
+
+    response = client.get('/admin/reports/export?format=csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.data.startswith(b'Application ID,')
@@ -0,0 +1,86 @@
+"""Year-end rollover: capped carry-forward, idempotent re-runs and dry runs."""
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+YEAR = 2030
+
+
+@pytest.fixture
+def closing_year(app, make_user):
+    """Users with varied unused days on a capped and an uncapped leave type in YEAR"""
+    from app import db
+    from models import LeaveBalance, LeaveType
+
+    casual = LeaveType(name='Casual Leave', max_days_per_year=12, max_carry_forward_days=5)
+    duty = LeaveType(name='On Duty', max_days_per_year=20, max_carry_forward_days=0)
+    db.session.add_all([casual, duty])
+    db.session.commit()
+
+    users = {name: make_user() for name in ('saver', 'spender', 'overdrawn', 'newcomer')}
+    make_user(is_active=False)
+    unused = {'saver': (12, 2, 0), 'spender': (12, 7, 2), 'overdrawn': (12, 10, 4)}
+    for name, (allocated, used, pending) in unused.items():
+        db.session.add(LeaveBalance(user_id=users[name].id, leave_type_id=casual.id, year=YEAR,
+                                    allocated_days=allocated, used_days=used, pending_days=pending))
+        db.session.add(LeaveBalance(user_id=users[name].id, leave_type_id=duty.id, year=YEAR,
+                                    allocated_days=20, used_days=0))
+    db.session.commit()
+    return users, casual, duty
+
+
+def _next_year():
+    from models import LeaveBalance
+    return {(balance.user_id, balance.leave_type_id): (balance.allocated_days, balance.carried_forward_days)
+            for balance in LeaveBalance.query.filter_by(year=YEAR + 1)}
+
+
+def test_rollover_caps_carried_days_and_commits_per_leave_type(app, closing_year):
+    from balances import rollover_year
+
+    users, casual, duty = closing_year
+    commits = []
+
+    def record_commit(session_):
+        commits.append(session_)
+
+    event.listen(Session, 'after_commit', record_commit)
+    try:
+        assert rollover_year(YEAR) == {'Casual Leave': 4, 'On Duty': 4}
+    finally:
+        event.remove(Session, 'after_commit', record_commit)
+    assert len(commits) == 2
+
+    balances = _next_year()
+    assert balances[(users['saver'].id, casual.id)] == (17, 5)      # 10 unused, capped at 5
+    assert balances[(users['spender'].id, casual.id)] == (15, 3)    # 3 unused
+    assert balances[(users['overdrawn'].id, casual.id)] == (12, 0)  # nothing available
+    assert balances[(users['newcomer'].id, casual.id)] == (12, 0)   # no balance last year
+    assert {balances[(user.id, duty.id)] for user in users.values()} == {(20, 0)}
+
+
+def test_second_rollover_is_a_no_op(app, closing_year):
+    from balances import rollover_year
+
+    rollover_year(YEAR)
+    before = _next_year()
+    assert rollover_year(YEAR) == {'Casual Leave': 0, 'On Duty': 0}
+    assert _next_year() == before
+
+
+def test_rollover_fills_gaps_for_staff_who_joined_since(app, closing_year, make_user):
+    from balances import rollover_year
+
+    rollover_year(YEAR)
+    joined = make_user()
+    assert rollover_year(YEAR) == {'Casual Leave': 1, 'On Duty': 1}
+    assert {key for key in _next_year() if key[0] == joined.id} == {
+        (joined.id, closing_year[1].id), (joined.id, closing_year[2].id)}
+
+
+def test_dry_run_counts_without_writing(app, closing_year):
+    from balances import rollover_year
+
+    assert rollover_year(YEAR, dry_run=True) == {'Casual Leave': 4, 'On Duty': 4}
+    assert _next_year() == {}
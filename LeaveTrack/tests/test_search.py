@@ -0,0 +1,34 @@
+"""Staff search must keep the substring semantics of the old LIKE filters."""
+
+import pytest
+
+
+@pytest.fixture
+def staff(make_user):
+    return {
+        'priya': make_user(employee_id='EMP001', email='priya.sharma@college.edu', first_name='Priya',
+                           last_name='Sharma'),
+        'arun': make_user(employee_id='EMP002', email='arun.kumar@college.edu', first_name='Arun',
+                          last_name='Kumar'),
+    }
+
+
+@pytest.mark.parametrize('term, expected', [
+    ('pri sha', {'priya'}),
+    ('001', {'priya'}),
+    ('sharma@', {'priya'}),
+    ('riya', {'priya'}),
+    ('college.edu', {'priya', 'arun'}),
+    ('ya ar', {'priya'}),
+    ('ku', {'arun'}),
+    ('EMP00', {'priya', 'arun'}),
+    ('nobody', set()),
+])
+def test_search_matches_substrings(app, staff, term, expected):
+    from models import User
+    from search import autocomplete_users, filter_users, search_backend
+
+    assert search_backend().name == 'sqlite-fts5'
+    ids = {user.id for user in filter_users(User.query, term)}
+    assert ids == {staff[name].id for name in expected}
+    assert {row['id'] for row in autocomplete_users(term)} == ids
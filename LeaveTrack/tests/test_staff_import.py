@@ -0,0 +1,55 @@
+"""Admin staff upload: small files import in the request, large ones are sent to the CLI."""
+
+import io
+
+HEADER = 'employee_id,email,first_name,last_name,department,designation,staff_type,password\n'
+
+
+def _csv(count):
+    rows = ''.join(f'IMP{n:04},imp{n}@college.edu,Import,Staff{n},QA,Tester,teaching,secret{n:04}\n'
+                   for n in range(count))
+    return (HEADER + rows).encode()
+
+
+def _upload(client, content, dry_run=False):
+    data = {'staff_file': (io.BytesIO(content), 'staff.csv')}
+    if dry_run:
+        data['dry_run'] = 'y'
+    return client.post('/admin/users/import', data=data, content_type='multipart/form-data')
+
+
+def test_small_upload_imports_in_the_request(app, make_user, login):
+    from models import User
+
+    client = login(make_user(role='admin'))
+    response = _upload(client, _csv(3))
+    assert response.status_code == 200
+    assert User.query.filter(User.employee_id.like('IMP%')).count() == 3
+
+
+def test_upload_stops_reading_after_the_row_limit(app, make_user, login, monkeypatch):
+    import staff_import
+    from models import User
+
+    app.config['STAFF_IMPORT_MAX_UPLOAD_ROWS'] = 5
+    client = login(make_user(role='admin'))
+    validated = []
+    validate_row = staff_import.validate_row
+    monkeypatch.setattr(staff_import, 'validate_row', lambda row: validated.append(row) or validate_row(row))
+
+    for dry_run in (False, True):
+        response = _upload(client, _csv(6), dry_run=dry_run)
+        assert b'more than 5 rows' in response.data
+        assert b'flask import-staff' in response.data
+    assert validated == []
+    assert User.query.filter(User.employee_id.like('IMP%')).count() == 0
+
+
+def test_oversized_upload_is_refused_before_parsing(app, make_user, login):
+    app.config['MAX_CONTENT_LENGTH'] = 4096
+    client = login(make_user(role='admin'))
+
+    response = _upload(client, _csv(200))
+    assert response.status_code == 302
+    response = client.get(response.headers['Location'])
+    assert b'larger than 4 KB' in response.data
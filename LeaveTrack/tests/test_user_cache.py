@@ -0,0 +1,87 @@
+"""User loader cache: hits, ORM invalidation, and the cross-process staleness window."""
+
+import pytest
+from sqlalchemy import update
+
+
+@pytest.fixture
+def staff(app, make_user):
+    from user_cache import user_cache
+
+    user = make_user()
+    user_cache.invalidate()
+    return user.id
+
+
+def _load(app, user_id, claim=None):
+    from app import db
+    from user_cache import SESSION_VERSION_KEY, load_cached_user
+
+    with app.test_request_context():
+        if claim is not None:
+            from flask import session
+            session[SESSION_VERSION_KEY] = claim
+        user = load_cached_user(user_id)
+        values = (user.role, user.is_active)
+        db.session.remove()
+    return values
+
+
+def test_second_load_is_served_from_the_cache(app, staff, count_queries):
+    from user_cache import user_cache
+
+    with count_queries() as statements:
+        assert _load(app, staff) == ('staff', True)
+        assert _load(app, staff) == ('staff', True)
+    assert len([s for s in statements if 'FROM users' in s]) == 1
+    assert user_cache.stats()['hits'] == 1
+
+
+def test_orm_update_in_this_process_invalidates(app, staff):
+    from app import db
+    from models import User
+
+    assert _load(app, staff) == ('staff', True)
+    user = db.session.get(User, staff)
+    user.role = 'admin'
+    user.is_active = False
+    db.session.commit()
+    assert _load(app, staff) == ('admin', False)
+
+
+def test_change_from_another_process_is_seen_once_the_ttl_expires(app, staff, monkeypatch):
+    import cache
+    from app import db
+    from models import User
+    from user_cache import user_cache
+
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    assert _load(app, staff) == ('staff', True)
+
+    # No ORM events fire for a write made by another worker
+    with db.engine.begin() as connection:
+        connection.execute(update(User.__table__).where(User.__table__.c.id == staff).values(is_active=False))
+
+    now[0] += user_cache.ttl - 0.5
+    assert _load(app, staff) == ('staff', True)
+    now[0] += 1
+    assert _load(app, staff) == ('staff', False)
+
+
+def test_newer_session_claim_bypasses_a_stale_snapshot(app, staff):
+    from app import db
+    from models import User
+    from user_cache import user_version
+
+    assert _load(app, staff) == ('staff', True)
+    with db.engine.begin() as connection:
+        connection.execute(update(User.__table__).where(User.__table__.c.id == staff).values(role='admin'))
+    db.session.expire_all()
+    claim = user_version(db.session.get(User, staff))
+
+    assert _load(app, staff, claim=claim) == ('admin', True)
+
+
+def test_default_ttl_keeps_the_window_short(app):
+    assert app.config['USER_CACHE_TTL'] <= 5
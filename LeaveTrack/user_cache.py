@@ -0,0 +1,114 @@
+"""Identity cache behind the Flask-Login user loader.
+
+Without it every authenticated request (including the dashboard auto-refresh
+polls) runs a primary-key SELECT on ``users``. The loader keeps a detached
+snapshot of each user's columns in a bounded TTL cache and merges it into the
+request session with ``load=False``, which attaches it without any SQL.
+
+Entries are dropped whenever a User row is updated or deleted through the
+ORM (and again after the commit, so a concurrent request cannot re-cache the
+old row in between). On top of that the session carries a version claim: a
+request that changed the logged-in user's own row stores the new version, and
+any worker holding an older snapshot reloads instead of serving it.
+
+Neither reaches other worker processes when someone else changes the user:
+an admin deactivating or demoting an account is only seen by the other
+workers once their snapshot expires. ``USER_CACHE_TTL`` is that window, so
+it defaults to a few seconds; a burst of requests (page load, polls) still
+shares one SELECT, and 0 disables the cache.
+"""
+
+import hashlib
+
+from flask import has_request_context, session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from app import db
+from cache import TTLCache
+from models import User
+
+SESSION_VERSION_KEY = '_user_version'
+
+user_cache = TTLCache(maxsize=1024, ttl=5)
+
+
+def _columns():
+    return [attr.key for attr in inspect(User).column_attrs]
+
+
+def user_version(user):
+    """Short fingerprint of the user's column values"""
+    values = repr(tuple(getattr(user, key) for key in _columns()))
+    return hashlib.blake2b(values.encode(), digest_size=8).hexdigest()
+
+
+def _snapshot(user):
+    snapshot = User(**{key: getattr(user, key) for key in _columns()})
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def remember_user_version(user):
+    """Store the user's current version in the session (call after login)"""
+    session[SESSION_VERSION_KEY] = user_version(user)
+
+
+def load_cached_user(user_id):
+    """Return the User for ``user_id`` attached to the current session"""
+    entry = user_cache.get(user_id)
+    claim = session.get(SESSION_VERSION_KEY) if has_request_context() else None
+
+    if entry is not None:
+        snapshot, version = entry
+        if claim is None or claim == version:
+            return db.session.merge(snapshot, load=False)
+        user_cache.invalidate(user_id)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        version = user_version(user)
+        user_cache.set(user_id, (_snapshot(user), version))
+        if claim is not None and claim != version:
+            # The database is authoritative; stop comparing against an old claim
+            session[SESSION_VERSION_KEY] = version
+    return user
+
+
+def invalidate_user(user_id=None):
+    user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    user_cache.invalidate(target.id)
+    session_ = object_session(target)
+    if session_ is not None:
+        session_.info.setdefault('changed_users', {})[target.id] = user_version(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session_):
+    changed = session_.info.pop('changed_users', None)
+    if not changed:
+        return
+    for user_id in changed:
+        user_cache.invalidate(user_id)
+
+    if has_request_context():
+        user_id = session.get('_user_id')
+        if user_id is not None and int(user_id) in changed:
+            session[SESSION_VERSION_KEY] = changed[int(user_id)]
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session_):
+    session_.info.pop('changed_users', None)
+
+
+def init_user_cache(app):
+    """Size the cache from app config"""
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', 1024)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', 5)
+    app.extensions['user_cache'] = user_cache
@@ -1,37 +1,55 @@
-from datetime import date, timedelta, datetime
-from sqlalchemy import and_, or_, extract
+from datetime import date, datetime
+import calendar
+from sqlalchemy import and_, select, func, case, true
+from sqlalchemy.orm import joinedload
 from app import db
-from models import LeaveApplication, LeaveBalance, LeaveType, User, AuditLog
+from models import LeaveApplication, LeaveBalance, LeaveType, User, AuditLog, NotificationOutbox
+from working_days import working_days
+from cache import SnapshotCache
+from reports import iter_leave_report
 
 def calculate_working_days(start_date, end_date):
-    """Calculate working days between two dates (excluding weekends)"""
-    working_days = 0
-    current_date = start_date
-    
-    while current_date <= end_date:
-        # Monday = 0, Sunday = 6
-        if current_date.weekday() < 5:  # Monday to Friday
-            working_days += 1
-        current_date += timedelta(days=1)
-    
-    return working_days
+    """Calculate working days between two dates (excluding weekends and holidays)"""
+    return working_days.count(start_date, end_date)
 
-def check_leave_conflict(user_id, start_date, end_date, exclude_application_id=None):
-    """Check if there are any conflicting leave applications"""
+def calculate_working_days_batch(date_ranges, day_calendar=working_days):
+    """Calculate working days for many (start_date, end_date) pairs at once"""
+    return day_calendar.count_many(date_ranges)
+
+def leave_conflict_query(user_id, start_date, end_date, exclude_application_id=None):
+    """Pending or approved applications of a user overlapping a date range"""
     query = LeaveApplication.query.filter(
         and_(
             LeaveApplication.user_id == user_id,
             LeaveApplication.status.in_(['pending', 'approved']),
-            or_(
-                and_(LeaveApplication.start_date <= end_date, LeaveApplication.end_date >= start_date)
-            )
+            LeaveApplication.start_date <= end_date,
+            LeaveApplication.end_date >= start_date
         )
     )
     
     if exclude_application_id:
         query = query.filter(LeaveApplication.id != exclude_application_id)
     
-    return query.first() is not None
+    return query
+
+def check_leave_conflict(user_id, start_date, end_date, exclude_application_id=None):
+    """Check if there are any conflicting leave applications"""
+    query = leave_conflict_query(user_id, start_date, end_date, exclude_application_id)
+    return query.with_entities(LeaveApplication.id).first() is not None
+
+def user_history_query(user_id, status=None):
+    """A user's applications, newest first, optionally narrowed to one status"""
+    query = LeaveApplication.query.filter_by(user_id=user_id)
+    
+    if status:
+        query = query.filter_by(status=status)
+    
+    return query.order_by(LeaveApplication.applied_at.desc())
+
+def pending_applications_query():
+    """The admin approval queue, newest first"""
+    return LeaveApplication.query.filter_by(status='pending')\
+        .order_by(LeaveApplication.applied_at.desc())
 
 def get_leave_statistics(user_id, year):
     """Get leave statistics for a user for a specific year"""
@@ -81,76 +99,150 @@ def init_leave_balances(user):
     
     db.session.commit()
 
-def get_monthly_leave_data(year, month):
-    """Get leave data for calendar view"""
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = date(year, month + 1, 1) - timedelta(days=1)
+def get_year_bounds(year):
+    """Half-open [start, end) datetime range covering a calendar year.
     
-    leaves = LeaveApplication.query.filter(
-        and_(
-            LeaveApplication.status == 'approved',
-            or_(
-                and_(LeaveApplication.start_date <= end_date, LeaveApplication.end_date >= start_date)
+    Filter timestamp columns with ``col >= start, col < end`` rather than
+    ``extract('year', col) == year`` so the comparison can use an index.
+    """
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+def get_month_bounds(year, month):
+    """First and last date of a calendar month"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+def get_monthly_leave_data(year, month, user_id=None):
+    """Get leave data for calendar view.
+    
+    Without a user_id all approved leaves overlapping the month are returned;
+    with one, that user's approved and pending leaves. Leave type and applicant
+    are joined into the same query so rendering does not lazy-load per leave.
+    """
+    start_date, end_date = get_month_bounds(year, month)
+    
+    query = LeaveApplication.query.options(
+        joinedload(LeaveApplication.leave_type, innerjoin=True),
+        joinedload(LeaveApplication.applicant, innerjoin=True)
+    ).filter(
+        and_(LeaveApplication.start_date <= end_date, LeaveApplication.end_date >= start_date)
+    )
+    
+    if user_id is None:
+        query = query.filter(LeaveApplication.status == 'approved')
+    else:
+        query = query.filter(
+            and_(
+                LeaveApplication.user_id == user_id,
+                LeaveApplication.status.in_(['approved', 'pending'])
             )
         )
-    ).all()
     
-    return leaves
+    return query.order_by(LeaveApplication.start_date, LeaveApplication.id).all()
+
+def build_calendar_buckets(leaves, year, month, include_staff=False):
+    """Bucket leaves by day of month for the calendar grid.
+    
+    Each leave is clipped to the month first, so only the days it actually
+    covers inside the month are visited. Returns a list indexed by day number
+    (index 0 is unused) whose entries are lists of event dicts.
+    """
+    month_start, month_end = get_month_bounds(year, month)
+    buckets = [[] for _ in range(month_end.day + 1)]
+    
+    for leave in leaves:
+        first = max(leave.start_date, month_start)
+        last = min(leave.end_date, month_end)
+        if first > last:
+            continue
+        
+        event = {
+            'application': leave,
+            'type': leave.leave_type.name,
+            'color': leave.leave_type.color_code,
+            'status': leave.status,
+            'staff': leave.applicant.full_name if include_staff else None
+        }
+        for day in range(first.day, last.day + 1):
+            buckets[day].append(event)
+    
+    return buckets
 
 def send_leave_notification(application, action):
-    """Send email notification for leave status update"""
-    # This would integrate with an email service
-    # For now, we'll just log the notification
-    print(f"Email notification: Leave application {application.id} has been {action}")
+    """Queue an email notification for a leave status update.
+    
+    The message is added to the notification outbox in the current session,
+    so it is committed atomically with the status change and delivered later
+    by the outbox dispatcher (see notifications.py).
+    """
+    applicant = application.applicant
+    leave_type = application.leave_type
+    dates = f"{application.start_date.strftime('%b %d, %Y')} - {application.end_date.strftime('%b %d, %Y')}"
+    
+    lines = [
+        f"Dear {applicant.full_name},",
+        "",
+        f"Your {leave_type.name} application for {dates} ({application.total_days} days) has been {action}.",
+    ]
+    if action == 'rejected' and application.rejection_reason:
+        lines.append(f"Reason: {application.rejection_reason}")
+    if application.comments:
+        lines.append(f"Comments: {application.comments}")
+    
+    message = NotificationOutbox(
+        application_id=application.id,
+        recipient=applicant.email,
+        subject=f"Leave application {action}: {leave_type.name} ({dates})",
+        body='\n'.join(lines)
+    )
+    db.session.add(message)
+    return message
 
 def generate_leave_report(user_id=None, start_date=None, end_date=None, leave_type_id=None):
-    """Generate leave report based on filters"""
-    query = LeaveApplication.query
-    
-    if user_id:
-        query = query.filter_by(user_id=user_id)
-    
-    if start_date:
-        query = query.filter(LeaveApplication.start_date >= start_date)
-    
-    if end_date:
-        query = query.filter(LeaveApplication.end_date <= end_date)
-    
-    if leave_type_id:
-        query = query.filter_by(leave_type_id=leave_type_id)
-    
-    return query.order_by(LeaveApplication.applied_at.desc()).all()
+    """Generate leave report rows based on filters, streamed in batches (see reports.py)"""
+    return iter_leave_report(user_id=user_id, start_date=start_date, end_date=end_date,
+                             leave_type_id=leave_type_id)
 
-def get_dashboard_stats():
-    """Get dashboard statistics for admin"""
-    current_year = datetime.now().year
-    
-    total_applications = LeaveApplication.query.filter(
-        extract('year', LeaveApplication.applied_at) == current_year
-    ).count()
-    
-    pending_applications = LeaveApplication.query.filter_by(status='pending').count()
-    
-    approved_applications = LeaveApplication.query.filter(
-        and_(
-            LeaveApplication.status == 'approved',
-            extract('year', LeaveApplication.applied_at) == current_year
-        )
-    ).count()
-    
-    rejected_applications = LeaveApplication.query.filter(
-        and_(
-            LeaveApplication.status == 'rejected',
-            extract('year', LeaveApplication.applied_at) == current_year
-        )
-    ).count()
+def get_dashboard_stats(year=None):
+    """Get dashboard statistics for admin in a single aggregate query"""
+    year_start, year_end = get_year_bounds(year or datetime.now().year)
+    applied_this_year = and_(
+        LeaveApplication.applied_at >= year_start,
+        LeaveApplication.applied_at < year_end
+    )
     
-    return {
-        'total_applications': total_applications,
-        'pending_applications': pending_applications,
-        'approved_applications': approved_applications,
-        'rejected_applications': rejected_applications
-    }
+    staff_counts = select(
+        func.count(case((User.role == 'staff', 1))).label('total_staff'),
+        func.count(case((User.staff_type == 'teaching', 1))).label('teaching_staff'),
+        func.count(case((User.staff_type == 'non_teaching', 1))).label('non_teaching_staff')
+    ).where(User.is_active == True).subquery()
+    
+    application_counts = select(
+        func.count(case((applied_this_year, 1))).label('total_applications'),
+        func.count(case((LeaveApplication.status == 'pending', 1))).label('pending_applications'),
+        func.count(case((and_(applied_this_year, LeaveApplication.status == 'approved'), 1))).label('approved_applications'),
+        func.count(case((and_(applied_this_year, LeaveApplication.status == 'rejected'), 1))).label('rejected_applications')
+    ).subquery()
+    
+    # Both sides are single-row aggregates, so the cross join yields exactly one row
+    row = db.session.execute(
+        select(staff_counts, application_counts)
+        .select_from(staff_counts.join(application_counts, true()))
+    ).one()
+    return dict(row._mapping)
+
+# Admin dashboard numbers, kept warm by the write paths via adjust()/invalidate()
+dashboard_stats_cache = SnapshotCache(get_dashboard_stats, ttl=60)
+
+_dashboard_stats_version = None
+
+def get_cached_dashboard_stats(version=None):
+    """Dashboard statistics for the current year, served from the snapshot cache.
+    
+    Passing the current change-counter ``version`` drops a snapshot built
+    before another worker's writes instead of waiting for the TTL.
+    """
+    global _dashboard_stats_version
+    if version is not None and version != _dashboard_stats_version:
+        dashboard_stats_cache.invalidate()
+        _dashboard_stats_version = version
+    return dashboard_stats_cache.get(datetime.now().year)
@@ -0,0 +1,80 @@
+"""Pre-fork warm-up for gunicorn's ``preload_app`` (see gunicorn.conf.py).
+
+With preloading the master builds the app once and forks the workers from
+it, so whatever it loads beforehand is shared copy-on-write instead of being
+rebuilt by every worker on its first requests:
+
+* mapper configuration and SQLAlchemy's compiled-statement cache for the
+  leave type queries behind the apply form and the balance views;
+* the working-day tables (holidays) for this year and next;
+* every Jinja template, compiled.
+
+Finally the connection pool is emptied, because sockets must not be shared
+between processes, and ``gc.freeze()`` moves the warmed objects out of the
+collector's reach so that collections in the workers do not touch (and copy)
+their pages.
+"""
+
+import gc
+import logging
+import time
+from datetime import date
+
+from sqlalchemy.orm import configure_mappers
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+def warm_leave_types():
+    from models import LeaveType
+
+    active = LeaveType.query.filter(LeaveType.is_active == True)
+    active.order_by(LeaveType.id).all()
+    active.filter(LeaveType.applicable_to_teaching == True).all()
+    active.filter(LeaveType.applicable_to_non_teaching == True).all()
+
+
+def warm_holidays():
+    from working_days import working_days
+
+    this_year = date.today().year
+    for year in (this_year, this_year + 1):
+        working_days.holidays(year)
+
+
+def warm_templates(app):
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_up(app):
+    """Load shared caches in the current process; returns seconds per step"""
+    timings = {}
+
+    def step(name, fn, *args):
+        # Warm-up only saves time later; a failure here must not stop the server
+        started = time.perf_counter()
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("Warm-up step %s failed", name)
+            db.session.rollback()
+        timings[name] = time.perf_counter() - started
+
+    with app.app_context():
+        step('mappers', configure_mappers)
+        step('leave_types', warm_leave_types)
+        step('holidays', warm_holidays)
+        step('templates', warm_templates, app)
+        db.session.remove()
+        db.engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    logger.info("Warm-up done: %s", ', '.join(f"{name} {seconds * 1000:.1f} ms"
+                                              for name, seconds in timings.items()))
+    return timings
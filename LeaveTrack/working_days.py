@@ -0,0 +1,138 @@
+"""Working-day engine used for leave day counts.
+
+Each calendar year is turned into a prefix-sum table once, so counting the
+working days in any range is a couple of lookups per year spanned instead of
+a walk over every day. Weekends and institutional holidays (``Holiday`` rows)
+are excluded. Batches of ranges are counted with ``numpy.busday_count`` when
+NumPy is installed and fall back to the prefix tables otherwise.
+
+Cached years are tagged with the ``holidays`` change counter, which every
+holiday edit bumps. Each request reads the counter once, so a holiday added
+or removed through any worker process is seen by all of them from their next
+request on. The process that made the edit also drops its tables as soon as
+the edit commits, never before, so no table is built from uncommitted rows.
+"""
+
+import threading
+from datetime import date, timedelta
+
+from flask import g, has_request_context
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batches fall back to the prefix tables
+    np = None
+
+from change_counters import HOLIDAYS, get_versions, on_version_bump
+from models import Holiday
+
+
+def load_holidays(year):
+    """Return the holiday dates stored for a calendar year"""
+    rows = Holiday.query.with_entities(Holiday.holiday_date).filter(
+        Holiday.holiday_date >= date(year, 1, 1),
+        Holiday.holiday_date < date(year + 1, 1, 1)
+    ).all()
+    return frozenset(row.holiday_date for row in rows)
+
+
+def load_holiday_version():
+    """Version of the ``holidays`` change counter, read once per request"""
+    if not has_request_context():
+        return get_versions(HOLIDAYS)[HOLIDAYS][0]
+    if 'holiday_version' not in g:
+        g.holiday_version = get_versions(HOLIDAYS)[HOLIDAYS][0]
+    return g.holiday_version
+
+
+class WorkingDayCalendar:
+    """Per-year prefix sums of working days, rebuilt lazily after invalidation.
+
+    ``table[k]`` holds the number of working days among the first ``k`` days
+    of the year, so the count for day-of-year ``a`` through ``b`` is
+    ``table[b] - table[a - 1]``. A table is rebuilt when the holiday version
+    reported by ``version_loader`` differs from the one it was built at.
+    """
+
+    def __init__(self, holiday_loader=load_holidays, version_loader=load_holiday_version):
+        self._holiday_loader = holiday_loader
+        self._version_loader = version_loader
+        self._years = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, year=None):
+        """Drop cached tables for one year, or for every year"""
+        with self._lock:
+            if year is None:
+                self._years.clear()
+            else:
+                self._years.pop(year, None)
+
+    def _year(self, year):
+        version = self._version_loader()
+        entry = self._years.get(year)
+        if entry is not None and entry[0] == version:
+            return entry
+
+        holidays = self._holiday_loader(year)
+        day = date(year, 1, 1)
+        table = [0]
+        while day.year == year:
+            is_working = day.weekday() < 5 and day not in holidays
+            table.append(table[-1] + is_working)
+            day += timedelta(days=1)
+
+        entry = (version, table, holidays)
+        with self._lock:
+            self._years[year] = entry
+        return entry
+
+    def holidays(self, year):
+        """Holiday dates for a year, served from the same cache as the tables"""
+        return self._year(year)[2]
+
+    def count(self, start_date, end_date):
+        """Number of working days from start_date to end_date, both inclusive"""
+        if end_date < start_date:
+            return 0
+
+        total = 0
+        for year in range(start_date.year, end_date.year + 1):
+            table = self._year(year)[1]
+            first = start_date.timetuple().tm_yday if year == start_date.year else 1
+            last = end_date.timetuple().tm_yday if year == end_date.year else len(table) - 1
+            total += table[last] - table[first - 1]
+
+        return total
+
+    def count_many(self, ranges):
+        """Count working days for a sequence of (start_date, end_date) pairs"""
+        ranges = list(ranges)
+        if not ranges:
+            return []
+
+        if np is None:
+            return [self.count(start, end) for start, end in ranges]
+
+        first_year = min(start.year for start, _ in ranges)
+        last_year = max(end.year for _, end in ranges)
+        holidays = sorted(
+            day for year in range(first_year, last_year + 1) for day in self.holidays(year)
+        )
+
+        starts = np.array([start for start, _ in ranges], dtype='datetime64[D]')
+        ends = np.array([end for _, end in ranges], dtype='datetime64[D]') + np.timedelta64(1, 'D')
+        counts = np.busday_count(starts, ends, holidays=np.array(holidays, dtype='datetime64[D]'))
+        return [max(int(n), 0) for n in counts]
+
+
+working_days = WorkingDayCalendar()
+
+
+def _holidays_committed():
+    working_days.invalidate()
+    if has_request_context():
+        g.pop('holiday_version', None)
+
+
+on_version_bump(HOLIDAYS, _holidays_committed)